@@ -9,9 +9,15 @@
 #
 #-------------------------------------------------------------------------------
 
-import PIL.Image
+import re
+import fnmatch
 from .binary_file import BinaryFile, WritableBinaryFile
 
+#
+# NumPy and PIL are only imported by the methods that touch pixels, so that
+# reading metadata (names, sizes, offsets) stays cheap to start up.
+#
+
 
 #------------------------------------------------------------------------------
 # ArtworkImage
@@ -22,6 +28,8 @@ class ArtworkImage(object):
     Abstract class for metadata and accessor for a single image in
     an artwork file.
     """
+    __slots__ = ("artwork_file", "artwork_set")
+
     def __init__(self, artwork_file, artwork_set):
         super(ArtworkImage, self).__init__()
         self.artwork_file = artwork_file
@@ -43,19 +51,34 @@ class ArtworkImage(object):
     def image_offset(self):
         raise NotImplementedError("Implement in a derived class.")
 
+    @property
+    def flags(self):
+        raise NotImplementedError("Implement in a derived class.")
+
     @property
     def is_greyscale(self):
         raise NotImplementedError("Implement in a derived class.")
 
     @property
     def retina_appropriate_name(self):
-        name = self.name
-        if self.artwork_set.is_retina and ("@2x" not in name):
-            name = name.replace(".png", "@2x.png")
-        return name
+        return self.artwork_set.retina_appropriate_name_for(self.name)
 
-    def get_pil_image(self):
-        return self.artwork_file.read_pil_image_at(self.image_offset, self.width, self.height, self.is_greyscale)
+    @property
+    def row_stride(self):
+        return self.artwork_file.row_stride(self.width, self.is_greyscale)
+
+    @property
+    def pixel_span(self):
+        return self.artwork_file.pixel_span(self.width, self.height, self.is_greyscale)
+
+    def get_pil_image(self, rgba_greyscale=False):
+        return self.artwork_file.read_pil_image_at(self.image_offset, self.width, self.height, self.is_greyscale, rgba_greyscale)
+
+    def get_pixel_view(self):
+        return self.artwork_file.pixel_view_at(self.image_offset, self.width, self.height, self.is_greyscale)
+
+    def get_pixel_array(self):
+        return self.artwork_file.pixel_array_at(self.image_offset, self.width, self.height, self.is_greyscale)
 
 
 
@@ -71,6 +94,7 @@ class ArtworkSet(object):
     def __init__(self, artwork_file):
         super(ArtworkSet, self).__init__()
         self.artwork_file = artwork_file
+        self._name_index = None
 
     @property
     def version(self):
@@ -80,9 +104,59 @@ class ArtworkSet(object):
     def image_count(self):
         raise NotImplementedError("Implement in a derived class.")
 
+    def image_at(self, index):
+        raise NotImplementedError("Implement in a derived class.")
+
     def iter_images(self):
         raise NotImplementedError("Implement in a derived class.")
 
+    def iter_names(self):
+        """Every image's name, in order; derived classes can do this without building images."""
+        for artwork_image in self.iter_images():
+            yield artwork_image.name
+
+    def __len__(self):
+        return self.image_count
+
+    #
+    # Finding images by name
+    #
+
+    def retina_appropriate_name_for(self, name):
+        if self.is_retina and ("@2x" not in name):
+            name = name.replace(".png", "@2x.png")
+        return name
+
+    @property
+    def name_index(self):
+        """Image index by name, and by retina-appropriate name; built once."""
+        if self._name_index is None:
+            name_index = {}
+            for index, name in enumerate(self.iter_names()):
+                name_index.setdefault(name, index)
+                name_index.setdefault(self.retina_appropriate_name_for(name), index)
+            self._name_index = name_index
+        return self._name_index
+
+    def get_image(self, name):
+        """The image with this (plain or retina-appropriate) name, or None."""
+        index = self.name_index.get(name)
+        if index is None:
+            return None
+        return self.image_at(index)
+
+    def __contains__(self, name):
+        return name in self.name_index
+
+    def select(self, patterns, is_regex=False):
+        """
+        The images, in order, whose plain or retina-appropriate names match
+        any of the glob (or, with is_regex, regular expression) patterns.
+        """
+        matches = name_matcher(patterns, is_regex)
+        indexes = set(index for name, index in self.name_index.items() if matches(name))
+        return [self.image_at(index) for index in sorted(indexes)]
+
     @property
     def name(self):
         return self.artwork_file.basename
@@ -92,6 +166,19 @@ class ArtworkSet(object):
         return "@2x" in self.name
 
 
+def name_matcher(patterns, is_regex=False):
+    """A function telling whether a name matches any of the glob (or regular expression) patterns."""
+    if not patterns:
+        return lambda name: False
+    if is_regex:
+        # Regular expressions match anywhere in the name...
+        combined = re.compile("|".join("(?:%s)" % pattern for pattern in patterns))
+        return lambda name: combined.search(name) is not None
+    # ...globs match all of it.
+    combined = re.compile("|".join("(?:%s)" % fnmatch.translate(pattern) for pattern in patterns))
+    return lambda name: combined.match(name) is not None
+
+
 #------------------------------------------------------------------------------
 # ArtworkFileCommon
 #------------------------------------------------------------------------------
@@ -113,6 +200,39 @@ class ArtworkFileCommon(object):
     def width_byte_packing(self, **kwargs):
         raise NotImplementedError("Implement in a derived class.")
 
+    def pixel_width(self, is_greyscale):
+        return self.greyscale_pixel_size if is_greyscale else self.color_pixel_size
+
+    def row_stride(self, width, is_greyscale):
+        """Number of bytes from the start of one pixel row to the next."""
+        return self.width_byte_align(width, is_greyscale=is_greyscale) * self.pixel_width(is_greyscale)
+
+    def pixel_span(self, width, height, is_greyscale):
+        """Number of bytes covered by an image, from its first pixel to its last."""
+        if (width == 0) or (height == 0):
+            return 0
+        return (self.row_stride(width, is_greyscale) * (height - 1)) + (width * self.pixel_width(is_greyscale))
+
+    def pixel_view_at(self, offset, width, height, is_greyscale):
+        """
+        Return a zero-copy memoryview over an image's pixel span. Rows are
+        row_stride() bytes apart; bytes past width * pixel_width in each
+        row are padding.
+        """
+        return self.memoryview_at(offset, self.pixel_span(width, height, is_greyscale))
+
+    def pixel_array_at(self, offset, width, height, is_greyscale):
+        """
+        Return a zero-copy, strided NumPy array over an image's pixels,
+        shaped (height, width) for greyscale images and (height, width, 4)
+        -- b, g, r, premultiplied a -- for colour images. Row padding is
+        skipped over by the strides.
+        """
+        stride = self.row_stride(width, is_greyscale)
+        if is_greyscale:
+            return self.array_at(offset, (height, width), (stride, 1))
+        return self.array_at(offset, (height, width, self.color_pixel_size), (stride, self.color_pixel_size, 1))
+
     @property
     def artwork_set(self):
         raise NotImplementedError("Implement in a derived class.")
@@ -125,8 +245,8 @@ class ArtworkFileCommon(object):
 class ArtworkFile(BinaryFile, ArtworkFileCommon):
     """Base class for reading an iOS SDK .artwork file, of any iOS era."""
 
-    def __init__(self, filename):
-        super(ArtworkFile, self).__init__(filename)
+    def __init__(self, filename, data=None):
+        super(ArtworkFile, self).__init__(filename, data=data)
         self.greyscale_pixel_size = 1
         self.color_pixel_size = 4
 
@@ -150,22 +270,47 @@ class ArtworkFile(BinaryFile, ArtworkFileCommon):
             b = (b * 255 + a // 2) // a
         return (r, g, b, a)
 
-    def read_pil_image_at(self, offset, width, height, is_greyscale):
-        """Return a PIL image instance of given size, at a given offset in the .artwork file."""
-        pil_image = PIL.Image.new("RGBA", (width, height))
-        pil_pixels = pil_image.load()
-        aligned_width = self.width_byte_align(width, is_greyscale=is_greyscale)
-        pixel_width = self.greyscale_pixel_size if is_greyscale else self.color_pixel_size
-
-        for y in range(height):
-            for x in range(width):
-                pixel_offset = offset + (pixel_width * ((y * aligned_width) + x))
-                if is_greyscale:
-                    pil_pixels[x, y] = self.read_pil_greyscale_pixel_at(pixel_offset)
-                else:
-                    pil_pixels[x, y] = self.read_pil_color_pixel_at(pixel_offset)
-
-        return pil_image
+    def read_pil_image_at(self, offset, width, height, is_greyscale, rgba_greyscale=False):
+        """
+        Return a PIL image instance of given size, at a given offset in the
+        .artwork file. Greyscale images come back in "L" mode, one byte per
+        pixel, unless rgba_greyscale asks for them expanded to opaque RGBA.
+        """
+        import numpy
+        import PIL.Image
+        if is_greyscale and not rgba_greyscale:
+            # PIL's raw decoder steps over the row padding itself, reading
+            # straight from the mapped file. (frombytes rather than
+            # frombuffer: a mapped image would pin the file's mapping, and
+            # would need the last row's padding to be inside the file.)
+            view = self.pixel_view_at(offset, width, height, is_greyscale)
+            return PIL.Image.frombytes("L", (width, height), view, "raw", "L", self.row_stride(width, is_greyscale), 1)
+        pixels = self.pixel_array_at(offset, width, height, is_greyscale)
+        if is_greyscale:
+            rgba = numpy.empty((height, width, 4), dtype=numpy.uint8)
+            rgba[:, :, 0:3] = pixels[:, :, numpy.newaxis]
+            rgba[:, :, 3] = 255
+        else:
+            rgba = self.unpremultiply_bgra_pixels(pixels)
+        return PIL.Image.frombuffer("RGBA", (width, height), rgba.tobytes(), "raw", "RGBA", 0, 1)
+
+    def unpremultiply_bgra_pixels(self, bgra):
+        """
+        Swizzle a (height, width, 4) array of premultiplied b, g, r, a
+        pixels into straight r, g, b, a -- the array equivalent of
+        read_pil_color_pixel_at, rounding included.
+        """
+        import numpy
+        alpha = bgra[:, :, 3:4].astype(numpy.uint32)
+        # Fully transparent pixels keep their colour bytes; dividing by 255
+        # with this rounding is the identity, so it stands in for a == 0.
+        alpha[alpha == 0] = 255
+        rgb = (bgra[:, :, 2::-1].astype(numpy.uint32) * 255 + alpha // 2) // alpha
+        rgba = numpy.empty(bgra.shape, dtype=numpy.uint8)
+        numpy.minimum(rgb, 255, out=rgb)
+        rgba[:, :, 0:3] = rgb
+        rgba[:, :, 3] = bgra[:, :, 3]
+        return rgba
 
     def iter_images(self):
         raise NotImplementedError("Implement in a derived class.")
@@ -180,6 +325,8 @@ class WriteableArtworkFile(WritableBinaryFile, ArtworkFileCommon):
 
     def __init__(self, filename, template_binary):
         super(WriteableArtworkFile, self).__init__(filename, template_binary)
+        self.greyscale_pixel_size = 1
+        self.color_pixel_size = 4
 
     def write_greyscale_pixel_at(self, offset, grey):
         self.write_byte_at(offset, grey)
@@ -199,22 +346,49 @@ class WriteableArtworkFile(WritableBinaryFile, ArtworkFileCommon):
 
     def write_pil_image_at(self, offset, width, height, is_greyscale, pil_image):
         """Write a PIL image instance of given size, to a given offset in the .artwork file."""
-        pil_pixels = pil_image.load()
-        aligned_width = self.width_byte_align(width, is_greyscale=is_greyscale)
-        pixel_width = 1 if is_greyscale else 4
-
-        for y in range(height):
-            for x in range(width):
-                pixel_offset = offset + (pixel_width * ((y * aligned_width) + x))
-
-                if pil_image.mode == 'RGBA':
-                    r, g, b, a = pil_pixels[x, y]
-                else:
-                    r, g, b = pil_pixels[x, y]
-                    a = 255
-
-                if is_greyscale:
-                    self.write_pil_greyscale_pixel_at(pixel_offset, r, g, b, a)
-                else:
-                    self.write_pil_color_pixel_at(pixel_offset, r, g, b, a)
-
+        pixels = self.encode_pil_image(width, height, is_greyscale, pil_image)
+        # One bulk copy through a view of the mmap; row padding is left untouched.
+        self.pixel_array_at(offset, width, height, is_greyscale)[:] = pixels
+
+    def update_pil_image_at(self, offset, width, height, is_greyscale, pil_image):
+        """
+        Like write_pil_image_at, but leave the file alone if it already
+        holds exactly these pixels. Returns whether anything was written.
+        """
+        import numpy
+        pixels = self.encode_pil_image(width, height, is_greyscale, pil_image)
+        current_pixels = self.pixel_array_at(offset, width, height, is_greyscale)
+        if numpy.array_equal(current_pixels, pixels):
+            return False
+        current_pixels[:] = pixels
+        return True
+
+    def encode_pil_image(self, width, height, is_greyscale, pil_image):
+        """
+        Return a PIL image's pixels as they are stored in the .artwork file:
+        a (height, width) greyscale array, or a (height, width, 4) array of
+        premultiplied b, g, r, a.
+        """
+        import numpy
+        if pil_image.size != (width, height):
+            raise ValueError("Expected a %dx%d image, got %dx%d." % ((width, height) + pil_image.size))
+        if pil_image.mode != "RGBA":
+            pil_image = pil_image.convert("RGBA")
+        rgba = numpy.asarray(pil_image)
+        if is_greyscale:
+            return rgba[:, :, 2]
+        return self.premultiply_rgba_pixels(rgba)
+
+    def premultiply_rgba_pixels(self, rgba):
+        """
+        Swizzle a (height, width, 4) array of straight r, g, b, a pixels
+        into premultiplied b, g, r, a -- the array equivalent of
+        write_pil_color_pixel_at, rounding included.
+        """
+        import numpy
+        alpha = rgba[:, :, 3:4].astype(numpy.uint32)
+        bgr = (rgba[:, :, 2::-1].astype(numpy.uint32) * alpha + 127) // 255
+        bgra = numpy.empty(rgba.shape, dtype=numpy.uint8)
+        bgra[:, :, 0:3] = bgr
+        bgra[:, :, 3] = rgba[:, :, 3]
+        return bgra
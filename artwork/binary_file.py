@@ -22,22 +22,33 @@ import mmap
 class BinaryFile(object):
     """
     A read-only binary file on disk, with some basic tools to read from it.
+
+    Pass data (any bytes-like object) to read from memory instead; the
+    file named by filename is then never opened.
     """
     BYTE = 1
     SHORT = 2
     LONG = 4
 
-    def __init__(self, filename, endian="<"):
+    def __init__(self, filename, endian="<", data=None):
         super(BinaryFile, self).__init__()
         self.filename = filename
         self._file = None
-        self._data = None
+        self._data = data
+        self._is_in_memory = data is not None
         self._data_length = -1
         self._endian = endian
         
     def __del__(self):
-        if self._data is not None:
-            self._data.close()
+        if self._is_in_memory:
+            self._data = None
+        elif self._data is not None:
+            try:
+                self._data.close()
+            except BufferError:
+                # Views returned by memoryview_at/array_at are still alive;
+                # the map is released once the last of them goes away.
+                pass
             self._data = None
         if self._file is not None:
             self._file.close()
@@ -51,15 +62,23 @@ class BinaryFile(object):
     def basename(self):
         return os.path.basename(self.filename)
             
+    @property
+    def is_in_memory(self):
+        return self._is_in_memory
+
     @property
     def file_size(self):
+        if self._is_in_memory:
+            return self.data_length
         return os.path.getsize(self.filename)
             
     @property
     def data(self):
         if self._data is None:
-            self._file = open(self.filename, "rb")
-            self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            # mmap keeps its own handle on the file, so ours can be closed
+            # right away; batch runs hold hundreds of these maps open at once.
+            with open(self.filename, "rb") as f:
+                self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
         return self._data
         
     @property
@@ -87,6 +106,20 @@ class BinaryFile(object):
         bytes = self.data[start:offset]
         return bytes.decode("utf-8")
 
+    def memoryview_at(self, offset, length):
+        """Return a zero-copy memoryview of length bytes at offset."""
+        if (offset < 0) or (length < 0) or (offset + length > self.data_length):
+            raise ValueError("Range %d+%d is outside of %s." % (offset, length, self.basename))
+        return memoryview(self.data)[offset:offset + length]
+
+    def array_at(self, offset, shape, strides=None, dtype="uint8"):
+        """
+        Return a zero-copy NumPy array over the file's bytes at offset.
+        The array is writable if and only if the underlying mmap is.
+        """
+        import numpy
+        return numpy.ndarray(shape, dtype=dtype, buffer=self.data, offset=offset, strides=strides)
+
 
 #------------------------------------------------------------------------------
 # WritableBinaryFile
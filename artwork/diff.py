@@ -0,0 +1,167 @@
+#-------------------------------------------------------------------------------
+#
+# iOS .artwork file extractor
+# (c)2008-2012 Dave Peck <davepeck [at] davepeck [dot] org> All Rights Reserved
+#
+# Released under the three-clause BSD license.
+#
+# http://github.com/davepeck/iOS-artwork/
+#
+#-------------------------------------------------------------------------------
+
+#
+# Compare two artwork sets -- typically one set from two SDK versions --
+# image by image, matching images by name.
+#
+# Added, removed and resized images (and images that switched between
+# colour and greyscale) are found from the image tables alone. Images of
+# the same size are then compared straight from the two mapped files:
+# their whole pixel spans at once where the rows are strided alike, and
+# otherwise row by row as NumPy views, so row padding is ignored. Nothing
+# is decoded for the comparison; only images that really differ are, and
+# only if a visual diff is asked for.
+#
+
+ADDED = "added"
+REMOVED = "removed"
+RESIZED = "resized"
+CHANGED = "changed"
+
+STATUS_MARKS = {ADDED: "+", REMOVED: "-", RESIZED: "~", CHANGED: "*"}
+
+
+#------------------------------------------------------------------------------
+# ImageDifference
+#------------------------------------------------------------------------------
+
+class ImageDifference(object):
+    """One image that differs between two artwork sets; old or new is None for added or removed images."""
+    def __init__(self, status, name, old_image=None, new_image=None):
+        super(ImageDifference, self).__init__()
+        self.status = status
+        self.name = name
+        self.old_image = old_image
+        self.new_image = new_image
+
+    @staticmethod
+    def _size(artwork_image):
+        if artwork_image is None:
+            return None
+        return "%dx%d%s" % (artwork_image.width, artwork_image.height, " grey" if artwork_image.is_greyscale else "")
+
+    @property
+    def old_size(self):
+        return ImageDifference._size(self.old_image)
+
+    @property
+    def new_size(self):
+        return ImageDifference._size(self.new_image)
+
+    def __repr__(self):
+        if self.status == RESIZED:
+            return "%s %s (%s -> %s)" % (STATUS_MARKS[self.status], self.name, self.old_size, self.new_size)
+        return "%s %s (%s)" % (STATUS_MARKS[self.status], self.name, self.new_size or self.old_size)
+
+    def to_jsonable(self):
+        return {"status": self.status, "name": self.name, "old_size": self.old_size, "new_size": self.new_size}
+
+
+#------------------------------------------------------------------------------
+# ArtworkSetDiff
+#------------------------------------------------------------------------------
+
+class ArtworkSetDiff(object):
+    """The differences between two artwork sets, in the order of the new set (then removed images)."""
+    def __init__(self, old_set, new_set):
+        super(ArtworkSetDiff, self).__init__()
+        self.old_set = old_set
+        self.new_set = new_set
+        self.differences = []
+        self.unchanged_count = 0
+        self._compare()
+
+    @staticmethod
+    def _images_by_name(artwork_set):
+        images = {}
+        for artwork_image in artwork_set.iter_images():
+            images.setdefault(artwork_image.name, artwork_image)
+        return images
+
+    @staticmethod
+    def _pixels_equal(old_image, new_image):
+        # Identical spans of identically strided rows are identical pixels,
+        # and comparing them is one memcmp; otherwise the rows themselves
+        # are compared, leaving out any row padding.
+        import numpy
+        if (old_image.row_stride == new_image.row_stride) and (old_image.get_pixel_view() == new_image.get_pixel_view()):
+            return True
+        return numpy.array_equal(old_image.get_pixel_array(), new_image.get_pixel_array())
+
+    def _compare(self):
+        old_images = ArtworkSetDiff._images_by_name(self.old_set)
+        new_images = ArtworkSetDiff._images_by_name(self.new_set)
+        for name, new_image in new_images.items():
+            old_image = old_images.get(name)
+            if old_image is None:
+                status = ADDED
+            elif (old_image.width, old_image.height, old_image.is_greyscale) != (new_image.width, new_image.height, new_image.is_greyscale):
+                status = RESIZED
+            elif ArtworkSetDiff._pixels_equal(old_image, new_image):
+                self.unchanged_count += 1
+                continue
+            else:
+                status = CHANGED
+            self.differences.append(ImageDifference(status, name, old_image, new_image))
+        for name, old_image in old_images.items():
+            if name not in new_images:
+                self.differences.append(ImageDifference(REMOVED, name, old_image, None))
+
+    @property
+    def is_identical(self):
+        return not self.differences
+
+    @property
+    def counts(self):
+        counts = dict((status, 0) for status in STATUS_MARKS)
+        for difference in self.differences:
+            counts[difference.status] += 1
+        counts["unchanged"] = self.unchanged_count
+        return counts
+
+    def to_jsonable(self):
+        return {
+            "old": self.old_set.artwork_file.filename,
+            "new": self.new_set.artwork_file.filename,
+            "counts": self.counts,
+            "differences": [difference.to_jsonable() for difference in self.differences],
+        }
+
+
+#------------------------------------------------------------------------------
+# Visual diffs
+#------------------------------------------------------------------------------
+
+HIGHLIGHT = (255, 0, 0, 255)
+
+
+def visual_diff_image(old_image, new_image, rgba_greyscale=False):
+    """
+    A PIL image showing the old image, the new image and, on the right, the
+    pixels that differ between them in red. Only images of one size compare
+    pixel by pixel; otherwise the third panel is left empty.
+    """
+    import numpy
+    import PIL.Image
+    panels = [artwork_image.get_pil_image(rgba_greyscale).convert("RGBA") if artwork_image is not None else None for artwork_image in (old_image, new_image)]
+    width = max(panel.size[0] for panel in panels if panel is not None)
+    height = max(panel.size[1] for panel in panels if panel is not None)
+    strip = PIL.Image.new("RGBA", (width * 3, height), (0, 0, 0, 0))
+    for i, panel in enumerate(panels):
+        if panel is not None:
+            strip.paste(panel, (i * width, 0))
+    if (panels[0] is not None) and (panels[1] is not None) and (panels[0].size == panels[1].size):
+        is_different = numpy.any(numpy.asarray(panels[0]) != numpy.asarray(panels[1]), axis=2)
+        highlight = numpy.zeros(is_different.shape + (4,), dtype=numpy.uint8)
+        highlight[is_different] = HIGHLIGHT
+        strip.paste(PIL.Image.fromarray(highlight, "RGBA"), (2 * width, 0))
+    return strip
@@ -0,0 +1,178 @@
+#-------------------------------------------------------------------------------
+#
+# iOS .artwork file extractor
+# (c)2008-2012 Dave Peck <davepeck [at] davepeck [dot] org> All Rights Reserved
+#
+# Released under the three-clause BSD license.
+#
+# http://github.com/davepeck/iOS-artwork/
+#
+#-------------------------------------------------------------------------------
+
+import io
+import os.path
+import zlib
+
+#
+# Encoders turn a decoded PIL image into the bytes of an exported file.
+# They are small and picklable, since every ExportTask carries one to
+# whichever worker process runs it.
+#
+# All of them are lossless. They differ in how much time they spend
+# making the output small: at one end PAMEncoder just writes the pixels
+# out with a short header, at the other PNGEncoder(compress_level=9,
+# optimize=True) tries every trick zlib has.
+#
+
+
+#------------------------------------------------------------------------------
+# ImageEncoder
+#------------------------------------------------------------------------------
+
+class ImageEncoder(object):
+    """Abstract base class for turning PIL images into exported file bytes."""
+    extension = None
+
+    def encode(self, pil_image):
+        raise NotImplementedError("Implement in a derived class.")
+
+    @property
+    def options(self):
+        """Everything about this encoder that affects its output, as a jsonable dict."""
+        raise NotImplementedError("Implement in a derived class.")
+
+    def export_name(self, name):
+        """The image name with this encoder's file extension."""
+        return "%s.%s" % (os.path.splitext(name)[0], self.extension)
+
+
+#------------------------------------------------------------------------------
+# PNGEncoder
+#------------------------------------------------------------------------------
+
+class PNGEncoder(ImageEncoder):
+    """
+    PNG through PIL. With no arguments this is exactly what PIL's save()
+    does by default (zlib level 6).
+    """
+    extension = "png"
+
+    STRATEGIES = {
+        "default": zlib.Z_DEFAULT_STRATEGY,
+        "filtered": zlib.Z_FILTERED,
+        "huffman": zlib.Z_HUFFMAN_ONLY,
+        "rle": zlib.Z_RLE,
+        "fixed": zlib.Z_FIXED,
+    }
+
+    def __init__(self, compress_level=None, strategy=None, optimize=False):
+        super(PNGEncoder, self).__init__()
+        if (compress_level is not None) and not (0 <= compress_level <= 9):
+            raise ValueError("PNG compress level must be between 0 and 9, not %d." % compress_level)
+        if (strategy is not None) and (strategy not in PNGEncoder.STRATEGIES):
+            raise ValueError("Unknown PNG strategy %r; use one of %s." % (strategy, ", ".join(sorted(PNGEncoder.STRATEGIES))))
+        self.compress_level = compress_level
+        self.strategy = strategy
+        self.optimize = optimize
+
+    def encode(self, pil_image):
+        params = {}
+        if self.compress_level is not None:
+            params["compress_level"] = self.compress_level
+        if self.strategy is not None:
+            params["compress_type"] = PNGEncoder.STRATEGIES[self.strategy]
+        if self.optimize:
+            params["optimize"] = True
+        encoded = io.BytesIO()
+        pil_image.save(encoded, "png", **params)
+        return encoded.getvalue()
+
+    @property
+    def options(self):
+        return {"encoder": "png", "compress_level": self.compress_level, "strategy": self.strategy, "optimize": self.optimize}
+
+    def export_name(self, name):
+        # Artwork image names already end in .png; leave them be.
+        if name.lower().endswith(".png"):
+            return name
+        return super(PNGEncoder, self).export_name(name)
+
+
+#------------------------------------------------------------------------------
+# PAMEncoder
+#------------------------------------------------------------------------------
+
+class PAMEncoder(ImageEncoder):
+    """
+    Uncompressed Netpbm PAM: a short text header followed by the raw
+    pixels. The cheapest possible lossless output, meant for pipelines
+    that will re-encode the images anyway.
+    """
+    extension = "pam"
+
+    TUPLE_TYPES = {
+        "RGBA": ("RGB_ALPHA", 4),
+        "RGB": ("RGB", 3),
+        "L": ("GRAYSCALE", 1),
+    }
+
+    def encode(self, pil_image):
+        if pil_image.mode not in PAMEncoder.TUPLE_TYPES:
+            pil_image = pil_image.convert("RGBA")
+        tuple_type, depth = PAMEncoder.TUPLE_TYPES[pil_image.mode]
+        width, height = pil_image.size
+        header = "P7\nWIDTH %d\nHEIGHT %d\nDEPTH %d\nMAXVAL 255\nTUPLTYPE %s\nENDHDR\n" % (width, height, depth, tuple_type)
+        return header.encode("ascii") + pil_image.tobytes()
+
+    @property
+    def options(self):
+        return {"encoder": "pam"}
+
+
+#------------------------------------------------------------------------------
+# Choosing an encoder
+#------------------------------------------------------------------------------
+
+ENCODER_NAMES = ("png", "pam")
+
+# From cheapest to most compact: each trade-off names the cheapest lossless
+# encoder that produces output at least that compact.
+TRADEOFFS = (
+    ("fastest", lambda: PAMEncoder()),
+    ("fast", lambda: PNGEncoder(compress_level=1, strategy="rle")),
+    ("balanced", lambda: PNGEncoder()),
+    ("small", lambda: PNGEncoder(compress_level=9, optimize=True)),
+)
+TRADEOFF_NAMES = tuple(name for name, _ in TRADEOFFS)
+
+
+def encoder_for_tradeoff(tradeoff):
+    for name, make_encoder in TRADEOFFS:
+        if name == tradeoff:
+            return make_encoder()
+    raise ValueError("Unknown trade-off %r; use one of %s." % (tradeoff, ", ".join(TRADEOFF_NAMES)))
+
+
+def get_encoder(name=None, compress_level=None, strategy=None, tradeoff=None):
+    """
+    Build an encoder from command-line style settings. An explicit
+    encoder name wins over a trade-off; with neither, this is the
+    default PNG encoder.
+    """
+    if (name is None) and (tradeoff is not None):
+        encoder = encoder_for_tradeoff(tradeoff)
+    elif name in (None, "png"):
+        encoder = PNGEncoder()
+    elif name == "pam":
+        encoder = PAMEncoder()
+    else:
+        raise ValueError("Unknown encoder %r; use one of %s." % (name, ", ".join(ENCODER_NAMES)))
+
+    if (compress_level is None) and (strategy is None):
+        return encoder
+    if not isinstance(encoder, PNGEncoder):
+        raise ValueError("Compress level and strategy only apply to PNG output.")
+    return PNGEncoder(
+        compress_level if compress_level is not None else encoder.compress_level,
+        strategy if strategy is not None else encoder.strategy,
+        encoder.optimize)
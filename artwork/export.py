@@ -0,0 +1,333 @@
+#-------------------------------------------------------------------------------
+#
+# iOS .artwork file extractor
+# (c)2008-2012 Dave Peck <davepeck [at] davepeck [dot] org> All Rights Reserved
+#
+# Released under the three-clause BSD license.
+#
+# http://github.com/davepeck/iOS-artwork/
+#
+#-------------------------------------------------------------------------------
+
+import os
+import os.path
+import time
+import shutil
+import hashlib
+import collections
+import multiprocessing
+from .export_manifest import ExportManifest, image_entry, file_digest
+from .encoders import PNGEncoder
+from .export_stats import ExportStats
+
+#
+# Exporting an artwork set means decoding, encoding and saving every one
+# of its images. Images are independent of one another, so the work can
+# be spread across a pool of worker processes -- and a batch run feeds
+# the images of many artwork files through that one pool.
+#
+# Pixel data never crosses a process boundary: each worker opens its own
+# read-only mmap of the artwork file (through BinaryFile.data) the first
+# time it sees that file, and the parent only sends each worker a small
+# ExportTask describing where an image lives, and gets a small ExportResult
+# back.
+#
+# Incremental exports (see export_manifest.py) skip, in the parent, every
+# task whose output is known to be up to date. Archived exports (see
+# export_archive.py) get encoded bytes back from the workers and append
+# them, in task order, to a single archive.
+#
+# Deduplicating exports hash every image's pixels, straight from the
+# mapped artwork file, while planning. Only the first image with given
+# pixels (and size) is decoded and encoded; every later one, in any set
+# of the run, is hardlinked to it on disk, or recorded as a link to it
+# in the archive.
+#
+
+
+#------------------------------------------------------------------------------
+# ExportTask
+#------------------------------------------------------------------------------
+
+class ExportTask(object):
+    """
+    Picklable description of a single image to export: which artwork
+    file it lives in, its metadata, how to encode it and where it should
+    be saved. Archived tasks hand their encoded bytes back instead of
+    writing a file, and their export_file_name is the archive member name.
+    """
+    __slots__ = ("artwork_file_class", "artwork_file_name", "name", "width", "height", "image_offset", "flags", "is_greyscale", "encoder", "export_file_name", "is_archived", "rgba_greyscale")
+
+    def __init__(self, artwork_file_class, artwork_file_name, name, width, height, image_offset, flags, is_greyscale, encoder, export_file_name, is_archived=False, rgba_greyscale=False):
+        super(ExportTask, self).__init__()
+        self.artwork_file_class = artwork_file_class
+        self.artwork_file_name = artwork_file_name
+        self.name = name
+        self.width = width
+        self.height = height
+        self.image_offset = image_offset
+        self.flags = flags
+        self.is_greyscale = is_greyscale
+        self.encoder = encoder
+        self.export_file_name = export_file_name
+        self.is_archived = is_archived
+        self.rgba_greyscale = rgba_greyscale
+
+    @classmethod
+    def for_image(cls, artwork_image, directory, encoder, is_archived=False, rgba_greyscale=False):
+        artwork_file = artwork_image.artwork_file
+        name = encoder.export_name(artwork_image.retina_appropriate_name)
+        return cls(
+            type(artwork_file),
+            artwork_file.filename,
+            name,
+            artwork_image.width,
+            artwork_image.height,
+            artwork_image.image_offset,
+            artwork_image.flags,
+            artwork_image.is_greyscale,
+            encoder,
+            os.path.join(directory, name),
+            is_archived,
+            rgba_greyscale)
+
+    def run(self, artwork_file):
+        start_time = time.perf_counter()
+        pil_image = artwork_file.read_pil_image_at(self.image_offset, self.width, self.height, self.is_greyscale, self.rgba_greyscale)
+        decoded_time = time.perf_counter()
+        data = self.encoder.encode(pil_image)
+        digest = hashlib.sha1(data).hexdigest()
+        encoded_time = time.perf_counter()
+        if self.is_archived:
+            result = ExportResult(self.export_file_name, digest, data=data)
+        else:
+            # Replace, rather than overwrite, the file: a deduplicating
+            # export may have left it hardlinked to others.
+            temporary_file_name = self.export_file_name + ".tmp"
+            with open(temporary_file_name, "wb") as f:
+                f.write(data)
+            os.replace(temporary_file_name, self.export_file_name)
+            result = ExportResult(self.export_file_name, digest)
+        result.timings = (decoded_time - start_time, encoded_time - decoded_time, time.perf_counter() - encoded_time)
+        result.input_bytes = artwork_file.pixel_span(self.width, self.height, self.is_greyscale)
+        result.output_bytes = len(data)
+        return result
+
+
+#------------------------------------------------------------------------------
+# ExportResult
+#------------------------------------------------------------------------------
+
+class ExportResult(object):
+    """
+    What came of an ExportTask: where it went, the sha1 of what was
+    written and, for archived tasks, the encoded bytes themselves. For
+    deduplicated tasks, duplicate_of names the export it links to. Also
+    the (decode, encode, write) timings and byte counts, for ExportStats.
+    """
+    __slots__ = ("export_file_name", "digest", "is_unchanged", "data", "timings", "input_bytes", "output_bytes", "duplicate_of")
+
+    def __init__(self, export_file_name, digest, is_unchanged=False, data=None, duplicate_of=None):
+        super(ExportResult, self).__init__()
+        self.export_file_name = export_file_name
+        self.digest = digest
+        self.is_unchanged = is_unchanged
+        self.data = data
+        self.duplicate_of = duplicate_of
+        self.timings = (0.0, 0.0, 0.0)
+        self.input_bytes = 0
+        self.output_bytes = 0
+
+
+#------------------------------------------------------------------------------
+# Deduplication
+#------------------------------------------------------------------------------
+
+def pixel_key(artwork_image):
+    """
+    Identifies an image's pixels: its size, whether it is greyscale, and
+    the sha1 of its pixel rows (without any row padding), read straight
+    from the mapped artwork file.
+    """
+    import numpy
+    pixels = numpy.ascontiguousarray(artwork_image.get_pixel_array())
+    return (artwork_image.width, artwork_image.height, artwork_image.is_greyscale, hashlib.sha1(pixels).hexdigest())
+
+
+def link_file(source_file_name, file_name):
+    """Hardlink file_name to source_file_name, copying where hardlinks aren't possible."""
+    if os.path.exists(file_name):
+        if os.path.samefile(source_file_name, file_name):
+            return
+        os.remove(file_name)
+    try:
+        os.link(source_file_name, file_name)
+    except OSError:
+        shutil.copyfile(source_file_name, file_name)
+
+
+#------------------------------------------------------------------------------
+# Worker side
+#------------------------------------------------------------------------------
+
+# Artwork files opened by this worker process, keyed by (class, file name).
+# Tasks arrive grouped by file, so only the most recently used few are
+# kept open.
+_worker_artwork_files = collections.OrderedDict()
+_WORKER_ARTWORK_FILE_LIMIT = 8
+
+
+def _artwork_file_for(task, artwork_files, limit=None):
+    key = (task.artwork_file_class, task.artwork_file_name)
+    artwork_file = artwork_files.get(key)
+    if artwork_file is None:
+        if (limit is not None) and (len(artwork_files) >= limit):
+            artwork_files.popitem(last=False)
+        artwork_file = task.artwork_file_class(task.artwork_file_name)
+        artwork_files[key] = artwork_file
+    elif limit is not None:
+        artwork_files.move_to_end(key)
+    return artwork_file
+
+
+def _run_task_in_worker(task):
+    return task.run(_artwork_file_for(task, _worker_artwork_files, _WORKER_ARTWORK_FILE_LIMIT))
+
+
+#------------------------------------------------------------------------------
+# ArtworkExporter
+#------------------------------------------------------------------------------
+
+class ArtworkExporter(object):
+    """
+    Export every image of one or more artwork sets, either serially or
+    across a single shared pool of `jobs` worker processes.
+    """
+    def __init__(self, jobs=1, incremental=False, archive=None, encoder=None, rgba_greyscale=False, dedupe=False):
+        super(ArtworkExporter, self).__init__()
+        if incremental and (archive is not None):
+            raise ValueError("Incremental exports can't be archived.")
+        self.jobs = max(1, jobs)
+        self.incremental = incremental
+        self.archive = archive
+        self.encoder = encoder if encoder is not None else PNGEncoder()
+        # Export options that affect the bytes written; recorded in manifests.
+        self.rgba_greyscale = rgba_greyscale
+        self.options = dict(self.encoder.options)
+        self.options["greyscale"] = "RGBA" if rgba_greyscale else "L"
+        # Files already open in this process, reused by the serial path.
+        self._artwork_files = {}
+        # Incremental state: manifests by directory, the manifest each
+        # export file name belongs to, and the digests of unchanged outputs.
+        self._manifests = {}
+        self._task_manifests = {}
+        self._unchanged_digests = {}
+        # Dedupe state: the first export file name for each pixel key, and
+        # the first export file name that every later duplicate links to.
+        self.dedupe = dedupe
+        self._first_export_file_names = {}
+        self._duplicate_of = {}
+        self._digests = {}
+        self.stats = ExportStats()
+
+    def _manifest_for(self, directory):
+        manifest = self._manifests.get(directory)
+        if manifest is None:
+            manifest = ExportManifest.load(directory)
+            self._manifests[directory] = manifest
+        return manifest
+
+    def tasks_for_file(self, artwork_file, directory, only=None, is_regex=False):
+        """
+        Plan the export of artwork_file's images (or just of those whose
+        names match one of the only patterns) into directory. Reading the
+        artwork set itself is timed along with the planning.
+        """
+        start_time = time.perf_counter()
+        artwork_set = artwork_file.artwork_set
+        artwork_images = artwork_set.select(only, is_regex) if only else None
+        tasks = self._plan(artwork_set, directory, artwork_images)
+        self.stats.add_metadata_time(artwork_file.filename, time.perf_counter() - start_time)
+        return tasks
+
+    def tasks_for_set(self, artwork_set, directory, artwork_images=None):
+        """Plan the export of artwork_set's images (or just of artwork_images) into directory."""
+        start_time = time.perf_counter()
+        tasks = self._plan(artwork_set, directory, artwork_images)
+        self.stats.add_metadata_time(artwork_set.artwork_file.filename, time.perf_counter() - start_time)
+        return tasks
+
+    def _plan(self, artwork_set, directory, artwork_images):
+        artwork_file = artwork_set.artwork_file
+        self._artwork_files[(type(artwork_file), artwork_file.filename)] = artwork_file
+        is_archived = self.archive is not None
+        if artwork_images is None:
+            artwork_images = artwork_set.iter_images()
+        if self.dedupe:
+            artwork_images = list(artwork_images)
+        tasks = [ExportTask.for_image(artwork_image, directory, self.encoder, is_archived, self.rgba_greyscale) for artwork_image in artwork_images]
+        if self.dedupe:
+            for artwork_image, task in zip(artwork_images, tasks):
+                first_export_file_name = self._first_export_file_names.setdefault(pixel_key(artwork_image), task.export_file_name)
+                if first_export_file_name != task.export_file_name:
+                    self._duplicate_of[task.export_file_name] = first_export_file_name
+        if self.incremental:
+            manifest = self._manifest_for(directory)
+            previous_images = manifest.begin_set(artwork_file, self.options)
+            for task in tasks:
+                self._task_manifests[task.export_file_name] = manifest
+                previous = previous_images.get(os.path.basename(task.export_file_name))
+                if previous is None or previous != image_entry(task, previous["digest"]):
+                    continue
+                if file_digest(task.export_file_name) == previous["digest"]:
+                    self._unchanged_digests[task.export_file_name] = previous["digest"]
+        return tasks
+
+    def iter_export(self, tasks):
+        """Run the tasks, yielding an ExportResult for each, in task order."""
+        pending = [task for task in tasks if (task.export_file_name not in self._unchanged_digests) and (task.export_file_name not in self._duplicate_of)]
+        results = self._iter_run(pending)
+        for task in tasks:
+            digest = self._unchanged_digests.get(task.export_file_name)
+            if digest is not None:
+                result = ExportResult(task.export_file_name, digest, is_unchanged=True)
+            elif task.export_file_name in self._duplicate_of:
+                result = self._link_duplicate(task)
+            else:
+                result = next(results)
+            if self.dedupe:
+                self._digests[task.export_file_name] = result.digest
+            if result.data is not None:
+                start_time = time.perf_counter()
+                self.archive.add(result.export_file_name.replace(os.sep, "/"), result.data)
+                result.data = None
+                self.stats.add_write_time(task.artwork_file_name, time.perf_counter() - start_time)
+            self.stats.add_result(task, result)
+            if self.incremental:
+                self._task_manifests[task.export_file_name].record(task, result.digest)
+            yield result
+
+        for manifest in self._manifests.values():
+            manifest.save()
+
+    def _link_duplicate(self, task):
+        """Export a duplicate image as a link to the first export of the same pixels."""
+        start_time = time.perf_counter()
+        first_export_file_name = self._duplicate_of[task.export_file_name]
+        if self.archive is not None:
+            self.archive.add_link(task.export_file_name.replace(os.sep, "/"), first_export_file_name.replace(os.sep, "/"))
+        else:
+            link_file(first_export_file_name, task.export_file_name)
+        self.stats.add_write_time(task.artwork_file_name, time.perf_counter() - start_time)
+        return ExportResult(task.export_file_name, self._digests[first_export_file_name], duplicate_of=first_export_file_name)
+
+    def _iter_run(self, tasks):
+        if (self.jobs == 1) or (len(tasks) <= 1):
+            for task in tasks:
+                yield task.run(_artwork_file_for(task, self._artwork_files))
+            return
+
+        chunksize = max(1, len(tasks) // (self.jobs * 4))
+        with multiprocessing.Pool(self.jobs) as pool:
+            for result in pool.imap(_run_task_in_worker, tasks, chunksize):
+                yield result
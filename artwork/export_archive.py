@@ -0,0 +1,143 @@
+#-------------------------------------------------------------------------------
+#
+# iOS .artwork file extractor
+# (c)2008-2012 Dave Peck <davepeck [at] davepeck [dot] org> All Rights Reserved
+#
+# Released under the three-clause BSD license.
+#
+# http://github.com/davepeck/iOS-artwork/
+#
+#-------------------------------------------------------------------------------
+
+import io
+import json
+import gzip
+import zipfile
+import tarfile
+
+#
+# Instead of one file per image, an export can be streamed into a single
+# zip or tar archive: encoded images are appended, in export order, to
+# one open file. Member timestamps, permissions and owners are fixed, so
+# exporting the same artwork twice produces byte-identical archives.
+#
+# Deduplicated images are added as links to an earlier member: hardlink
+# members in tar archives and, since zip has no links, entries in a
+# DEDUPE_MANIFEST_NAME member written when a zip archive is closed.
+#
+
+
+#------------------------------------------------------------------------------
+# ExportArchive
+#------------------------------------------------------------------------------
+
+class ExportArchive(object):
+    """Abstract base class for an archive that exported images are streamed into."""
+    DEDUPE_MANIFEST_NAME = "artwork-dedupe-manifest.json"
+
+    def __init__(self, file_name):
+        super(ExportArchive, self).__init__()
+        self.file_name = file_name
+
+    @classmethod
+    def open(cls, file_name, store=False):
+        """
+        Open a zip (.zip) or tar (.tar, .tar.gz, .tgz) archive for writing.
+        With store=True, zip members are stored rather than deflated; PNG
+        data is already compressed, so this mostly saves time.
+        """
+        lower_file_name = file_name.lower()
+        if lower_file_name.endswith(".zip"):
+            return ZipExportArchive(file_name, store)
+        if lower_file_name.endswith(".tar"):
+            return TarExportArchive(file_name, compress=False)
+        if lower_file_name.endswith(".tar.gz") or lower_file_name.endswith(".tgz"):
+            return TarExportArchive(file_name, compress=True)
+        raise ValueError("Don't know how to write %s; use .zip, .tar, .tar.gz or .tgz." % file_name)
+
+    def add(self, member_name, data):
+        raise NotImplementedError("Implement in a derived class.")
+
+    def add_link(self, member_name, target_member_name):
+        """Add member_name as a duplicate of the already added target_member_name."""
+        raise NotImplementedError("Implement in a derived class.")
+
+    def close(self):
+        raise NotImplementedError("Implement in a derived class.")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+#------------------------------------------------------------------------------
+# ZipExportArchive
+#------------------------------------------------------------------------------
+
+class ZipExportArchive(ExportArchive):
+    DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+    def __init__(self, file_name, store=False):
+        super(ZipExportArchive, self).__init__(file_name)
+        self.compress_type = zipfile.ZIP_STORED if store else zipfile.ZIP_DEFLATED
+        self._zip_file = zipfile.ZipFile(file_name, "w", self.compress_type, allowZip64=True)
+        self._links = {}
+
+    def add(self, member_name, data):
+        zip_info = zipfile.ZipInfo(member_name, ZipExportArchive.DATE_TIME)
+        zip_info.compress_type = self.compress_type
+        zip_info.external_attr = 0o644 << 16
+        self._zip_file.writestr(zip_info, data)
+
+    def add_link(self, member_name, target_member_name):
+        self._links[member_name] = target_member_name
+
+    def close(self):
+        if self._links:
+            jsonable = {"format_version": 1, "duplicates": self._links}
+            self.add(ExportArchive.DEDUPE_MANIFEST_NAME, json.dumps(jsonable, indent=4, sort_keys=True).encode("utf-8"))
+        self._zip_file.close()
+
+
+#------------------------------------------------------------------------------
+# TarExportArchive
+#------------------------------------------------------------------------------
+
+class TarExportArchive(ExportArchive):
+    def __init__(self, file_name, compress=False):
+        super(TarExportArchive, self).__init__(file_name)
+        self._file = open(file_name, "wb")
+        self._gzip_file = None
+        file_object = self._file
+        if compress:
+            # gzip stamps the current time into its header unless told otherwise.
+            self._gzip_file = gzip.GzipFile(filename="", mode="wb", fileobj=self._file, mtime=0)
+            file_object = self._gzip_file
+        self._tar_file = tarfile.open(fileobj=file_object, mode="w", format=tarfile.PAX_FORMAT)
+
+    def _tar_info(self, member_name):
+        tar_info = tarfile.TarInfo(member_name)
+        tar_info.mtime = 0
+        tar_info.mode = 0o644
+        tar_info.uid = tar_info.gid = 0
+        tar_info.uname = tar_info.gname = ""
+        return tar_info
+
+    def add(self, member_name, data):
+        tar_info = self._tar_info(member_name)
+        tar_info.size = len(data)
+        self._tar_file.addfile(tar_info, io.BytesIO(data))
+
+    def add_link(self, member_name, target_member_name):
+        tar_info = self._tar_info(member_name)
+        tar_info.type = tarfile.LNKTYPE
+        tar_info.linkname = target_member_name
+        self._tar_file.addfile(tar_info)
+
+    def close(self):
+        self._tar_file.close()
+        if self._gzip_file is not None:
+            self._gzip_file.close()
+        self._file.close()
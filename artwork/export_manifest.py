@@ -0,0 +1,126 @@
+#-------------------------------------------------------------------------------
+#
+# iOS .artwork file extractor
+# (c)2008-2012 Dave Peck <davepeck [at] davepeck [dot] org> All Rights Reserved
+#
+# Released under the three-clause BSD license.
+#
+# http://github.com/davepeck/iOS-artwork/
+#
+#-------------------------------------------------------------------------------
+
+from __future__ import with_statement  # For compatibility with python 2.5 -- this is legacy.
+
+import os
+import os.path
+import json
+import hashlib
+
+#
+# An incremental export leaves a manifest file in the export directory
+# that records, for every artwork file exported into it:
+#
+#   - the artwork file's identity: size, mtime, and a fingerprint of a
+#     few sampled chunks of its contents;
+#   - the export options that affect output bytes;
+#   - for every image: its offset, size and flags, and the sha1 of the
+#     file it was exported to.
+#
+# On the next run an image is skipped if all of that still matches and
+# the exported file on disk still has the recorded sha1.
+#
+
+
+def file_digest(file_name):
+    """sha1 of a file's contents, or None if it doesn't exist."""
+    try:
+        with open(file_name, "rb") as f:
+            return hashlib.sha1(f.read()).hexdigest()
+    except (IOError, OSError):
+        return None
+
+
+def artwork_file_identity(artwork_file):
+    """Cheap identity for an artwork file: size, mtime and a sampled content fingerprint."""
+    CHUNK = 64 * 1024
+    data = artwork_file.data
+    length = artwork_file.data_length
+    fingerprint = hashlib.sha1()
+    for start in sorted(set([0, max(0, (length // 2) - (CHUNK // 2)), max(0, length - CHUNK)])):
+        fingerprint.update(data[start:start + CHUNK])
+    return {
+        "size": length,
+        "mtime": os.stat(artwork_file.filename).st_mtime_ns,
+        "fingerprint": fingerprint.hexdigest(),
+    }
+
+
+#------------------------------------------------------------------------------
+# ExportManifest
+#------------------------------------------------------------------------------
+
+class ExportManifest(object):
+    """The incremental-export manifest of one export directory."""
+    FILE_NAME = ".artwork-export-manifest.json"
+    FORMAT_VERSION = 1
+
+    def __init__(self, directory):
+        super(ExportManifest, self).__init__()
+        self.directory = directory
+        self._sets = {}
+        self._previous_sets = {}
+
+    @property
+    def file_name(self):
+        return os.path.join(self.directory, ExportManifest.FILE_NAME)
+
+    @classmethod
+    def load(cls, directory):
+        manifest = cls(directory)
+        try:
+            with open(manifest.file_name) as f:
+                jsonable = json.loads(f.read())
+            if jsonable.get("version") == ExportManifest.FORMAT_VERSION:
+                manifest._previous_sets = jsonable["sets"]
+        except (IOError, OSError, ValueError, KeyError):
+            pass
+        return manifest
+
+    def save(self):
+        # Sets that weren't part of this run are kept as they were.
+        sets = dict(self._previous_sets)
+        sets.update(self._sets)
+        temporary_file_name = self.file_name + ".tmp"
+        with open(temporary_file_name, "w") as f:
+            f.write(json.dumps({"version": ExportManifest.FORMAT_VERSION, "sets": sets}, indent=1, sort_keys=True))
+        os.replace(temporary_file_name, self.file_name)
+
+    def begin_set(self, artwork_file, options):
+        """
+        Start recording an artwork file's images; returns the previous
+        run's entries for them if the artwork file and options are
+        unchanged, else an empty dict.
+        """
+        key = artwork_file.filename
+        identity = artwork_file_identity(artwork_file)
+        self._sets[key] = {"identity": identity, "options": options, "images": {}}
+        previous = self._previous_sets.get(key)
+        if (previous is None) or (previous.get("identity") != identity) or (previous.get("options") != options):
+            return {}
+        previous_images = previous.get("images", {})
+        # Images left out of this run (see --only) keep their entries.
+        self._sets[key]["images"].update(previous_images)
+        return previous_images
+
+    def record(self, task, digest):
+        self._sets[task.artwork_file_name]["images"][os.path.basename(task.export_file_name)] = image_entry(task, digest)
+
+
+def image_entry(task, digest):
+    return {
+        "offset": task.image_offset,
+        "width": task.width,
+        "height": task.height,
+        "flags": task.flags,
+        "digest": digest,
+    }
@@ -0,0 +1,130 @@
+#-------------------------------------------------------------------------------
+#
+# iOS .artwork file extractor
+# (c)2008-2012 Dave Peck <davepeck [at] davepeck [dot] org> All Rights Reserved
+#
+# Released under the three-clause BSD license.
+#
+# http://github.com/davepeck/iOS-artwork/
+#
+#-------------------------------------------------------------------------------
+
+import time
+
+#
+# Exports are timed in four phases:
+#
+#   metadata -- sniffing and verifying the artwork file, reading its
+#               artwork set and planning the export (parent);
+#   decode   -- reading pixels into a PIL image (worker);
+#   encode   -- turning the PIL image into PNG (or other) bytes (worker);
+#   write    -- writing those bytes to disk or to the archive.
+#
+# Worker-side times come back with each ExportResult. Every time is
+# wall-clock time (time.perf_counter), summed per phase over all of the
+# images; with several jobs the workers' times overlap, so the phases can
+# add up to more than the export's own elapsed time, recorded separately.
+#
+
+PHASES = ("metadata", "decode", "encode", "write")
+
+
+#------------------------------------------------------------------------------
+# PhaseStats
+#------------------------------------------------------------------------------
+
+class PhaseStats(object):
+    """Counters and phase times for one artwork file, or for a whole export."""
+
+    def __init__(self):
+        super(PhaseStats, self).__init__()
+        self.images = 0
+        self.unchanged_images = 0
+        self.duplicate_images = 0
+        self.pixels = 0
+        self.input_bytes = 0
+        self.output_bytes = 0
+        self.seconds = dict((phase, 0.0) for phase in PHASES)
+
+    def add_result(self, result, width, height):
+        self.images += 1
+        if result.is_unchanged:
+            self.unchanged_images += 1
+            return
+        if result.duplicate_of is not None:
+            self.duplicate_images += 1
+            return
+        self.pixels += width * height
+        self.input_bytes += result.input_bytes
+        self.output_bytes += result.output_bytes
+        for phase, seconds in zip(PHASES[1:], result.timings):
+            self.seconds[phase] += seconds
+
+    def to_jsonable(self):
+        return {
+            "images": self.images,
+            "unchanged_images": self.unchanged_images,
+            "duplicate_images": self.duplicate_images,
+            "pixels": self.pixels,
+            "input_bytes": self.input_bytes,
+            "output_bytes": self.output_bytes,
+            "seconds": dict(self.seconds),
+        }
+
+
+#------------------------------------------------------------------------------
+# ExportStats
+#------------------------------------------------------------------------------
+
+class ExportStats(object):
+    """Per-file and total statistics for an export run."""
+
+    def __init__(self):
+        super(ExportStats, self).__init__()
+        self.start_time = time.time()
+        self.total = PhaseStats()
+        self.files = {}
+
+    def _file_stats(self, artwork_file_name):
+        file_stats = self.files.get(artwork_file_name)
+        if file_stats is None:
+            file_stats = PhaseStats()
+            self.files[artwork_file_name] = file_stats
+        return file_stats
+
+    def add_metadata_time(self, artwork_file_name, seconds):
+        self._file_stats(artwork_file_name).seconds["metadata"] += seconds
+        self.total.seconds["metadata"] += seconds
+
+    def add_write_time(self, artwork_file_name, seconds):
+        self._file_stats(artwork_file_name).seconds["write"] += seconds
+        self.total.seconds["write"] += seconds
+
+    def add_result(self, task, result):
+        self._file_stats(task.artwork_file_name).add_result(result, task.width, task.height)
+        self.total.add_result(result, task.width, task.height)
+
+    @property
+    def elapsed(self):
+        return time.time() - self.start_time
+
+    @property
+    def progress_line(self):
+        elapsed = max(self.elapsed, 1e-9)
+        return "%d images in %.1fs: %.1f images/sec, %.2f MB/sec in, %.2f MB/sec out" % (
+            self.total.images,
+            elapsed,
+            self.total.images / elapsed,
+            self.total.input_bytes / elapsed / 1e6,
+            self.total.output_bytes / elapsed / 1e6)
+
+    def to_jsonable(self):
+        elapsed = self.elapsed
+        return {
+            "elapsed_seconds": elapsed,
+            "images_per_second": (self.total.images / elapsed) if elapsed > 0 else 0,
+            "input_bytes_per_second": (self.total.input_bytes / elapsed) if elapsed > 0 else 0,
+            "output_bytes_per_second": (self.total.output_bytes / elapsed) if elapsed > 0 else 0,
+            "total": self.total.to_jsonable(),
+            "files": dict((artwork_file_name, file_stats.to_jsonable()) for artwork_file_name, file_stats in self.files.items()),
+        }
@@ -9,7 +9,26 @@
 #
 #-------------------------------------------------------------------------------
 
+import numpy
 from .binary_file import BinaryFile
+from .mach_o import MachOError, is_mach_o, read_mach_o_images
+
+#
+# Before iOS6, the names, sizes and offsets of the images in an .artwork
+# file were compiled into some framework binary, as an (unexported)
+# ArtworkSetMetadata record pointing at arrays of sizes and of CFStrings.
+#
+# FrameworkFile can find those records on its own (see
+# find_artwork_set_metadata): it locates every constant CFString in the
+# binary, finds the words that point back at the interesting ones, and
+# keeps the candidate records whose arrays all check out. All of the
+# searching is done with NumPy over the whole mapped file at once.
+#
+# Pointers in these structs are virtual addresses, which FrameworkFile
+# translates to file offsets through the binary's Mach-O segments (see
+# mach_o.py). The records use 32-bit pointers, so for fat binaries the
+# first 32-bit architecture is used unless another is asked for.
+#
 
 
 #-------------------------------------------------------------------------------
@@ -27,33 +46,13 @@ class CFString(object):
     
     def __init__(self, framework_file, offset):
         self.framework_file = framework_file
+        self.offset = offset
         self.objc_class, self.flags, self.pointer, self.length = self.framework_file.unpack("LLLL", offset)
         
     @property
     def string(self):
         """Read the const char* (string) portion of a CFString."""
-        s = None
-        
-        if (self.flags & CFString.kCFHasLengthByte):
-            assert ord(self.framework_file.data[self.pointer]) == self.length, "Invalid length or length byte."
-            self.pointer += 1
-        
-        if (self.flags & CFString.kCFIsUnicode):
-            bytes = self.framework_file.data[self.pointer:self.pointer + (self.length * 2)]
-            last_byte = self.framework_file.data[self.pointer + (self.length * 2)]
-            if self.is_little_endian:
-                s = bytes.decode('utf-16le')
-            else:
-                s = bytes.decode('utf-16be')
-        else:
-            bytes = self.framework_file.data[self.pointer:self.pointer + self.length]
-            last_byte = self.framework_file.data[self.pointer + self.length]
-            s = bytes.decode('ascii')
-        
-        if (self.flags & CFString.kCFHasNullByte):
-            assert last_byte == '\0', "Something went wrong reading a CFString."
-            
-        return s
+        return self.framework_file.cfstring_at(self.offset)
 
 
 #-------------------------------------------------------------------------------
@@ -65,16 +64,23 @@ class ArtworkSetMetadata(object):
 
     def __init__(self, framework_file, offset):
         self.framework_file = framework_file
+        self.offset = offset
         # sizes_offset points directly to an array of ArtworkMetadataInformation structs
         # names_offset is the address of an array of pointers to cfstrings. (yikes.)
-        self.set_name_offset, _, _, self.sizes_offset, self.names_offset, self.artwork_count, _, _, _, _ = self.framework_file.unpack("LLLLLHHLLL", offset)
+        set_name_pointer, _, _, sizes_pointer, names_pointer, self.artwork_count, _, _, _, _ = self.framework_file.unpack("LLLLLHHLLL", offset)
+        self.set_name_offset = self.framework_file.offset_for_pointer(set_name_pointer)
+        self.sizes_offset = self.framework_file.offset_for_pointer(sizes_pointer)
+        self.names_offset = self.framework_file.offset_for_pointer(names_pointer)
+        self._name = None
 
     def __repr__(self):
-        return "ArtworkSetInformation %s [sno: %x; so: %x; no: %x; ac: %d; e: %r; o: %x]" % (self.name, self.set_name_offset, self.sizes_offset, self.names_offset, self.artwork_count, self.endian, self.offset)
+        return "ArtworkSetInformation %s [sno: %x; so: %x; no: %x; ac: %d; e: %r; o: %x]" % (self.name, self.set_name_offset, self.sizes_offset, self.names_offset, self.artwork_count, self.framework_file._endian, self.offset)
     
     @property
     def name(self):
-        return CFString(self.framework_file, self.set_name_offset).string
+        if self._name is None:
+            self._name = self.framework_file.cfstring_at(self.set_name_offset)
+        return self._name
 
     @property
     def image_count(self):
@@ -89,16 +95,45 @@ class ArtworkSetMetadata(object):
         return "@2x" in self.name
     
     def iter_images(self):
-        size_offset = self.sizes_offset
-        name_offset = self.names_offset
+        framework_file = self.framework_file
+        count = self.artwork_count
+
+        # Read both arrays, and decode every name, in one go.
+        name_offsets = framework_file.offsets_for_pointers(numpy.array(framework_file.unpack("%dL" % count, self.names_offset), dtype=numpy.int64))
+        if (name_offsets < 0).any():
+            raise ValueError("A name pointer in %r isn't mapped from the file." % self)
+        names = framework_file.cfstrings_at(name_offsets.tolist())
+        sizes = framework_file.unpack("LHH" * count, self.sizes_offset)
+
+        for artwork_i in range(count):
+            offset_with_flags, width, height = sizes[artwork_i * 3:(artwork_i * 3) + 3]
+            yield ArtworkImageMetadata(framework_file, self, names[artwork_i], offset_with_flags, width, height)
 
-        # Walk through the artwork and gather information.
-        for artwork_i in range(self.artwork_count):
-            name_pointer = self.framework_file.read_long_at(name_offset)
-            artwork_image_metadata = ArtworkImageMetadata(self.framework_file, self, size_offset, name_pointer)
-            size_offset += ArtworkImageMetadata.SIZE
-            name_offset += 4
-            yield artwork_image_metadata
+    def is_plausible(self, cfstring_pointers, byte_size=None):
+        """
+        Whether this record's arrays look right: every name pointer is one
+        of cfstring_pointers (a sorted array), every size is sane and, if
+        the artwork file's byte_size is known, every image starts inside it.
+        """
+        framework_file = self.framework_file
+        count = self.artwork_count
+        if not (0 < count <= FrameworkFile.MAX_ARTWORK_COUNT):
+            return False
+        if (self.sizes_offset + (count * ArtworkImageMetadata.SIZE) > framework_file.data_length) or not framework_file.has_words_at(self.names_offset, count):
+            return False
+
+        names_index = framework_file.word_index(self.names_offset)
+        name_pointers = framework_file.words[names_index:names_index + count]
+        if not numpy.isin(name_pointers, cfstring_pointers).all():
+            return False
+
+        sizes = numpy.frombuffer(framework_file.data, dtype=framework_file.image_metadata_dtype, count=count, offset=self.sizes_offset)
+        widths, heights = sizes["width"], sizes["height"]
+        if not (((widths > 0) & (widths <= FrameworkFile.MAX_IMAGE_DIMENSION) & (heights > 0) & (heights <= FrameworkFile.MAX_IMAGE_DIMENSION)).all()):
+            return False
+        if (byte_size is not None) and ((sizes["offset_with_flags"] & 0xFFFFFF00) >= byte_size).any():
+            return False
+        return True
 
     def to_jsonable(self):
         return {
@@ -125,13 +160,14 @@ class ArtworkImageMetadata(object):
     """
     SIZE = 8
 
-    def __init__(self, framework_file, artwork_set_metadata, size_offset, name_pointer):
+    def __init__(self, framework_file, artwork_set_metadata, name, offset_with_flags, width, height):
         self.framework_file = framework_file
         self.artwork_set_metadata = artwork_set_metadata
-        offset_with_flags, self.width, self.height = self.framework_file.unpack("LHH", size_offset)
+        self.width = width
+        self.height = height
         self.flags = (offset_with_flags & 0xFF) # Flags only
         self.image_offset = (offset_with_flags & 0xFFFFFF00) # Remove the flags
-        self.name = CFString(self.framework_file, name_pointer).string
+        self.name = name
 
     @property
     def retina_appropriate_name(self):
@@ -157,15 +193,237 @@ class ArtworkImageMetadata(object):
 class FrameworkFile(BinaryFile):
     """
     Random hacknology collection for cracking open Mach-O
-    framework binaries, although we partially ignore the
-    Mach-O-ness of them.
+    framework binaries. Files that aren't Mach-O at all are read as if
+    their pointers were plain file offsets.
     """
-    def __init__(self, filename):
+    # Constant CFStrings all have flags 0x7C0, plus some of the
+    # kCFHasLengthByte, kCFHasNullByte and kCFIsUnicode bits.
+    CFSTRING_FLAGS = 0x7C0
+    CFSTRING_FLAGS_MASK = 0xFFFFFFFF & ~(CFString.kCFHasLengthByte | CFString.kCFHasNullByte | CFString.kCFIsUnicode)
+    MAX_CFSTRING_LENGTH = 4096
+
+    # Limits for a plausible ArtworkSetMetadata record.
+    MAX_ARTWORK_COUNT = 8192
+    MAX_IMAGE_DIMENSION = 4096
+
+    def __init__(self, filename, cpu_type=None):
         super(FrameworkFile, self).__init__(filename)
+        self._words = None
+        self._cfstring_offsets = None
+        self._cfstrings = {}  # Decoded strings, by CFString struct offset.
+        self.mach_o_image = None
+        self.mach_o_images = []
+        if is_mach_o(self.data):
+            self.mach_o_images = read_mach_o_images(self.data)
+            self.mach_o_image = self._choose_mach_o_image(cpu_type)
+            self._endian = self.mach_o_image.endian
+            self._words_offset = self.mach_o_image.file_offset
+            self._words_length = self.mach_o_image.size // 4
+        else:
+            self._words_offset = 0
+            self._words_length = self.data_length // 4
+
+    def _choose_mach_o_image(self, cpu_type):
+        for mach_o_image in self.mach_o_images:
+            if (cpu_type is None) and not mach_o_image.is_64_bit:
+                return mach_o_image
+            if mach_o_image.cpu_type == cpu_type:
+                return mach_o_image
+        if cpu_type is not None:
+            raise MachOError("%s has no architecture with CPU type %d." % (self.basename, cpu_type))
+        return self.mach_o_images[0]
 
     def read_artwork_set_metadata_at(self, offset):
+        if (offset < 0) or (offset + ArtworkSetMetadata.SIZE > self.data_length):
+            raise ValueError("No artwork set metadata can be at 0x%X; %s is only 0x%X bytes long." % (offset, self.filename, self.data_length))
         return ArtworkSetMetadata(self, offset)
 
+    #
+    # Pointers
+    #
+
+    def offset_for_pointer(self, pointer):
+        """The file offset that a pointer refers to."""
+        if self.mach_o_image is None:
+            return pointer
+        offset = self.mach_o_image.offset_for_address(pointer)
+        if offset is None:
+            raise ValueError("Pointer 0x%X isn't mapped from %s." % (pointer, self.basename))
+        return offset
+
+    def pointers_to(self, offsets):
+        """The pointer values that refer to the given file offsets (a NumPy array); -1 where none do."""
+        if self.mach_o_image is None:
+            return offsets
+        return self.mach_o_image.addresses_for_offsets(offsets)
+
+    def offsets_for_pointers(self, pointers):
+        """The file offsets that the given pointer values (a NumPy array) refer to; -1 where unmapped."""
+        if self.mach_o_image is None:
+            return pointers
+        return self.mach_o_image.offsets_for_addresses(pointers)
+
+    #
+    # Words: for a fat binary, only those of the chosen architecture
+    #
+
+    @property
+    def words(self):
+        """Every 4-byte aligned LONG in the (chosen architecture of the) file, as one NumPy array."""
+        if self._words is None:
+            self._words = numpy.frombuffer(self.data, dtype="%su4" % self._endian, count=self._words_length, offset=self._words_offset)
+        return self._words
+
+    def word_index(self, offset):
+        """The index into words of the LONG at offset (a number or a NumPy array)."""
+        return (offset - self._words_offset) // 4
+
+    def word_offset(self, index):
+        return self._words_offset + (index * 4)
+
+    def has_words_at(self, offset, count):
+        return ((offset - self._words_offset) % 4 == 0) and (offset >= self._words_offset) and (self.word_index(offset) + count <= self._words_length)
+
+    #
+    # CFStrings
+    #
+
+    def cfstring_at(self, offset):
+        """The string held by the CFString struct at offset."""
+        string = self._cfstrings.get(offset)
+        if string is None:
+            string = self.cfstrings_at([offset])[0]
+        return string
+
+    def cfstrings_at(self, offsets):
+        """
+        The strings held by the CFString structs at each of offsets. The
+        structs are read and checked all at once, and ASCII strings are
+        gathered and decoded in a single slice; every string is cached.
+        """
+        cfstrings = self._cfstrings
+        missing = sorted(set(offset for offset in offsets if offset not in cfstrings))
+        if missing:
+            missing = numpy.array(missing, dtype=numpy.int64)
+            if not all(self.has_words_at(offset, 4) for offset in (missing[0], missing[-1])) or ((missing - self._words_offset) % 4 != 0).any():
+                raise ValueError("CFString offsets outside of %s." % self.basename)
+            indexes = self.word_index(missing)
+            words = self.words
+            flags = words[indexes + 1]
+            lengths = words[indexes + 3].astype(numpy.int64)
+            starts = self.offsets_for_pointers(words[indexes + 2].astype(numpy.int64))
+            if (starts < 0).any():
+                raise ValueError("A CFString in %s points outside of the file." % self.basename)
+
+            file_bytes = numpy.frombuffer(self.data, dtype=numpy.uint8)
+            has_length_byte = (flags & CFString.kCFHasLengthByte) != 0
+            assert (file_bytes[starts[has_length_byte]] == lengths[has_length_byte]).all(), "Invalid length or length byte."
+            starts = starts + has_length_byte
+
+            is_unicode = (flags & CFString.kCFIsUnicode) != 0
+            ends = starts + numpy.where(is_unicode, 2 * lengths, lengths)
+            if (ends >= self.data_length).any():
+                raise ValueError("A CFString in %s runs past the end of the file." % self.basename)
+            has_null_byte = (flags & CFString.kCFHasNullByte) != 0
+            assert (file_bytes[ends[has_null_byte]] == 0).all(), "Something went wrong reading a CFString."
+
+            # One character per byte: gather every ASCII string into one
+            # buffer, decode that, and cut it up.
+            ascii_lengths = lengths[~is_unicode]
+            ascii_starts = starts[~is_unicode]
+            ascii_ends = numpy.cumsum(ascii_lengths)
+            gathered = numpy.repeat(ascii_starts - (ascii_ends - ascii_lengths), ascii_lengths) + numpy.arange(int(ascii_ends[-1]) if len(ascii_ends) else 0)
+            ascii = file_bytes[gathered].tobytes().decode("ascii")
+            end = 0
+            for offset, ascii_end in zip(missing[~is_unicode].tolist(), ascii_ends.tolist()):
+                cfstrings[offset] = ascii[end:ascii_end]
+                end = ascii_end
+
+            encoding = "utf-16le" if self.is_little_endian else "utf-16be"
+            for offset, start, unicode_end in zip(missing[is_unicode].tolist(), starts[is_unicode].tolist(), ends[is_unicode].tolist()):
+                cfstrings[offset] = self.data[start:unicode_end].decode(encoding)
+        return [cfstrings[offset] for offset in offsets]
+
+    @property
+    def image_metadata_dtype(self):
+        return numpy.dtype([("offset_with_flags", "%su4" % self._endian), ("width", "%su2" % self._endian), ("height", "%su2" % self._endian)])
+
+    @property
+    def cfstring_offsets(self):
+        """The offsets of everything that looks like a constant CFString struct, sorted."""
+        if self._cfstring_offsets is None:
+            words = self.words
+            # The flags are the second LONG of the struct.
+            flag_indexes = numpy.flatnonzero((words & FrameworkFile.CFSTRING_FLAGS_MASK) == FrameworkFile.CFSTRING_FLAGS)
+            indexes = flag_indexes[(flag_indexes >= 1) & (flag_indexes + 2 < len(words))] - 1
+            string_offsets = self.offsets_for_pointers(words[indexes + 2].astype(numpy.int64))
+            lengths = words[indexes + 3].astype(numpy.int64)
+            byte_lengths = numpy.where((words[indexes + 1] & CFString.kCFIsUnicode) != 0, 2 * lengths, lengths)
+            is_cfstring = (words[indexes] != 0) & (lengths > 0) & (lengths <= FrameworkFile.MAX_CFSTRING_LENGTH) & (string_offsets >= 0) & (string_offsets + byte_lengths < self.data_length)
+            self._cfstring_offsets = self.word_offset(indexes[is_cfstring].astype(numpy.int64))
+        return self._cfstring_offsets
+
+    def cfstring_offsets_for(self, string):
+        """The offsets of the ASCII constant CFStrings whose contents are exactly string."""
+        encoded = string.encode("ascii")
+        data = self.data
+        # Every place the string occurs, null terminated...
+        string_offsets = []
+        position = data.find(encoded + b"\0")
+        while position != -1:
+            string_offsets.append(position)
+            position = data.find(encoded + b"\0", position + 1)
+        if not string_offsets:
+            return numpy.zeros(0, dtype=numpy.int64)
+
+        # ...and every CFString pointing at one of those places.
+        cfstring_offsets = self.cfstring_offsets
+        indexes = self.word_index(cfstring_offsets)
+        pointed_at = self.offsets_for_pointers(self.words[indexes + 2].astype(numpy.int64))
+        lengths = self.words[indexes + 3]
+        return cfstring_offsets[numpy.isin(pointed_at, string_offsets) & (lengths == len(encoded))]
+
+    def find_artwork_set_metadata(self, set_names=None, byte_sizes=None):
+        """
+        Find the ArtworkSetMetadata records in this binary, optionally only
+        those for the named sets. byte_sizes, a dict of set name to .artwork
+        file size, tightens validation for the sets whose files are at hand.
+        """
+        if (self.mach_o_image is not None) and self.mach_o_image.is_64_bit:
+            raise MachOError("Artwork set metadata is only found in 32-bit binaries.")
+        byte_sizes = byte_sizes or {}
+        words = self.words
+        all_pointers = numpy.unique(self.pointers_to(self.cfstring_offsets))
+        if set_names is None:
+            name_pointers = all_pointers
+        else:
+            name_pointers = numpy.unique(numpy.concatenate([self.pointers_to(self.cfstring_offsets_for(set_name)) for set_name in set_names] + [numpy.zeros(0, dtype=numpy.int64)]))
+        all_pointers, name_pointers = all_pointers[all_pointers >= 0], name_pointers[name_pointers >= 0]
+
+        # Candidate records start with a pointer to a set name...
+        indexes = numpy.flatnonzero(numpy.isin(words, name_pointers))
+        indexes = indexes[indexes + (ArtworkSetMetadata.SIZE // 4) <= len(words)]
+        # ...have a sane image count (a SHORT, in the sixth LONG)...
+        count_words = words[indexes + 5]
+        counts = (count_words & 0xFFFF) if self.is_little_endian else (count_words >> 16)
+        # ...and name pointer arrays inside the file, starting with a CFString.
+        names_offsets = self.offsets_for_pointers(words[indexes + 4].astype(numpy.int64))
+        sizes_offsets = self.offsets_for_pointers(words[indexes + 3].astype(numpy.int64))
+        names_indexes = self.word_index(names_offsets)
+        is_candidate = (counts > 0) & (counts <= FrameworkFile.MAX_ARTWORK_COUNT) & ((names_offsets - self._words_offset) % 4 == 0) & (names_indexes >= 0) & (names_indexes + counts <= len(words)) & (sizes_offsets >= 0) & (sizes_offsets + (ArtworkImageMetadata.SIZE * counts) <= self.data_length)
+        is_candidate[is_candidate] = numpy.isin(words[names_indexes[is_candidate]], all_pointers)
+
+        found = []
+        for index in indexes[is_candidate]:
+            artwork_set_metadata = self.read_artwork_set_metadata_at(self.word_offset(int(index)))
+            if not artwork_set_metadata.is_plausible(all_pointers):
+                continue
+            name = artwork_set_metadata.name
+            if (name in byte_sizes) and not artwork_set_metadata.is_plausible(all_pointers, byte_sizes[name]):
+                continue
+            found.append(artwork_set_metadata)
+        return found
+
 
 
 
@@ -0,0 +1,69 @@
+#-------------------------------------------------------------------------------
+#
+# iOS .artwork file extractor
+# (c)2008-2012 Dave Peck <davepeck [at] davepeck [dot] org> All Rights Reserved
+#
+# Released under the three-clause BSD license.
+#
+# http://github.com/davepeck/iOS-artwork/
+#
+#-------------------------------------------------------------------------------
+
+#
+# Metadata-only views of artwork files, for the list and inspect commands:
+# everything here comes from the image tables, and no pixel is read.
+#
+
+IMAGE_FIELDS = ("name", "width", "height", "offset", "is_greyscale", "row_stride", "pixel_span")
+
+FILE_FIELDS = ("file", "format", "set_name", "version", "image_count", "file_size", "is_retina", "pixel_bytes")
+
+
+def image_row(artwork_image):
+    return {
+        "name": artwork_image.name,
+        "width": artwork_image.width,
+        "height": artwork_image.height,
+        "offset": artwork_image.image_offset,
+        "is_greyscale": artwork_image.is_greyscale,
+        "row_stride": artwork_image.row_stride,
+        "pixel_span": artwork_image.pixel_span,
+    }
+
+
+def image_rows(artwork_set):
+    return [image_row(artwork_image) for artwork_image in artwork_set.iter_images()]
+
+
+def artwork_file_summary(artwork_file, file_name=None, rows=None):
+    """File-level facts about an artwork file; rows are its image_rows, if already at hand."""
+    artwork_set = artwork_file.artwork_set
+    if rows is None:
+        rows = image_rows(artwork_set)
+    return {
+        "file": file_name or artwork_file.filename,
+        "format": artwork_file.format_name,
+        "set_name": artwork_set.name,
+        "version": artwork_set.version,
+        "image_count": artwork_set.image_count,
+        "file_size": artwork_file.file_size,
+        "is_retina": artwork_set.is_retina,
+        "pixel_bytes": sum(row["pixel_span"] for row in rows),
+    }
+
+
+def tsv_value(value):
+    # Missing values (an added image's old size, say) are empty fields.
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    # Tabs and newlines would break the columns.
+    return str(value).replace("\t", " ").replace("\n", " ")
+
+
+def tsv_lines(rows, fields):
+    """A header line naming fields, then one tab-separated line per row."""
+    yield "\t".join(fields)
+    for row in rows:
+        yield "\t".join(tsv_value(row[field]) for field in fields)
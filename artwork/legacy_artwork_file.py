@@ -13,8 +13,8 @@ from __future__ import with_statement  # For compatibility with python 2.5 -- th
 
 import os
 import os.path
-import json
 from .artwork_file import ArtworkImage, ArtworkSet, ArtworkFile, WriteableArtworkFile
+from .legacy_metadata_index import LegacyMetadata, legacy_metadata_key, legacy_image_fields
 
 #
 # Legacy *.artwork files are found in iOS5 and earlier, and are also
@@ -37,6 +37,9 @@ from .artwork_file import ArtworkImage, ArtworkSet, ArtworkFile, WriteableArtwor
 # is not supported, although you could try and support it by going
 # back in time and running generate-from-macho-binary.py yourself.
 #
+# The json files are compiled into legacy_metadata/index.bin by
+# generate-legacy-index.py; see legacy_metadata_index.py.
+#
 
 
 #------------------------------------------------------------------------------
@@ -46,12 +49,7 @@ from .artwork_file import ArtworkImage, ArtworkSet, ArtworkFile, WriteableArtwor
 class LegacyArtworkImage(ArtworkImage):
     def __init__(self, artwork_file, artwork_set, jsonable):
         super(LegacyArtworkImage, self).__init__(artwork_file, artwork_set)
-        try:
-            self._name, self._width, self._height, self._image_offset, self._flags = jsonable
-        except Exception:
-            # iOS3 json files don't even have the flags info
-            self._name, self._width, self._height, self._image_offset = jsonable
-            self._flags = 0
+        self._name, self._width, self._height, self._image_offset, self._flags = legacy_image_fields(jsonable)
 
     @property
     def name(self):
@@ -69,6 +67,10 @@ class LegacyArtworkImage(ArtworkImage):
     def image_offset(self):
         return self._image_offset
 
+    @property
+    def flags(self):
+        return self._flags
+
     @property
     def is_greyscale(self):
         return (self._flags & 0x02) != 0
@@ -91,25 +93,38 @@ class LegacyArtworkSet(ArtworkSet):
     def image_count(self):
         return len(self._jsonable["images"])
 
+    def image_at(self, index):
+        return LegacyArtworkImage(self.artwork_file, self, self._jsonable["images"][index])
+
     def iter_images(self):
         for image_jsonable in self._jsonable["images"]:
             yield LegacyArtworkImage(self.artwork_file, self, image_jsonable)
 
+    def iter_names(self):
+        for image_jsonable in self._jsonable["images"]:
+            yield image_jsonable[0]
+
 
 #------------------------------------------------------------------------------
 # LegacyArtworkFile
 #------------------------------------------------------------------------------
 
 class LegacyArtworkFile(ArtworkFile):
-    def __init__(self, filename):
+    def __init__(self, filename, legacy_metadata_directory=None):
         super(LegacyArtworkFile, self).__init__(filename)
+        self._legacy_jsonable = None
+        self._artwork_set = None
+        # Defaults to the legacy_metadata/ directory that ships with this tool.
+        self._legacy_metadata_directory_override = legacy_metadata_directory
 
     def width_byte_packing(self, **kwargs):
         return 8
 
     @property
     def artwork_set(self):
-        return LegacyArtworkSet(self, self.legacy_jsonable)
+        if self._artwork_set is None:
+            self._artwork_set = LegacyArtworkSet(self, self.legacy_jsonable)
+        return self._artwork_set
 
     @property
     def _script_directory(self):
@@ -117,17 +132,23 @@ class LegacyArtworkFile(ArtworkFile):
 
     @property
     def _legacy_metadata_directory(self):
+        if self._legacy_metadata_directory_override is not None:
+            return self._legacy_metadata_directory_override
         return os.path.join(self._script_directory, "legacy_metadata")
 
+    @property
+    def _legacy_metadata(self):
+        return LegacyMetadata.for_directory(self._legacy_metadata_directory)
+
     @property
     def _legacy_metadata_json_file_name(self):
-        return os.path.join(self._legacy_metadata_directory, "%s-%d.json" % (self.basename, self.file_size))
+        return os.path.join(self._legacy_metadata_directory, legacy_metadata_key(self.basename, self.file_size))
 
     @property
     def legacy_jsonable(self):
-        with open(self._legacy_metadata_json_file_name) as f:
-            jsonable = json.loads(f.read())
-        return jsonable
+        if self._legacy_jsonable is None:
+            self._legacy_jsonable = self._legacy_metadata.jsonable(self.basename, self.file_size)
+        return self._legacy_jsonable
 
     @property
     def is_legacy(self):
@@ -137,10 +158,13 @@ class LegacyArtworkFile(ArtworkFile):
     def is_modern(self):
         return False
 
+    @property
+    def format_name(self):
+        return "legacy"
+
     @property
     def is_legacy_supported(self):
-        legacy_metadata_json_file_name = self._legacy_metadata_json_file_name
-        return os.path.exists(legacy_metadata_json_file_name)
+        return self._legacy_metadata.has(self.basename, self.file_size)
 
 
 
@@ -157,6 +181,6 @@ class WriteableLegacyArtworkFile(WriteableArtworkFile):
 
     @property
     def artwork_set(self):
-        return self.template_binary.artwork_set()
+        return self.template_binary.artwork_set
 
 
@@ -0,0 +1,283 @@
+#-------------------------------------------------------------------------------
+#
+# iOS .artwork file extractor
+# (c)2008-2012 Dave Peck <davepeck [at] davepeck [dot] org> All Rights Reserved
+#
+# Released under the three-clause BSD license.
+#
+# http://github.com/davepeck/iOS-artwork/
+#
+#-------------------------------------------------------------------------------
+
+from __future__ import with_statement  # For compatibility with python 2.5 -- this is legacy.
+
+import os
+import os.path
+import json
+import zlib
+import struct
+from .binary_file import BinaryFile
+
+#
+# The legacy_metadata/ directory holds one pretty-printed json file per
+# supported legacy artwork file, named <basename>-<file size>.json.
+# Parsing them is slow enough to matter when the tool is run thousands
+# of times, so generate-legacy-index.py compiles all of them into a
+# single compact binary table, legacy_metadata/index.bin, which is
+# memory-mapped and read lazily, once per process.
+#
+# The index records the size, modification time and CRC-32 of every json
+# file it was compiled from, and is only trusted while they all still
+# match: a json file whose modification time has changed (a fresh
+# checkout touches them all) is read and checksummed, and if its contents
+# changed too, the json files are read directly instead.
+#
+# The index is packed as follows (little endian):
+#
+# header:
+#   magic: 8 bytes, "ARTWKIDX"
+#   format_version: LONG
+#   set_count: LONG
+#   set_records_offset: LONG
+#   strings_offset: LONG
+# set_records: set_count array of 44-byte values, sorted by key, each of which is:
+#   key_offset: LONG -- string offset of the json file name
+#   file_size: LONG
+#   name_offset: LONG -- string offset of the json file's set name
+#   version_offset: LONG -- string offset of the iOS version
+#   image_count: LONG
+#   image_records_offset: LONG
+#   json_size: LONG -- size of the json file, in bytes
+#   json_crc32: LONG -- CRC-32 of the json file's contents
+#   json_mtime_ns: LONG LONG -- modification time of the json file, in nanoseconds
+# image_records: arrays of 16-byte values, each of which is:
+#   name_offset: LONG -- string offset of the image name
+#   width: SHORT
+#   height: SHORT
+#   image_offset: LONG
+#   flags: LONG -- for iOS3 json files, the offset's low bits (see legacy_image_fields)
+# strings: null-terminated utf-8 strings
+#
+
+
+def legacy_metadata_key(basename, file_size):
+    """The json file name, in legacy_metadata/, for a given legacy artwork file."""
+    return "%s-%d.json" % (basename, file_size)
+
+
+# iOS3-style json images are [name, width, height, offset], without flags,
+# but some (iOS 4.2.1's, for one) still carry the framework binary's flag
+# bits -- greyscale among them -- in the offset's low bits. Images always
+# start on a 4-byte boundary, so those two bits are flags.
+_OFFSET_FLAGS_MASK = 0x03
+
+
+def legacy_image_fields(image_jsonable):
+    """(name, width, height, image offset, flags) for one image of a legacy json file."""
+    if len(image_jsonable) > 4:
+        name, width, height, image_offset, flags = image_jsonable[:5]
+        return name, width, height, image_offset, flags
+    name, width, height, offset_with_flags = image_jsonable
+    return name, width, height, offset_with_flags & ~_OFFSET_FLAGS_MASK, offset_with_flags & _OFFSET_FLAGS_MASK
+
+
+#------------------------------------------------------------------------------
+# LegacyMetadataIndex
+#------------------------------------------------------------------------------
+
+class LegacyMetadataIndex(BinaryFile):
+    """Read-only access to a compiled legacy_metadata/index.bin file."""
+    MAGIC = b"ARTWKIDX"
+    FORMAT_VERSION = 4
+    HEADER_STRUCTURE = "8sLLLL"
+    SET_RECORD_STRUCTURE = "LLLLLLLLQ"
+    IMAGE_RECORD_STRUCTURE = "LHHLL"
+
+    def __init__(self, filename):
+        super(LegacyMetadataIndex, self).__init__(filename)
+        self._set_records = None
+
+    @property
+    def is_valid(self):
+        if self.data_length < struct.calcsize("<" + LegacyMetadataIndex.HEADER_STRUCTURE):
+            return False
+        magic, format_version, _, _, _ = self.unpack(LegacyMetadataIndex.HEADER_STRUCTURE, 0)
+        return (magic == LegacyMetadataIndex.MAGIC) and (format_version == LegacyMetadataIndex.FORMAT_VERSION)
+
+    @property
+    def set_records(self):
+        """Map of json file name -> (name_offset, version_offset, image_count, image_records_offset, json_size, json_crc32, json_mtime_ns)."""
+        if self._set_records is None:
+            _, _, set_count, set_records_offset, _ = self.unpack(LegacyMetadataIndex.HEADER_STRUCTURE, 0)
+            fields = self.unpack(LegacyMetadataIndex.SET_RECORD_STRUCTURE * set_count, set_records_offset)
+            set_records = {}
+            for i in range(0, len(fields), 9):
+                set_records[self.read_string_at(fields[i])] = fields[i + 2:i + 9]
+            self._set_records = set_records
+        return self._set_records
+
+    @property
+    def keys(self):
+        return set(self.set_records)
+
+    def __contains__(self, key):
+        return key in self.set_records
+
+    def is_current(self, key, json_file_name):
+        """Whether the json file is still the one that key was compiled from."""
+        json_size, json_crc32, json_mtime_ns = self.set_records[key][4:7]
+        try:
+            stat = os.stat(json_file_name)
+        except OSError:
+            return False
+        if stat.st_size != json_size:
+            return False
+        if stat.st_mtime_ns == json_mtime_ns:
+            return True
+        return json_file_crc32(json_file_name) == json_crc32
+
+    def read_string_at(self, offset):
+        end = self.data.find(b"\0", offset)
+        return self.data[offset:end].decode("utf-8")
+
+    def jsonable(self, key):
+        """
+        Return the same structure as the json file named key would hold,
+        except that every image has all five fields (see legacy_image_fields).
+        """
+        name_offset, version_offset, image_count, image_records_offset = self.set_records[key][0:4]
+        fields = self.unpack(LegacyMetadataIndex.IMAGE_RECORD_STRUCTURE * image_count, image_records_offset)
+        images = []
+        for i in range(0, len(fields), 5):
+            image_name_offset, width, height, image_offset, flags = fields[i:i + 5]
+            images.append([self.read_string_at(image_name_offset), width, height, image_offset, flags])
+        file_size = key[:-len(".json")].rpartition("-")[2]
+        return {
+            "images": images,
+            "name": self.read_string_at(name_offset),
+            "version": self.read_string_at(version_offset),
+            "byte_size": int(file_size),
+        }
+
+
+def json_file_crc32(json_file_name):
+    with open(json_file_name, "rb") as f:
+        return zlib.crc32(f.read()) & 0xFFFFFFFF
+
+
+def write_legacy_metadata_index(directory, index_file_name):
+    """Compile every json file in directory into a single index file. Returns the set count."""
+    keys = sorted(file_name for file_name in os.listdir(directory) if file_name.endswith(".json"))
+    header_size = struct.calcsize("<" + LegacyMetadataIndex.HEADER_STRUCTURE)
+    set_record_size = struct.calcsize("<" + LegacyMetadataIndex.SET_RECORD_STRUCTURE)
+    image_record_size = struct.calcsize("<" + LegacyMetadataIndex.IMAGE_RECORD_STRUCTURE)
+
+    strings = bytearray()
+    string_offsets = {}
+
+    def string_offset(s):
+        # Offsets are relative to the string pool until the pool's position is known.
+        if s not in string_offsets:
+            string_offsets[s] = len(strings)
+            strings.extend(s.encode("utf-8") + b"\0")
+        return string_offsets[s]
+
+    set_records = []
+    image_records = bytearray()
+    image_records_offset = header_size + (set_record_size * len(keys))
+    for key in keys:
+        json_file_name = os.path.join(directory, key)
+        stat = os.stat(json_file_name)
+        with open(json_file_name, "rb") as f:
+            json_data = f.read()
+        jsonable = json.loads(json_data.decode("utf-8"))
+        file_size = int(key[:-len(".json")].rpartition("-")[2])
+        json_stamp = (len(json_data), zlib.crc32(json_data) & 0xFFFFFFFF, stat.st_mtime_ns)
+        set_records.append((key, file_size, jsonable["name"], jsonable["version"], len(jsonable["images"]), image_records_offset + len(image_records), json_stamp))
+        for image_jsonable in jsonable["images"]:
+            name, width, height, image_offset, flags = legacy_image_fields(image_jsonable)
+            image_records.extend(struct.pack("<" + LegacyMetadataIndex.IMAGE_RECORD_STRUCTURE, string_offset(name), width, height, image_offset, flags))
+
+    strings_offset = image_records_offset + len(image_records)
+    # Now that the pool's position is known, patch string offsets into the image records.
+    for i in range(0, len(image_records), image_record_size):
+        name_offset = struct.unpack_from("<L", image_records, i)[0]
+        struct.pack_into("<L", image_records, i, strings_offset + name_offset)
+
+    data = bytearray(struct.pack("<" + LegacyMetadataIndex.HEADER_STRUCTURE, LegacyMetadataIndex.MAGIC, LegacyMetadataIndex.FORMAT_VERSION, len(keys), header_size, strings_offset))
+    for key, file_size, name, version, image_count, records_offset, json_stamp in set_records:
+        data.extend(struct.pack("<" + LegacyMetadataIndex.SET_RECORD_STRUCTURE, strings_offset + string_offset(key), file_size, strings_offset + string_offset(name), strings_offset + string_offset(version), image_count, records_offset, *json_stamp))
+    data.extend(image_records)
+    data.extend(strings)
+
+    with open(index_file_name, "wb") as f:
+        f.write(data)
+    return len(keys)
+
+
+#------------------------------------------------------------------------------
+# LegacyMetadata
+#------------------------------------------------------------------------------
+
+class LegacyMetadata(object):
+    """
+    All of the legacy metadata found in a legacy_metadata/ directory.
+
+    The directory is listed once, and index.bin is used whenever it covers
+    exactly the json files present, as they are now; otherwise (say, someone
+    added or edited a json file and didn't regenerate the index) the json
+    files are read directly.
+    Use for_directory() to share a single instance per process.
+    """
+    INDEX_FILE_NAME = "index.bin"
+
+    _instances = {}
+
+    @classmethod
+    def for_directory(cls, directory):
+        instance = cls._instances.get(directory)
+        if instance is None:
+            instance = cls(directory)
+            cls._instances[directory] = instance
+        return instance
+
+    def __init__(self, directory):
+        super(LegacyMetadata, self).__init__()
+        self.directory = directory
+        self._keys = None
+        self._index = None
+
+    def _load(self):
+        try:
+            self._keys = set(file_name for file_name in os.listdir(self.directory) if file_name.endswith(".json"))
+        except OSError:
+            self._keys = set()
+        index_file_name = os.path.join(self.directory, LegacyMetadata.INDEX_FILE_NAME)
+        if os.path.exists(index_file_name):
+            index = LegacyMetadataIndex(index_file_name)
+            if index.is_valid and (index.keys == self._keys) and all(index.is_current(key, os.path.join(self.directory, key)) for key in self._keys):
+                self._index = index
+
+    @property
+    def keys(self):
+        if self._keys is None:
+            self._load()
+        return self._keys
+
+    @property
+    def index(self):
+        """The compiled index, or None if it is missing or out of date."""
+        if self._keys is None:
+            self._load()
+        return self._index
+
+    def has(self, basename, file_size):
+        return legacy_metadata_key(basename, file_size) in self.keys
+
+    def jsonable(self, basename, file_size):
+        key = legacy_metadata_key(basename, file_size)
+        if self.index is not None:
+            return self.index.jsonable(key)
+        with open(os.path.join(self.directory, key)) as f:
+            jsonable = json.loads(f.read())
+        return jsonable
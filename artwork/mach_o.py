@@ -0,0 +1,232 @@
+#-------------------------------------------------------------------------------
+#
+# iOS .artwork file extractor
+# (c)2008-2012 Dave Peck <davepeck [at] davepeck [dot] org> All Rights Reserved
+#
+# Released under the three-clause BSD license.
+#
+# http://github.com/davepeck/iOS-artwork/
+#
+#-------------------------------------------------------------------------------
+
+import bisect
+import struct
+import numpy
+
+#
+# Just enough Mach-O to turn the pointers inside a framework binary into
+# file offsets: the (possibly fat) header, and the segments and sections
+# named by its LC_SEGMENT / LC_SEGMENT_64 load commands.
+#
+# See <mach-o/loader.h> and <mach-o/fat.h>. Everything is parsed once, up
+# front; translating an address is then a bisect over the segments.
+#
+
+FAT_MAGIC = 0xCAFEBABE
+FAT_MAGIC_64 = 0xCAFEBABF
+MH_MAGIC = 0xFEEDFACE
+MH_CIGAM = 0xCEFAEDFE
+MH_MAGIC_64 = 0xFEEDFACF
+MH_CIGAM_64 = 0xCFFAEDFE
+
+LC_SEGMENT = 0x1
+LC_SEGMENT_64 = 0x19
+
+CPU_TYPE_ARM = 12
+CPU_ARCH_ABI64 = 0x01000000
+
+
+class MachOError(Exception):
+    pass
+
+
+def _name(raw):
+    return raw.split(b"\0", 1)[0].decode("ascii", "replace")
+
+
+#------------------------------------------------------------------------------
+# MachOSection, MachOSegment
+#------------------------------------------------------------------------------
+
+class MachOSection(object):
+    def __init__(self, name, segment_name, address, size, file_offset):
+        super(MachOSection, self).__init__()
+        self.name = name
+        self.segment_name = segment_name
+        self.address = address
+        self.size = size
+        self.file_offset = file_offset
+
+    def __repr__(self):
+        return "MachOSection %s,%s [addr: %x; size: %x; off: %x]" % (self.segment_name, self.name, self.address, self.size, self.file_offset)
+
+
+class MachOSegment(object):
+    def __init__(self, name, address, vm_size, file_offset, file_size, sections):
+        super(MachOSegment, self).__init__()
+        self.name = name
+        self.address = address
+        self.vm_size = vm_size
+        self.file_offset = file_offset
+        self.file_size = file_size
+        self.sections = sections
+
+    def __repr__(self):
+        return "MachOSegment %s [addr: %x; vmsize: %x; off: %x; filesize: %x]" % (self.name, self.address, self.vm_size, self.file_offset, self.file_size)
+
+
+#------------------------------------------------------------------------------
+# MachOImage
+#------------------------------------------------------------------------------
+
+class MachOImage(object):
+    """
+    One (thin) Mach-O image inside a binary file: its endianness, word
+    size, segments and sections. file_offset is where the image starts in
+    the file -- non-zero for one architecture of a fat binary -- and every
+    offset it hands out is relative to the start of the file.
+    """
+    def __init__(self, data, file_offset=0, size=None):
+        super(MachOImage, self).__init__()
+        self.file_offset = file_offset
+        self.size = (len(data) - file_offset) if size is None else size
+
+        # Load commands must lie inside the image, and the image inside the file.
+        end = min(len(data), file_offset + self.size)
+        if file_offset + 4 > end:
+            raise MachOError("Truncated Mach-O header at %d." % file_offset)
+        magic = struct.unpack_from("<L", data, file_offset)[0]
+        if magic in (MH_MAGIC, MH_MAGIC_64):
+            self.endian = "<"
+        elif magic in (MH_CIGAM, MH_CIGAM_64):
+            self.endian = ">"
+        else:
+            raise MachOError("No Mach-O header at %d." % file_offset)
+        self.is_64_bit = magic in (MH_MAGIC_64, MH_CIGAM_64)
+        header_size = 32 if self.is_64_bit else 28
+        if file_offset + header_size > end:
+            raise MachOError("Truncated Mach-O header at %d." % file_offset)
+        self.cpu_type, self.cpu_subtype, self.file_type, command_count, _, _ = struct.unpack_from(self.endian + "llLLLL", data, file_offset + 4)
+
+        self.segments = []
+        offset = file_offset + header_size
+        for i in range(command_count):
+            if offset + 8 > end:
+                raise MachOError("Load command %d at %d runs past the end of the image." % (i, offset))
+            command, command_size = struct.unpack_from(self.endian + "LL", data, offset)
+            if command_size < 8:
+                raise MachOError("Bad load command size %d at %d." % (command_size, offset))
+            if offset + command_size > end:
+                raise MachOError("Load command %d at %d (%d bytes) runs past the end of the image." % (i, offset, command_size))
+            if command == LC_SEGMENT:
+                self.segments.append(self._read_segment(data, offset, command_size, "16sLLLLllLL", "16s16sLLLLLLLLL", 68))
+            elif command == LC_SEGMENT_64:
+                self.segments.append(self._read_segment(data, offset, command_size, "16sQQQQllLL", "16s16sQQLLLLLLLL", 80))
+            offset += command_size
+
+        # Only the part of each segment that is backed by the file can be
+        # translated; zero-fill (and __PAGEZERO) can't.
+        mapped = sorted((segment for segment in self.segments if segment.file_size > 0), key=lambda segment: segment.address)
+        self._addresses = [segment.address for segment in mapped]
+        self._address_ends = [segment.address + min(segment.file_size, segment.vm_size) for segment in mapped]
+        self._address_file_offsets = [segment.file_offset for segment in mapped]
+        by_offset = sorted(mapped, key=lambda segment: segment.file_offset)
+        self._file_offsets = [segment.file_offset for segment in by_offset]
+        self._file_offset_ends = [segment.file_offset + min(segment.file_size, segment.vm_size) for segment in by_offset]
+        self._file_offset_addresses = [segment.address for segment in by_offset]
+
+    def _read_segment(self, data, offset, command_size, segment_structure, section_structure, section_size):
+        segment_end = offset + 8 + struct.calcsize(self.endian + segment_structure)
+        if segment_end > offset + command_size:
+            raise MachOError("Segment command at %d is too short (%d bytes)." % (offset, command_size))
+        name, address, vm_size, file_offset, file_size, _, _, section_count, _ = struct.unpack_from(self.endian + segment_structure, data, offset + 8)
+        if segment_end + (section_count * section_size) > offset + command_size:
+            raise MachOError("Segment command at %d (%d bytes) is too short for its %d sections." % (offset, command_size, section_count))
+        sections = []
+        section_offset = segment_end
+        for i in range(section_count):
+            section_name, segment_name, section_address, size, section_file_offset = struct.unpack_from(self.endian + section_structure, data, section_offset)[:5]
+            sections.append(MachOSection(_name(section_name), _name(segment_name), section_address, size, (self.file_offset + section_file_offset) if section_file_offset else 0))
+            section_offset += section_size
+        return MachOSegment(_name(name), address, vm_size, self.file_offset + file_offset, file_size, sections)
+
+    @property
+    def pointer_size(self):
+        return 8 if self.is_64_bit else 4
+
+    def segment_named(self, name):
+        for segment in self.segments:
+            if segment.name == name:
+                return segment
+        return None
+
+    def section_named(self, segment_name, section_name):
+        segment = self.segment_named(segment_name)
+        if segment is not None:
+            for section in segment.sections:
+                if section.name == section_name:
+                    return section
+        return None
+
+    def offset_for_address(self, address):
+        """The file offset of a virtual address, or None if no segment maps it from the file."""
+        i = bisect.bisect_right(self._addresses, address) - 1
+        if (i >= 0) and (address < self._address_ends[i]):
+            return self._address_file_offsets[i] + (address - self._addresses[i])
+        return None
+
+    def address_for_offset(self, offset):
+        """The virtual address of a file offset, or None if no segment maps it."""
+        i = bisect.bisect_right(self._file_offsets, offset) - 1
+        if (i >= 0) and (offset < self._file_offset_ends[i]):
+            return self._file_offset_addresses[i] + (offset - self._file_offsets[i])
+        return None
+
+    def offsets_for_addresses(self, addresses):
+        """offset_for_address over a NumPy array; -1 where unmapped."""
+        return _translate(addresses, self._addresses, self._address_ends, self._address_file_offsets)
+
+    def addresses_for_offsets(self, offsets):
+        """address_for_offset over a NumPy array; -1 where unmapped."""
+        return _translate(offsets, self._file_offsets, self._file_offset_ends, self._file_offset_addresses)
+
+
+def _translate(values, starts, ends, targets):
+    values = numpy.asarray(values, dtype=numpy.int64)
+    if not starts:
+        return numpy.full(values.shape, -1, dtype=numpy.int64)
+    starts, ends, targets = numpy.array(starts, dtype=numpy.int64), numpy.array(ends, dtype=numpy.int64), numpy.array(targets, dtype=numpy.int64)
+    i = numpy.searchsorted(starts, values, side="right") - 1
+    clipped = numpy.maximum(i, 0)
+    is_mapped = (i >= 0) & (values < ends[clipped])
+    return numpy.where(is_mapped, targets[clipped] + (values - starts[clipped]), -1)
+
+
+#------------------------------------------------------------------------------
+# Reading (possibly fat) binaries
+#------------------------------------------------------------------------------
+
+def read_mach_o_images(data):
+    """Every Mach-O image in data: one for a thin binary, one per architecture for a fat one."""
+    if len(data) < 8:
+        raise MachOError("Too short to be a Mach-O binary.")
+    magic = struct.unpack_from(">L", data, 0)[0]
+    if magic in (FAT_MAGIC, FAT_MAGIC_64):
+        architecture_count = struct.unpack_from(">L", data, 4)[0]
+        structure, size = (">llQQLL", 32) if magic == FAT_MAGIC_64 else (">llLLL", 20)
+        if 8 + (architecture_count * size) > len(data):
+            raise MachOError("The fat header's %d architectures run past the end of the file." % architecture_count)
+        images = []
+        for i in range(architecture_count):
+            _, _, offset, image_size = struct.unpack_from(structure, data, 8 + (i * size))[:4]
+            if offset + image_size > len(data):
+                raise MachOError("Architecture %d runs past the end of the file." % i)
+            images.append(MachOImage(data, offset, image_size))
+        return images
+    return [MachOImage(data)]
+
+
+def is_mach_o(data):
+    if len(data) < 4:
+        return False
+    return struct.unpack_from(">L", data, 0)[0] in (FAT_MAGIC, FAT_MAGIC_64, MH_MAGIC, MH_CIGAM, MH_MAGIC_64, MH_CIGAM_64)
@@ -9,6 +9,7 @@
 #
 #-------------------------------------------------------------------------------
 
+import array
 from .artwork_file import ArtworkImage, ArtworkSet, ArtworkFile, WriteableArtworkFile
 
 #
@@ -42,32 +43,40 @@ from .artwork_file import ArtworkImage, ArtworkSet, ArtworkFile, WriteableArtwor
 #------------------------------------------------------------------------------
 
 class ModernArtworkImage(ArtworkImage):
+    """
+    A cheap view onto one row of its ModernArtworkSet's image table.
+    """
+    __slots__ = ("_index",)
+
     SIZE = 12
 
-    def __init__(self, artwork_file, artwork_set, name, info_offset):
+    def __init__(self, artwork_file, artwork_set, index):
         super(ModernArtworkImage, self).__init__(artwork_file, artwork_set)
-        self._name = name
-        self._flags, self._width, self._height, self._image_offset = self.artwork_file.unpack("LHHL", info_offset)
+        self._index = index
 
     @property
     def name(self):
-        return self._name
+        return self.artwork_set._names[self._index]
 
     @property
     def width(self):
-        return self._width
+        return self.artwork_set._widths[self._index]
 
     @property
     def height(self):
-        return self._height
+        return self.artwork_set._heights[self._index]
 
     @property
     def image_offset(self):
-        return self._image_offset
+        return self.artwork_set._image_offsets[self._index]
+
+    @property
+    def flags(self):
+        return self.artwork_set._flags[self._index]
 
     @property
     def is_greyscale(self):
-        return (self._flags & 0x02) != 0
+        return (self.flags & 0x02) != 0
 
 
 #------------------------------------------------------------------------------
@@ -79,6 +88,15 @@ class ModernArtworkSet(ArtworkSet):
 
     def __init__(self, artwork_file):
         super(ModernArtworkSet, self).__init__(artwork_file)
+        self._image_count = None
+        # The image table, parsed in one pass on first use and stored as
+        # one array per column.
+        self._name_offsets = None
+        self._names = None
+        self._flags = None
+        self._widths = None
+        self._heights = None
+        self._image_offsets = None
 
     @property
     def version(self):
@@ -86,37 +104,75 @@ class ModernArtworkSet(ArtworkSet):
 
     @property
     def image_count(self):
-        return self.artwork_file.read_long_at(0)
+        if self._image_count is None:
+            self._image_count = self.artwork_file.read_long_at(0)
+        return self._image_count
 
     @property
     def _image_info_array_offset(self):
         return self.artwork_file.read_long_at(4)
 
+    def _load_image_table(self):
+        if self._names is not None:
+            return
+        count = self.image_count
+        name_offsets = self.artwork_file.unpack("%dL" % count, ModernArtworkSet._NAME_OFFSET_ARRAY_OFFSET)
+        info = self.artwork_file.unpack("LHHL" * count, self._image_info_array_offset)
+
+        data = self.artwork_file.data
+        names = []
+        for i, name_offset in enumerate(name_offsets):
+            name_end = data.find(b"\0", name_offset)
+            if name_end == -1:
+                raise ValueError("Image name %d at %d isn't NUL-terminated inside %s." % (i, name_offset, self.name))
+            names.append(data[name_offset:name_end].decode("utf-8"))
+
+        self._name_offsets = array.array("I", name_offsets)
+        self._flags = array.array("I", info[0::4])
+        self._widths = array.array("H", info[1::4])
+        self._heights = array.array("H", info[2::4])
+        self._image_offsets = array.array("I", info[3::4])
+        self._names = names
+
+    def image_at(self, index):
+        self._load_image_table()
+        if not (0 <= index < self.image_count):
+            raise IndexError("No image %d in %s." % (index, self.name))
+        return ModernArtworkImage(self.artwork_file, self, index)
+
     def iter_images(self):
-        info_offset = self._image_info_array_offset
-        name_offset_offset = ModernArtworkSet._NAME_OFFSET_ARRAY_OFFSET
+        self._load_image_table()
         for i in range(self.image_count):
-            name_offset = self.artwork_file.read_long_at(name_offset_offset)
-            name = self.artwork_file.read_null_terminated_utf8_string_at(name_offset)
-            yield ModernArtworkImage(self.artwork_file, self, name, info_offset)
-            name_offset_offset += ModernArtworkFile.LONG
-            info_offset += ModernArtworkImage.SIZE
+            yield ModernArtworkImage(self.artwork_file, self, i)
+
+    def iter_names(self):
+        self._load_image_table()
+        return iter(self._names)
 
 
 #------------------------------------------------------------------------------
 # ModernArtworkFile
 #------------------------------------------------------------------------------
 
+def is_plausible_modern_header(image_count, image_info_array_offset, data_length):
+    """Whether a header's image count and table offset are plausible, and the tables fit in data_length bytes."""
+    name_offsets_end = ModernArtworkSet._NAME_OFFSET_ARRAY_OFFSET + (4 * image_count)
+    return (0 < image_count <= 4096) and (name_offsets_end <= image_info_array_offset) and (image_info_array_offset + (12 * image_count) <= data_length)
+
+
 class ModernArtworkFile(ArtworkFile):
-    def __init__(self, filename):
-        super(ModernArtworkFile, self).__init__(filename)
+    def __init__(self, filename, data=None):
+        super(ModernArtworkFile, self).__init__(filename, data)
+        self._artwork_set = None
 
     def width_byte_packing(self, is_greyscale, **kwargs):
         return 4 if is_greyscale else 1
 
     @property
     def artwork_set(self):
-        return ModernArtworkSet(self)
+        if self._artwork_set is None:
+            self._artwork_set = ModernArtworkSet(self)
+        return self._artwork_set
 
     @property
     def is_legacy(self):
@@ -126,10 +182,20 @@ class ModernArtworkFile(ArtworkFile):
     def is_modern(self):
         return True
 
+    @property
+    def format_name(self):
+        return "modern"
+
+    @property
+    def has_modern_header(self):
+        if self.data_length < 8:
+            return False
+        image_count, image_info_array_offset = self.unpack("LL", 0)
+        return is_plausible_modern_header(image_count, image_info_array_offset, self.data_length)
+
     @property
     def is_modern_supported(self):
-        artwork_set = self.artwork_set
-        return (artwork_set.image_count > 0) and (artwork_set.image_count <= 4096)
+        return self.has_modern_header
 
 
 #------------------------------------------------------------------------------
@@ -145,6 +211,6 @@ class WriteableModernArtworkFile(WriteableArtworkFile):
 
     @property
     def artwork_set(self):
-        return self.template_binary.artwork_set()
+        return self.template_binary.artwork_set
 
 
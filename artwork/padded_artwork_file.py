@@ -0,0 +1,277 @@
+#-------------------------------------------------------------------------------
+#
+# iOS .artwork file extractor
+# (c)2008-2012 Dave Peck <davepeck [at] davepeck [dot] org> All Rights Reserved
+#
+# Released under the three-clause BSD license.
+#
+# http://github.com/davepeck/iOS-artwork/
+#
+#-------------------------------------------------------------------------------
+
+from __future__ import with_statement  # For compatibility with python 2.5 -- this is legacy.
+
+import mmap
+from .binary_file import BinaryFile
+from .legacy_artwork_file import LegacyArtworkFile
+
+#
+# iOS10 @3x icon artwork files hold a run of same-sized square colour icons,
+# followed by a short trailer that ends with a 16-byte footer:
+#
+# image_size: LONG -- width and height of every icon, at offset -16
+# (unknown): LONG
+# icon_count: LONG -- at offset -8
+# magic: LONG -- at offset -4
+#
+# Every icon but the last fills out a 4096-byte aligned block; the last
+# icon's rows are followed straight away by the trailer. They are legacy
+# artwork files otherwise: their images are found through the json files
+# in legacy_metadata/, and in the iOS9 (and iOS 10.0) layout every pixel
+# row is padded to 8 pixels, as in any legacy file.
+#
+# Later iOS10 files pad every pixel row out further (to 64 bytes), and so
+# every icon's block is larger too. For 87 pixel icons that is 384 rather
+# than 352 bytes per row, and 36864 rather than 32768 bytes per icon.
+#
+# PaddedArtworkFile strips that padding, copying whole rows at a time
+# through strided NumPy views of the mapped file, either into a new file
+# (a few icons at a time, in constant memory) or into one buffer in memory.
+# UnpaddedArtworkFile reads a padded file as the legacy artwork file it
+# would be without the padding, without stripping it at all: each image's
+# pixels are read through a strided view of the padded rows.
+#
+
+_FOOTER_SIZE = 16
+_ICON_ALIGNMENT = 4096
+# Legacy rows are padded to 8 pixels of 4 bytes.
+_UNPADDED_ROW_ALIGNMENT = 32
+_ROW_ALIGNMENTS = (32, 64, 128, 256)
+
+
+def _byte_align(offset, alignment):
+    remainder = offset % alignment
+    if remainder != 0:
+        offset += (alignment - remainder)
+    return offset
+
+
+#------------------------------------------------------------------------------
+# PaddedArtworkFile
+#------------------------------------------------------------------------------
+
+class PaddedArtworkFile(BinaryFile):
+    """An iOS10 style icon artwork file, possibly with padded pixel rows."""
+    MAGIC = b"\xA2\x43\xB5\xDC"
+    OLD_MAGIC = b"\x91\x32\xA4\xCB"  # iOS8 - 9.2.1; never padded.
+    PIXEL_SIZE = 4
+
+    def __init__(self, filename, data=None):
+        super(PaddedArtworkFile, self).__init__(filename, data=data)
+        self._row_stride = None
+
+    @property
+    def magic(self):
+        return bytes(self.data[self.data_length - 4:self.data_length])
+
+    @property
+    def image_size(self):
+        return self.read_long_at(self.data_length - 16)
+
+    @property
+    def icon_count(self):
+        return self.read_long_at(self.data_length - 8)
+
+    @property
+    def is_valid(self):
+        return (self.data_length >= _FOOTER_SIZE) and (self.magic in (PaddedArtworkFile.MAGIC, PaddedArtworkFile.OLD_MAGIC))
+
+    def icon_stride(self, row_stride):
+        return _byte_align(self.image_size * row_stride, _ICON_ALIGNMENT)
+
+    def icons_length(self, row_stride, first_icon=0, count=None):
+        """Bytes from the start of first_icon to the end of the last of count icons (all of them, by default)."""
+        if count is None:
+            count = self.icon_count - first_icon
+        if first_icon + count == self.icon_count:
+            # The file's last icon has no block of its own.
+            return ((count - 1) * self.icon_stride(row_stride)) + (self.image_size * row_stride)
+        return count * self.icon_stride(row_stride)
+
+    @property
+    def unpadded_row_stride(self):
+        return _byte_align(self.image_size * PaddedArtworkFile.PIXEL_SIZE, _UNPADDED_ROW_ALIGNMENT)
+
+    @property
+    def row_stride(self):
+        """
+        The row stride actually used by this file: the widest row alignment
+        whose icons still fit in the file ahead of the footer.
+        """
+        if self._row_stride is None:
+            row_bytes = self.image_size * PaddedArtworkFile.PIXEL_SIZE
+            available = self.data_length - _FOOTER_SIZE
+            self._row_stride = self.unpadded_row_stride
+            for alignment in _ROW_ALIGNMENTS:
+                row_stride = _byte_align(row_bytes, alignment)
+                if self.icons_length(row_stride) <= available:
+                    self._row_stride = max(self._row_stride, row_stride)
+        return self._row_stride
+
+    @property
+    def is_padded(self):
+        return self.is_valid and (self.magic == PaddedArtworkFile.MAGIC) and (self.image_size > 0) and (self.icon_count > 0) and (self.row_stride != self.unpadded_row_stride)
+
+    @property
+    def trailer_offset(self):
+        return self.icons_length(self.row_stride)
+
+    @property
+    def unpadded_length(self):
+        return self.icons_length(self.unpadded_row_stride) + (self.data_length - self.trailer_offset)
+
+    def padded_offset(self, offset):
+        """The offset in this file of the byte at offset in the unpadded file."""
+        unpadded_row_stride = self.unpadded_row_stride
+        icon, icon_offset = divmod(offset, self.icon_stride(unpadded_row_stride))
+        row, column = divmod(icon_offset, unpadded_row_stride)
+        return (icon * self.icon_stride(self.row_stride)) + (row * self.row_stride) + column
+
+    def unpad_icons_into(self, buffer, first_icon, count):
+        """
+        Copy count icons, starting at first_icon, unpadded into the writable
+        buffer, which must hold icons_length(unpadded_row_stride, first_icon,
+        count) bytes.
+        """
+        import numpy
+        size = self.image_size
+        row_stride, unpadded_row_stride = self.row_stride, self.unpadded_row_stride
+        icon_stride, unpadded_icon_stride = self.icon_stride(row_stride), self.icon_stride(unpadded_row_stride)
+        offset = first_icon * icon_stride
+
+        source_rows = self.array_at(offset, (count, size, unpadded_row_stride), (icon_stride, row_stride, 1))
+        destination_rows = numpy.ndarray((count, size, unpadded_row_stride), dtype=numpy.uint8, buffer=buffer, strides=(unpadded_icon_stride, unpadded_row_stride, 1))
+        destination_rows[...] = source_rows
+
+        # The unpadded icon's tail (the gap up to the next 4096 byte boundary)
+        # is copied from the start of the padded icon's tail, as far as that
+        # goes. The file's last icon has no tail.
+        tail_count = min(count, self.icon_count - 1 - first_icon)
+        if tail_count <= 0:
+            return
+        tail_length = unpadded_icon_stride - (size * unpadded_row_stride)
+        copied_tail_length = min(tail_length, icon_stride - (size * row_stride))
+        source_tails = self.array_at(offset + (size * row_stride), (tail_count, copied_tail_length), (icon_stride, 1))
+        destination_tails = numpy.ndarray((tail_count, tail_length), dtype=numpy.uint8, buffer=buffer, offset=size * unpadded_row_stride, strides=(unpadded_icon_stride, 1))
+        destination_tails[:, :copied_tail_length] = source_tails
+        destination_tails[:, copied_tail_length:] = 0
+
+    def unpadded_data(self):
+        """The whole unpadded file, as one bytearray."""
+        data = bytearray(self.unpadded_length)
+        self.unpad_icons_into(data, 0, self.icon_count)
+        data[self.icons_length(self.unpadded_row_stride):] = self.data[self.trailer_offset:]
+        return data
+
+    def write_unpadded(self, file_name, icons_per_chunk=64):
+        """Stream the unpadded file to file_name; returns the number of bytes written."""
+        row_stride, unpadded_row_stride = self.row_stride, self.unpadded_row_stride
+        chunk = bytearray(icons_per_chunk * self.icon_stride(unpadded_row_stride))
+        # Icon blocks are page aligned, so the pages behind each chunk can be
+        # dropped once it is copied; otherwise the whole file ends up resident.
+        can_release = (not self.is_in_memory) and hasattr(mmap, "MADV_DONTNEED") and hasattr(self.data, "madvise")
+        written = 0
+        with open(file_name, "wb") as f:
+            for first_icon in range(0, self.icon_count, icons_per_chunk):
+                count = min(icons_per_chunk, self.icon_count - first_icon)
+                self.unpad_icons_into(chunk, first_icon, count)
+                length = self.icons_length(unpadded_row_stride, first_icon, count)
+                f.write(memoryview(chunk)[:length])
+                written += length
+                if can_release:
+                    self.data.madvise(mmap.MADV_DONTNEED, first_icon * self.icon_stride(row_stride), self.icons_length(row_stride, first_icon, count))
+            trailer = self.memoryview_at(self.trailer_offset, self.data_length - self.trailer_offset)
+            f.write(trailer)
+            written += len(trailer)
+        return written
+
+    def unpadded_artwork_file(self, legacy_metadata_directory=None):
+        """An UnpaddedArtworkFile reading this file."""
+        return UnpaddedArtworkFile(self.filename, legacy_metadata_directory, padded_file=self)
+
+
+#------------------------------------------------------------------------------
+# UnpaddedArtworkFile
+#------------------------------------------------------------------------------
+
+class UnpaddedArtworkFile(LegacyArtworkFile):
+    """
+    A padded artwork file, read as the legacy artwork file it would be
+    without its padding: its metadata is found by the unpadded file's size,
+    and images are read straight from the padded rows. Only data, if asked
+    for, is a whole unpadded copy. Export workers can open it by name like
+    any other file.
+    """
+    def __init__(self, filename, legacy_metadata_directory=None, padded_file=None):
+        super(UnpaddedArtworkFile, self).__init__(filename, legacy_metadata_directory)
+        self._padded_file = padded_file
+
+    @property
+    def padded_file(self):
+        if self._padded_file is None:
+            self._padded_file = PaddedArtworkFile(self.filename)
+        return self._padded_file
+
+    @property
+    def data(self):
+        if self._data is None:
+            self._data = self.padded_file.unpadded_data()
+            self._is_in_memory = True
+        return self._data
+
+    @property
+    def data_length(self):
+        return self.padded_file.unpadded_length
+
+    @property
+    def file_size(self):
+        return self.padded_file.unpadded_length
+
+    @property
+    def format_name(self):
+        return "padded"
+
+    def _padded_rows_at(self, offset, width, height, is_greyscale):
+        """The image's rows as (height, unpadded row stride) in the padded file, or None if it isn't laid out as an icon."""
+        padded_file = self.padded_file
+        unpadded_row_stride = padded_file.unpadded_row_stride
+        if self.row_stride(width, is_greyscale) != unpadded_row_stride:
+            return None
+        # Every row has to fall inside one of the icon's rows.
+        icon_offset = offset % padded_file.icon_stride(unpadded_row_stride)
+        if (icon_offset % unpadded_row_stride) + (width * self.pixel_width(is_greyscale)) > unpadded_row_stride:
+            return None
+        if icon_offset + self.pixel_span(width, height, is_greyscale) > padded_file.image_size * unpadded_row_stride:
+            return None
+        return padded_file.padded_offset(offset), padded_file.row_stride
+
+    def pixel_view_at(self, offset, width, height, is_greyscale):
+        """A memoryview of the image's pixel span as it would be unpadded; a copy of just this image."""
+        rows = self._padded_rows_at(offset, width, height, is_greyscale)
+        if rows is None:
+            return super(UnpaddedArtworkFile, self).pixel_view_at(offset, width, height, is_greyscale)
+        padded_offset, padded_row_stride = rows
+        span = self.pixel_span(width, height, is_greyscale)
+        row_stride = self.row_stride(width, is_greyscale)
+        padded_rows = self.padded_file.array_at(padded_offset, (height, row_stride), (padded_row_stride, 1))
+        return memoryview(padded_rows.tobytes()[:span])
+
+    def pixel_array_at(self, offset, width, height, is_greyscale):
+        """A zero-copy view of the image's pixels, strided over the padded rows."""
+        rows = self._padded_rows_at(offset, width, height, is_greyscale)
+        if rows is None:
+            return super(UnpaddedArtworkFile, self).pixel_array_at(offset, width, height, is_greyscale)
+        padded_offset, padded_row_stride = rows
+        if is_greyscale:
+            return self.padded_file.array_at(padded_offset, (height, width), (padded_row_stride, 1))
+        return self.padded_file.array_at(padded_offset, (height, width, self.color_pixel_size), (padded_row_stride, self.color_pixel_size, 1))
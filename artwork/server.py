@@ -0,0 +1,275 @@
+#-------------------------------------------------------------------------------
+#
+# iOS .artwork file extractor
+# (c)2008-2012 Dave Peck <davepeck [at] davepeck [dot] org> All Rights Reserved
+#
+# Released under the three-clause BSD license.
+#
+# http://github.com/davepeck/iOS-artwork/
+#
+#-------------------------------------------------------------------------------
+
+import json
+import hashlib
+import asyncio
+import collections
+import urllib.parse
+from .encoders import PNGEncoder
+from .export_manifest import artwork_file_identity
+from .inventory import image_rows, artwork_file_summary
+
+#
+# A small HTTP/1.1 server for artwork images, for tools that want them
+# one at a time and often. Every artwork file is opened (and mapped) once,
+# up front; images are found by name through their ArtworkSet, decoded
+# and encoded on demand in a thread, and the encoded bytes are kept in an
+# LRU cache bounded by their total size.
+#
+#   GET /                       json summary of every artwork set served
+#   GET /<set>/                 json list of the set's images
+#   GET /<set>/<image name>     the encoded image
+#
+# Image responses carry a strong ETag made from the artwork file's
+# identity (see export_manifest.artwork_file_identity), the image's
+# offset and the encoding options, and If-None-Match is honoured.
+#
+# Only the standard library is needed, so the server can be run and
+# exercised with nothing more than a local HTTP client.
+#
+
+CONTENT_TYPES = {
+    "png": "image/png",
+    "pam": "image/x-portable-arbitrarymap",
+}
+
+_REASONS = {
+    200: "OK",
+    304: "Not Modified",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    500: "Internal Server Error",
+}
+
+_MAX_HEADER_LINES = 100
+
+
+#------------------------------------------------------------------------------
+# EncodedImageCache
+#------------------------------------------------------------------------------
+
+class EncodedImageCache(object):
+    """A least-recently-used cache of encoded images, bounded by their total size in bytes."""
+    def __init__(self, max_bytes):
+        super(EncodedImageCache, self).__init__()
+        self.max_bytes = max_bytes
+        self.byte_count = 0
+        self.hit_count = 0
+        self.miss_count = 0
+        self.eviction_count = 0
+        self._entries = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key):
+        data = self._entries.get(key)
+        if data is None:
+            self.miss_count += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hit_count += 1
+        return data
+
+    def put(self, key, data):
+        """Cache data under key, evicting the least recently used entries to make room."""
+        if key in self._entries:
+            self.byte_count -= len(self._entries.pop(key))
+        if len(data) > self.max_bytes:
+            return
+        self._entries[key] = data
+        self.byte_count += len(data)
+        while self.byte_count > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.byte_count -= len(evicted)
+            self.eviction_count += 1
+
+    def to_jsonable(self):
+        return {
+            "entries": len(self._entries),
+            "bytes": self.byte_count,
+            "max_bytes": self.max_bytes,
+            "hits": self.hit_count,
+            "misses": self.miss_count,
+            "evictions": self.eviction_count,
+        }
+
+
+#------------------------------------------------------------------------------
+# ArtworkServer
+#------------------------------------------------------------------------------
+
+class ArtworkServer(object):
+    """
+    Serve the images of already opened artwork files over HTTP.
+    artwork_files maps the name used in URLs to an ArtworkFile.
+    """
+    def __init__(self, artwork_files, encoder=None, cache_bytes=64 * 1024 * 1024, rgba_greyscale=False):
+        super(ArtworkServer, self).__init__()
+        self.artwork_files = dict(artwork_files)
+        self.encoder = encoder if encoder is not None else PNGEncoder()
+        self.rgba_greyscale = rgba_greyscale
+        self.cache = EncodedImageCache(cache_bytes)
+        options = dict(self.encoder.options)
+        options["greyscale"] = "RGBA" if rgba_greyscale else "L"
+        self._options_json = json.dumps(options, sort_keys=True)
+        # Identities are sampled once, when a file is first served from.
+        self._identities = {}
+        # Encodes in progress, so concurrent requests for one image share it.
+        self._pending = {}
+        self._server = None
+
+    @property
+    def content_type(self):
+        return CONTENT_TYPES.get(self.encoder.extension, "application/octet-stream")
+
+    def etag_for(self, set_name, artwork_image):
+        identity = self._identities.get(set_name)
+        if identity is None:
+            identity = json.dumps(artwork_file_identity(self.artwork_files[set_name]), sort_keys=True)
+            self._identities[set_name] = identity
+        tag = hashlib.sha1(("%s\n%d\n%s" % (identity, artwork_image.image_offset, self._options_json)).encode("utf-8")).hexdigest()
+        return '"%s"' % tag
+
+    def encode_image(self, artwork_image):
+        return self.encoder.encode(artwork_image.get_pil_image(self.rgba_greyscale))
+
+    async def encoded_image(self, set_name, artwork_image):
+        """The encoded image, from the cache or freshly encoded in a worker thread."""
+        key = (set_name, artwork_image.image_offset)
+        data = self.cache.get(key)
+        if data is not None:
+            return data
+        pending = self._pending.get(key)
+        if pending is None:
+            pending = asyncio.get_running_loop().run_in_executor(None, self.encode_image, artwork_image)
+            self._pending[key] = pending
+            pending.add_done_callback(lambda future: self._encoded(key, future))
+        # Shielded, so that a cancelled request (a dropped connection, say)
+        # doesn't cancel the encode for everyone else waiting on it.
+        return await asyncio.shield(pending)
+
+    def _encoded(self, key, future):
+        """Done callback for a pending encode: cache the result, however many requests are still waiting for it."""
+        del self._pending[key]
+        if not future.cancelled() and (future.exception() is None):
+            self.cache.put(key, future.result())
+
+    #
+    # Routing
+    #
+
+    def _json_response(self, jsonable):
+        return 200, {"Content-Type": "application/json"}, json.dumps(jsonable, indent=4, sort_keys=True).encode("utf-8")
+
+    def _error_response(self, status, message=None):
+        return status, {"Content-Type": "text/plain; charset=utf-8"}, ("%s\n" % (message or _REASONS[status])).encode("utf-8")
+
+    async def respond(self, method, path, headers):
+        """(status, headers, body) for a request; the body is dropped for HEAD."""
+        if method not in ("GET", "HEAD"):
+            return self._error_response(405)
+        parts = urllib.parse.unquote(urllib.parse.urlsplit(path).path).split("/")[1:]
+
+        if parts in ([], [""]):
+            summaries = dict((set_name, artwork_file_summary(artwork_file, set_name)) for set_name, artwork_file in self.artwork_files.items())
+            return self._json_response({"sets": summaries, "cache": self.cache.to_jsonable()})
+
+        # Set names may themselves contain slashes (they mirror paths below a
+        # root directory), so the longest matching prefix names the set.
+        for split in range(len(parts), 0, -1):
+            set_name = "/".join(parts[:split])
+            if set_name in self.artwork_files:
+                image_name = "/".join(parts[split:])
+                break
+        else:
+            return self._error_response(404)
+
+        artwork_set = self.artwork_files[set_name].artwork_set
+        if image_name == "":
+            return self._json_response(image_rows(artwork_set))
+        artwork_image = artwork_set.get_image(image_name)
+        if artwork_image is None:
+            return self._error_response(404, "No image named %s in %s." % (image_name, set_name))
+
+        etag = self.etag_for(set_name, artwork_image)
+        response_headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if etag in [tag.strip() for tag in headers.get("if-none-match", "").split(",")]:
+            return 304, response_headers, b""
+        data = await self.encoded_image(set_name, artwork_image)
+        response_headers["Content-Type"] = self.content_type
+        return 200, response_headers, data
+
+    #
+    # HTTP
+    #
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                try:
+                    method, path, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    await self._write_response(writer, "GET", self._error_response(400), False)
+                    break
+                headers = {}
+                for i in range(_MAX_HEADER_LINES):
+                    line = await reader.readline()
+                    if not line.strip():
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                keep_alive = (version == "HTTP/1.1") and (headers.get("connection", "").lower() != "close")
+
+                try:
+                    response = await self.respond(method, path, headers)
+                except Exception as e:
+                    response = self._error_response(500, str(e))
+                await self._write_response(writer, method, response, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _write_response(self, writer, method, response, keep_alive):
+        status, headers, body = response
+        lines = ["HTTP/1.1 %d %s" % (status, _REASONS[status])]
+        headers = dict(headers)
+        headers["Content-Length"] = str(len(body))
+        headers["Connection"] = "keep-alive" if keep_alive else "close"
+        lines.extend("%s: %s" % item for item in sorted(headers.items()))
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+        if method != "HEAD":
+            writer.write(body)
+        await writer.drain()
+
+    async def start(self, host="127.0.0.1", port=8000):
+        """Start listening; returns the (host, port) actually bound, so port 0 picks a free one."""
+        self._server = await asyncio.start_server(self.handle_connection, host, port)
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def serve_forever(self):
+        async with self._server:
+            await self._server.serve_forever()
+
+    def close(self):
+        if self._server is not None:
+            self._server.close()
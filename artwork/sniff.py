@@ -0,0 +1,74 @@
+#-------------------------------------------------------------------------------
+#
+# iOS .artwork file extractor
+# (c)2008-2012 Dave Peck <davepeck [at] davepeck [dot] org> All Rights Reserved
+#
+# Released under the three-clause BSD license.
+#
+# http://github.com/davepeck/iOS-artwork/
+#
+#-------------------------------------------------------------------------------
+
+import os.path
+from .legacy_artwork_file import LegacyArtworkFile
+from .modern_artwork_file import ModernArtworkFile
+from .padded_artwork_file import PaddedArtworkFile, UnpaddedArtworkFile
+
+#
+# Tell what kind of artwork file a file is, and hand back a reader for it,
+# from a few fingerprints and with the file mapped once (padded files
+# twice, since their reader maps them for itself):
+#
+#   legacy  -- its name and size are in the legacy metadata index (the
+#              file isn't even opened to find out);
+#   padded  -- an iOS10 @3x icon file, by its footer magic and layout; it
+#              is a legacy file underneath, read through an
+#              UnpaddedArtworkFile if its name and unpadded size are in
+#              the legacy metadata index;
+#   modern  -- its header's image count and table offsets are plausible
+#              and inside the file;
+#
+# and anything else is unsupported. (Padded files without legacy metadata
+# are recognised, but have no reader.) Only the first and last pages of a
+# file are touched, so a batch run can sniff every file up front cheaply;
+# nothing is unpadded.
+#
+
+LEGACY = "legacy"
+MODERN = "modern"
+PADDED = "padded"
+UNSUPPORTED = "unsupported"
+
+
+def sniff_artwork_file(filename, legacy_metadata_directory=None):
+    """
+    (format, reader) for the artwork file: one of LEGACY, MODERN, PADDED
+    or UNSUPPORTED, and a reader for it -- None when it's unsupported.
+    """
+    if os.path.getsize(filename) < 8:
+        return UNSUPPORTED, None
+
+    legacy_file = LegacyArtworkFile(filename, legacy_metadata_directory)
+    if legacy_file.is_legacy_supported:
+        return LEGACY, legacy_file
+
+    # Everything from here on reads through the modern reader's mapping,
+    # which it owns (and closes); the padded reader only borrows it.
+    modern_file = ModernArtworkFile(filename)
+    padded_file = PaddedArtworkFile(filename, data=modern_file.data)
+    if padded_file.is_padded:
+        # Its legacy metadata is found by the size it has unpadded, which the
+        # footer gives. The reader keeps a mapping of its own.
+        unpadded_file = UnpaddedArtworkFile(filename, legacy_metadata_directory)
+        if unpadded_file.is_legacy_supported:
+            return PADDED, unpadded_file
+        return PADDED, None
+
+    if modern_file.is_modern_supported:
+        return MODERN, modern_file
+    return UNSUPPORTED, None
+
+
+def open_artwork_file(filename, legacy_metadata_directory=None):
+    """A legacy, modern or unpadded reader for the artwork file, or None if it isn't supported."""
+    return sniff_artwork_file(filename, legacy_metadata_directory)[1]
@@ -0,0 +1,302 @@
+#-------------------------------------------------------------------------------
+#
+# iOS .artwork file extractor
+# (c)2008-2012 Dave Peck <davepeck [at] davepeck [dot] org> All Rights Reserved
+#
+# Released under the three-clause BSD license.
+#
+# http://github.com/davepeck/iOS-artwork/
+#
+#-------------------------------------------------------------------------------
+
+from __future__ import with_statement  # For compatibility with python 2.5 -- this is legacy.
+
+import os
+import os.path
+import json
+import struct
+import numpy
+from .legacy_metadata_index import legacy_metadata_key
+from .padded_artwork_file import PaddedArtworkFile
+
+#
+# Apple's artwork files can't be redistributed, so benchmarks (and anyone
+# poking at the code without an SDK at hand) need made-up ones. These
+# functions write valid modern and legacy artwork files full of random,
+# correctly premultiplied pixels:
+#
+#   - modern files are self-contained: header, name offsets, 12-byte info
+#     records, names, then the pixel data (see modern_artwork_file.py);
+#   - legacy files are bare pixel data, paired with a json file written
+#     to a legacy_metadata directory of your choosing (see
+#     legacy_artwork_file.py);
+#   - icon files are legacy files of same-sized icons with a trailer,
+#     optionally with the iOS10 row padding (see padded_artwork_file.py).
+#
+
+
+#------------------------------------------------------------------------------
+# SyntheticImage
+#------------------------------------------------------------------------------
+
+class SyntheticImage(object):
+    """Name, size and colour space of one image to synthesize."""
+    GREYSCALE_FLAG = 0x02
+
+    def __init__(self, name, width, height, is_greyscale=False):
+        super(SyntheticImage, self).__init__()
+        self.name = name
+        self.width = width
+        self.height = height
+        self.is_greyscale = is_greyscale
+
+    @property
+    def flags(self):
+        return SyntheticImage.GREYSCALE_FLAG if self.is_greyscale else 0
+
+
+def synthetic_images(count, width, height, greyscale_every=4):
+    """count images of one size; every greyscale_every-th one is greyscale (0 for none)."""
+    return [
+        SyntheticImage("synthetic-%d.png" % i, width, height, (greyscale_every > 0) and (i % greyscale_every == 0))
+        for i in range(count)]
+
+
+def _byte_align(offset, alignment):
+    remainder = offset % alignment
+    if remainder != 0:
+        offset += (alignment - remainder)
+    return offset
+
+
+def _pixel_block(random, image, aligned_width):
+    """Random pixel rows for an image, padded out to aligned_width pixels."""
+    if image.is_greyscale:
+        block = numpy.zeros((image.height, aligned_width), dtype=numpy.uint8)
+        block[:, :image.width] = random.integers(0, 256, (image.height, image.width), dtype=numpy.uint8)
+    else:
+        block = numpy.zeros((image.height, aligned_width, 4), dtype=numpy.uint8)
+        alpha = random.integers(0, 256, (image.height, image.width, 1), dtype=numpy.uint16)
+        # Premultiplied colour never exceeds alpha.
+        colour = (random.integers(0, 256, (image.height, image.width, 3), dtype=numpy.uint16) * alpha) // 255
+        block[:, :image.width, 0:3] = colour
+        block[:, :image.width, 3:4] = alpha
+    return block.tobytes()
+
+
+def _pixel_data(random, images, start, aligned_width_for):
+    """Returns (pixel bytes, image offsets) for images packed from start onwards."""
+    data = bytearray()
+    offsets = []
+    for image in images:
+        # Keep every image 16-byte aligned, as Apple's files are.
+        data.extend(b"\0" * (_byte_align(start + len(data), 16) - (start + len(data))))
+        offsets.append(start + len(data))
+        data.extend(_pixel_block(random, image, aligned_width_for(image)))
+    return data, offsets
+
+
+#------------------------------------------------------------------------------
+# Modern artwork files
+#------------------------------------------------------------------------------
+
+def write_modern_artwork_file(file_name, images, seed=0):
+    """Write a self-contained (iOS6+) artwork file holding the given SyntheticImages."""
+    random = numpy.random.default_rng(seed)
+    count = len(images)
+    info_offset = 8 + (4 * count)
+    names_offset = info_offset + (12 * count)
+
+    names = bytearray()
+    name_offsets = []
+    for image in images:
+        name_offsets.append(names_offset + len(names))
+        names.extend(image.name.encode("utf-8") + b"\0")
+
+    pixels_offset = _byte_align(names_offset + len(names), 16)
+    # Greyscale rows are padded to 4 pixels; colour rows aren't padded.
+    pixels, image_offsets = _pixel_data(random, images, pixels_offset, lambda image: _byte_align(image.width, 4 if image.is_greyscale else 1))
+
+    header = bytearray(struct.pack("<LL", count, info_offset))
+    header.extend(struct.pack("<%dL" % count, *name_offsets))
+    for image, image_offset in zip(images, image_offsets):
+        header.extend(struct.pack("<LHHL", image.flags, image.width, image.height, image_offset))
+    header.extend(names)
+    header.extend(b"\0" * (pixels_offset - len(header)))
+
+    with open(file_name, "wb") as f:
+        f.write(header)
+        f.write(pixels)
+
+
+#------------------------------------------------------------------------------
+# Legacy artwork files
+#------------------------------------------------------------------------------
+
+def write_legacy_artwork_file(file_name, legacy_metadata_directory, images, version="5.1.0", seed=0):
+    """
+    Write a legacy (iOS5 and earlier) artwork file holding the given
+    SyntheticImages, and its json metadata into legacy_metadata_directory.
+    Open it with LegacyArtworkFile(file_name, legacy_metadata_directory).
+    """
+    random = numpy.random.default_rng(seed)
+    # Legacy rows are padded to 8 pixels, colour or not.
+    pixels, image_offsets = _pixel_data(random, images, 0, lambda image: _byte_align(image.width, 8))
+
+    with open(file_name, "wb") as f:
+        f.write(pixels)
+
+    _write_legacy_metadata(legacy_metadata_directory, os.path.basename(file_name), len(pixels), images, image_offsets, version)
+
+
+def _write_legacy_metadata(legacy_metadata_directory, basename, byte_size, images, image_offsets, version):
+    jsonable = {
+        "images": [[image.name, image.width, image.height, image_offset, image.flags] for image, image_offset in zip(images, image_offsets)],
+        "name": basename,
+        "version": version,
+        "byte_size": byte_size,
+    }
+    if not os.path.exists(legacy_metadata_directory):
+        os.makedirs(legacy_metadata_directory)
+    with open(os.path.join(legacy_metadata_directory, legacy_metadata_key(basename, byte_size)), "w") as f:
+        f.write(json.dumps(jsonable, indent=4))
+
+
+#------------------------------------------------------------------------------
+# Icon artwork files
+#------------------------------------------------------------------------------
+
+def write_icon_artwork_file(file_name, legacy_metadata_directory, images, row_alignment=32, version="10.0.1", seed=0):
+    """
+    Write an iOS10 style icon artwork file holding the given SyntheticImages,
+    which must be square colour images of one size, with pixel rows aligned
+    to row_alignment bytes: 32 for the plain legacy layout, 64 for the
+    padded one. Files written with the same images and seed hold the same
+    pixels and trailer whatever their padding, and the json metadata, keyed
+    by the unpadded file's size, is the same too. Returns that size.
+    """
+    random = numpy.random.default_rng(seed)
+    size = images[0].width
+    unpadded_icon_stride = _byte_align(_byte_align(size, 8) * 4 * size, 4096)
+    icon_stride = _byte_align(_byte_align(size * 4, row_alignment) * size, 4096)
+
+    data = bytearray()
+    for i, image in enumerate(images):
+        data.extend(b"\0" * ((i * icon_stride) - len(data)))
+        data.extend(_pixel_block(random, image, _byte_align(size * 4, row_alignment) // 4))
+    trailer = bytearray()
+    for image in images:
+        trailer.extend(image.name.encode("utf-8") + b"\0")
+    trailer.extend(struct.pack("<LLL", size, 0, len(images)) + PaddedArtworkFile.MAGIC)
+
+    with open(file_name, "wb") as f:
+        f.write(data)
+        f.write(trailer)
+
+    # Every icon but the last fills out a whole block; the trailer follows the last.
+    unpadded_length = ((len(images) - 1) * unpadded_icon_stride) + (_byte_align(size, 8) * 4 * size) + len(trailer)
+    image_offsets = [i * unpadded_icon_stride for i in range(len(images))]
+    _write_legacy_metadata(legacy_metadata_directory, os.path.basename(file_name), unpadded_length, images, image_offsets, version)
+    return unpadded_length
+
+
+#------------------------------------------------------------------------------
+# Framework binaries
+#------------------------------------------------------------------------------
+
+# Flags of a constant, null-terminated ASCII CFString.
+_CFSTRING_ASCII_FLAGS = 0x7C8
+_CFSTRING_ISA = 0x1000
+
+_PAGE_SIZE = 0x1000
+_TEXT_ADDRESS = 0x1000
+# A gap between the segments, so that no one offset-to-address delta works everywhere.
+_DATA_ADDRESS_GAP = 0x10000
+
+
+def _mach_o_header(segments):
+    """A 32-bit little-endian MH_DYLIB header with an LC_SEGMENT (and no sections) per (name, address, vm size, offset, file size)."""
+    header = bytearray(struct.pack("<LllLLLL", 0xFEEDFACE, 12, 9, 0x6, len(segments), 56 * len(segments), 0))
+    for name, address, vm_size, offset, file_size in segments:
+        header.extend(struct.pack("<LL16sLLLLllLL", 0x1, 56, name.encode("ascii"), address, vm_size, offset, file_size, 7, 5, 0, 0))
+    return header
+
+
+def write_framework_file(file_name, artwork_sets, filler_size=1 << 20, seed=0, fat=False):
+    """
+    Write a stand-in for a pre-iOS6 framework binary: a 32-bit Mach-O whose
+    __TEXT segment holds filler_size bytes of noise and every string, and
+    whose __DATA segment holds CFStrings, image size arrays, name pointer
+    arrays and one ArtworkSetMetadata record per (set name, SyntheticImages)
+    pair, as FrameworkFile.find_artwork_set_metadata expects. With fat=True
+    it is wrapped up in a fat binary, after a (bare) 64-bit architecture.
+    Returns the file offsets of the records, in order.
+    """
+    random = numpy.random.default_rng(seed)
+
+    # __TEXT: the header's page, noise, then strings.
+    text = bytearray(_PAGE_SIZE)
+    text.extend(random.integers(0, 256, filler_size, dtype=numpy.uint8).tobytes())
+    string_addresses = {}
+    for set_name, images in artwork_sets:
+        for string in [set_name] + [image.name for image in images]:
+            if string not in string_addresses:
+                string_addresses[string] = _TEXT_ADDRESS + len(text)
+                text.extend(string.encode("ascii") + b"\0")
+    text.extend(b"\0" * (_byte_align(len(text), _PAGE_SIZE) - len(text)))
+
+    # __DATA: everything with pointers in it.
+    data_address = _TEXT_ADDRESS + len(text) + _DATA_ADDRESS_GAP
+    data = bytearray()
+
+    def align():
+        data.extend(b"\0" * (_byte_align(len(data), 16) - len(data)))
+
+    def add_cfstring(string):
+        align()
+        address = data_address + len(data)
+        data.extend(struct.pack("<LLLL", _CFSTRING_ISA, _CFSTRING_ASCII_FLAGS, string_addresses[string], len(string)))
+        return address
+
+    record_offsets = []
+    for set_name, images in artwork_sets:
+        set_name_pointer = add_cfstring(set_name)
+        name_pointers = [add_cfstring(image.name) for image in images]
+
+        align()
+        sizes_pointer = data_address + len(data)
+        image_offset = 0
+        for image in images:
+            data.extend(struct.pack("<LHH", image_offset | image.flags, image.width, image.height))
+            image_offset += _byte_align(_byte_align(image.width, 8) * image.height * (1 if image.is_greyscale else 4), 4096)
+
+        align()
+        names_pointer = data_address + len(data)
+        data.extend(struct.pack("<%dL" % len(name_pointers), *name_pointers))
+
+        align()
+        record_offsets.append(len(text) + len(data))
+        data.extend(struct.pack("<LLLLLHHLLL", set_name_pointer, 0, 0, sizes_pointer, names_pointer, len(images), 0, 0, 0, 0))
+    data.extend(random.integers(0, 256, 4096, dtype=numpy.uint8).tobytes())
+
+    header = _mach_o_header([
+        ("__PAGEZERO", 0, _TEXT_ADDRESS, 0, 0),
+        ("__TEXT", _TEXT_ADDRESS, len(text), 0, len(text)),
+        ("__DATA", data_address, len(data), len(text), len(data)),
+    ])
+    text[0:len(header)] = header
+    mach_o = text + data
+
+    if fat:
+        # A bare arm64 header first, then the real (armv7) image a page later.
+        stub = struct.pack("<LllLLLLL", 0xFEEDFACF, 0x0100000C, 0, 0x6, 0, 0, 0, 0)
+        fat_header = struct.pack(">LL", 0xCAFEBABE, 2) + struct.pack(">llLLL", 0x0100000C, 0, _PAGE_SIZE, len(stub), 12) + struct.pack(">llLLL", 12, 9, 2 * _PAGE_SIZE, len(mach_o), 12)
+        prefix = bytearray(2 * _PAGE_SIZE)
+        prefix[0:len(fat_header)] = fat_header
+        prefix[_PAGE_SIZE:_PAGE_SIZE + len(stub)] = stub
+        record_offsets = [len(prefix) + record_offset for record_offset in record_offsets]
+        mach_o = prefix + mach_o
+
+    with open(file_name, "wb") as f:
+        f.write(mach_o)
+    return record_offsets
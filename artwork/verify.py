@@ -0,0 +1,259 @@
+#-------------------------------------------------------------------------------
+#
+# iOS .artwork file extractor
+# (c)2008-2012 Dave Peck <davepeck [at] davepeck [dot] org> All Rights Reserved
+#
+# Released under the three-clause BSD license.
+#
+# http://github.com/davepeck/iOS-artwork/
+#
+#-------------------------------------------------------------------------------
+
+#
+# Check an artwork file's image table against the file itself, before any
+# pixel is decoded: a corrupt file, or legacy metadata paired with the
+# wrong binary, would otherwise crash an export half way through or
+# quietly export garbage.
+#
+# The table is gathered into NumPy arrays -- for modern files straight
+# from the mapped header, without trusting the usual parser -- and every
+# check is one array operation over all of the images:
+#
+#   - every image's pixel span (row strides included) lies inside the file;
+#   - no two images, name strings or header tables overlap (images that
+#     share exactly the same pixels are allowed);
+#   - colour images start on a 4-byte boundary;
+#   - every name is non-empty, NUL-terminated, inside the file, valid
+#     UTF-8, and unique.
+#
+# Problems are errors, which make exporting the file unsafe, or warnings.
+# Overlapping images are only a warning for legacy files: their metadata
+# is Apple's own, taken from the framework binaries, and does pack an
+# image or two over the start of the next (iOS 4.2.1's
+# MobilePhonePackedImages.artwork, for one).
+#
+
+ERROR = "error"
+WARNING = "warning"
+
+_MAX_NAME_LENGTH = 1024
+_MAX_LISTED_NAMES = 5
+
+
+#------------------------------------------------------------------------------
+# VerifyProblem
+#------------------------------------------------------------------------------
+
+class VerifyProblem(object):
+    def __init__(self, severity, message, names=None):
+        super(VerifyProblem, self).__init__()
+        self.severity = severity
+        self.message = message
+        self.names = list(names or [])
+
+    @property
+    def is_error(self):
+        return self.severity == ERROR
+
+    def __repr__(self):
+        if not self.names:
+            return "%s: %s" % (self.severity, self.message)
+        listed = ", ".join(str(name) for name in self.names[:_MAX_LISTED_NAMES])
+        if len(self.names) > _MAX_LISTED_NAMES:
+            listed += ", ... (%d in all)" % len(self.names)
+        return "%s: %s: %s" % (self.severity, self.message, listed)
+
+    def to_jsonable(self):
+        return {"severity": self.severity, "message": self.message, "names": self.names}
+
+
+#------------------------------------------------------------------------------
+# Gathering the image table
+#------------------------------------------------------------------------------
+
+class _ImageTable(object):
+    """The image table as arrays, plus the byte ranges of whatever else the file's header occupies."""
+    def __init__(self, names, offsets, widths, heights, flags):
+        import numpy
+        super(_ImageTable, self).__init__()
+        self.names = names
+        self.offsets = numpy.asarray(offsets, dtype=numpy.int64)
+        self.widths = numpy.asarray(widths, dtype=numpy.int64)
+        self.heights = numpy.asarray(heights, dtype=numpy.int64)
+        self.is_greyscale = (numpy.asarray(flags, dtype=numpy.int64) & 0x02) != 0
+        # (label, start offsets, end offsets) of non-image byte ranges.
+        self.other_ranges = []
+
+
+def _read_names(data, data_length, name_offsets, problems):
+    """Decode the NUL-terminated names at name_offsets, checking them all at once; None where unreadable."""
+    import numpy
+    count = len(name_offsets)
+    names = [None] * count
+    is_inside = name_offsets < data_length
+    if not is_inside.all():
+        problems.append(VerifyProblem(ERROR, "name offsets point outside the file", ["#%d" % i for i in numpy.flatnonzero(~is_inside)]))
+    inside = numpy.flatnonzero(is_inside)
+    if len(inside) == 0:
+        return names, numpy.zeros(count, dtype=numpy.int64)
+
+    # One search for NULs over the stretch of the file that holds the names.
+    start = int(name_offsets[inside].min())
+    end = min(data_length, int(name_offsets[inside].max()) + _MAX_NAME_LENGTH + 1)
+    region = numpy.frombuffer(data, dtype=numpy.uint8, count=end - start, offset=start)
+    nuls = numpy.flatnonzero(region == 0) + start
+    next_nul = numpy.searchsorted(nuls, name_offsets[inside])
+    is_terminated = next_nul < len(nuls)
+    lengths = numpy.full(count, -1, dtype=numpy.int64)
+    lengths[inside[is_terminated]] = nuls[next_nul[is_terminated]] - name_offsets[inside[is_terminated]]
+
+    is_bad = is_inside & ((lengths <= 0) | (lengths > _MAX_NAME_LENGTH))
+    if is_bad.any():
+        problems.append(VerifyProblem(ERROR, "names are empty or not NUL-terminated", ["#%d" % i for i in numpy.flatnonzero(is_bad)]))
+    undecodable = []
+    for i in numpy.flatnonzero(is_inside & ~is_bad):
+        try:
+            names[i] = bytes(data[name_offsets[i]:name_offsets[i] + lengths[i]]).decode("utf-8")
+        except UnicodeDecodeError:
+            undecodable.append("#%d" % i)
+    if undecodable:
+        problems.append(VerifyProblem(ERROR, "names aren't valid UTF-8", undecodable))
+    return names, numpy.maximum(lengths, 0) + 1
+
+
+def _modern_image_table(artwork_file, problems):
+    import numpy
+    from .modern_artwork_file import ModernArtworkSet
+    if not artwork_file.has_modern_header:
+        problems.append(VerifyProblem(ERROR, "the header's image count or table offset is implausible"))
+        return None
+    data, data_length = artwork_file.data, artwork_file.data_length
+    image_count, image_info_array_offset = artwork_file.unpack("LL", 0)
+    endian = "<" if artwork_file.is_little_endian else ">"
+    name_offsets = numpy.frombuffer(data, dtype=endian + "u4", count=image_count, offset=ModernArtworkSet._NAME_OFFSET_ARRAY_OFFSET).astype(numpy.int64)
+    info = numpy.frombuffer(data, dtype=numpy.dtype([("flags", endian + "u4"), ("width", endian + "u2"), ("height", endian + "u2"), ("offset", endian + "u4")]), count=image_count, offset=image_info_array_offset)
+
+    names, name_lengths = _read_names(data, data_length, name_offsets, problems)
+    table = _ImageTable(names, info["offset"], info["width"], info["height"], info["flags"])
+    name_offsets_end = ModernArtworkSet._NAME_OFFSET_ARRAY_OFFSET + (4 * image_count)
+    table.other_ranges.append(("the header", numpy.array([0]), numpy.array([name_offsets_end])))
+    table.other_ranges.append(("the image info table", numpy.array([image_info_array_offset]), numpy.array([image_info_array_offset + (12 * image_count)])))
+    is_inside = name_offsets < data_length
+    table.other_ranges.append(("name strings", name_offsets[is_inside], (name_offsets + name_lengths)[is_inside]))
+    return table
+
+
+def _generic_image_table(artwork_file, problems):
+    names, offsets, widths, heights, flags = [], [], [], [], []
+    for artwork_image in artwork_file.artwork_set.iter_images():
+        names.append(artwork_image.name)
+        offsets.append(artwork_image.image_offset)
+        widths.append(artwork_image.width)
+        heights.append(artwork_image.height)
+        flags.append(artwork_image.flags)
+    empty = [i for i, name in enumerate(names) if not name]
+    if empty:
+        problems.append(VerifyProblem(ERROR, "names are empty", ["#%d" % i for i in empty]))
+    return _ImageTable(names, offsets, widths, heights, flags)
+
+
+#------------------------------------------------------------------------------
+# Checking it
+#------------------------------------------------------------------------------
+
+def _image_spans(artwork_file, table):
+    """(row strides, pixel spans) of every image, as ArtworkFile.row_stride and pixel_span would give them."""
+    import numpy
+    packing = numpy.where(table.is_greyscale, artwork_file.width_byte_packing(is_greyscale=True), artwork_file.width_byte_packing(is_greyscale=False))
+    pixel_width = numpy.where(table.is_greyscale, artwork_file.greyscale_pixel_size, artwork_file.color_pixel_size)
+    row_strides = ((table.widths + packing - 1) // packing) * packing * pixel_width
+    is_empty = (table.widths == 0) | (table.heights == 0)
+    spans = numpy.where(is_empty, 0, (row_strides * (table.heights - 1)) + (table.widths * pixel_width))
+    return row_strides, spans
+
+
+def _labels(table, indices):
+    return [table.names[i] if table.names[i] is not None else "#%d" % i for i in indices]
+
+
+def _check_overlaps(table, starts, ends, problems, severity=ERROR):
+    import numpy
+    # Every non-empty byte range in the file: images (kind 0), then the rest.
+    range_labels = [None] + [label for label, _, _ in table.other_ranges]
+    all_starts = [starts] + [other_starts for _, other_starts, _ in table.other_ranges]
+    all_ends = [ends] + [other_ends for _, _, other_ends in table.other_ranges]
+    kinds = numpy.concatenate([numpy.full(len(range_starts), kind) for kind, range_starts in enumerate(all_starts)])
+    indices = numpy.concatenate([numpy.arange(len(range_starts)) for range_starts in all_starts])
+    all_starts = numpy.concatenate(all_starts)
+    all_ends = numpy.concatenate(all_ends)
+    is_nonempty = all_ends > all_starts
+    order = numpy.lexsort((all_ends[is_nonempty], all_starts[is_nonempty]))
+    kinds, indices = kinds[is_nonempty][order], indices[is_nonempty][order]
+    all_starts, all_ends = all_starts[is_nonempty][order], all_ends[is_nonempty][order]
+    if len(all_starts) < 2:
+        return
+
+    # Each range against whichever range before it reaches furthest.
+    positions = numpy.arange(len(all_ends))
+    furthest_end = numpy.maximum.accumulate(all_ends)
+    furthest = numpy.maximum.accumulate(numpy.where(all_ends == furthest_end, positions, 0))[:-1]
+    is_overlapping = all_starts[1:] < furthest_end[:-1]
+    # Images over exactly the same bytes are aliases, not overlaps.
+    is_alias = (kinds[1:] == 0) & (kinds[furthest] == 0) & (all_starts[1:] == all_starts[furthest]) & (all_ends[1:] == all_ends[furthest])
+    overlapping = numpy.flatnonzero(is_overlapping & ~is_alias)
+    if len(overlapping) == 0:
+        return
+
+    def label(position):
+        if kinds[position] == 0:
+            return _labels(table, [indices[position]])[0]
+        return range_labels[kinds[position]]
+    pairs = ["%s and %s" % (label(furthest[i]), label(i + 1)) for i in overlapping]
+    problems.append(VerifyProblem(severity, "byte ranges overlap", pairs))
+
+
+def verify_artwork_file(artwork_file):
+    """Every problem found with the artwork file's image table, as a list of VerifyProblems."""
+    import numpy
+    problems = []
+    try:
+        if artwork_file.is_modern:
+            table = _modern_image_table(artwork_file, problems)
+        else:
+            table = _generic_image_table(artwork_file, problems)
+    except Exception as e:
+        problems.append(VerifyProblem(ERROR, "the image table can't be read (%s)" % e))
+        return problems
+    if table is None:
+        return problems
+
+    data_length = artwork_file.data_length
+    row_strides, spans = _image_spans(artwork_file, table)
+    ends = table.offsets + spans
+
+    is_outside = (table.offsets < 0) | (ends > data_length)
+    if is_outside.any():
+        problems.append(VerifyProblem(ERROR, "images run past the end of the file (%d bytes)" % data_length, _labels(table, numpy.flatnonzero(is_outside))))
+    _check_overlaps(table, table.offsets, numpy.minimum(ends, data_length), problems, ERROR if artwork_file.is_modern else WARNING)
+
+    is_misaligned = ~table.is_greyscale & (table.offsets % artwork_file.color_pixel_size != 0)
+    if is_misaligned.any():
+        problems.append(VerifyProblem(WARNING, "colour images don't start on a %d-byte boundary" % artwork_file.color_pixel_size, _labels(table, numpy.flatnonzero(is_misaligned))))
+    is_empty = spans == 0
+    if is_empty.any():
+        problems.append(VerifyProblem(WARNING, "images have no pixels", _labels(table, numpy.flatnonzero(is_empty))))
+
+    seen = set()
+    duplicates = []
+    for name in table.names:
+        if name is not None:
+            if name in seen:
+                duplicates.append(name)
+            seen.add(name)
+    if duplicates:
+        problems.append(VerifyProblem(WARNING, "names are used more than once", duplicates))
+    return problems
+
+
+def has_errors(problems):
+    return any(problem.is_error for problem in problems)
@@ -0,0 +1,245 @@
+#!/usr/bin/env python
+
+#-------------------------------------------------------------------------------
+#
+# iOS .artwork file extractor
+# (c)2008-2012 Dave Peck <davepeck [at] davepeck [dot] org> All Rights Reserved
+#
+# Released under the three-clause BSD license.
+#
+# http://github.com/davepeck/iOS-artwork/
+#
+#-------------------------------------------------------------------------------
+
+# benchmark-artwork.py
+#
+# Times the hot paths of this tool against synthetic artwork files (see
+# artwork/synthetic.py), so that no Apple artwork is needed.
+#
+# Run it as:
+#
+#   ./benchmark-artwork.py --save results.json
+#
+# and later, to check a change for regressions:
+#
+#   ./benchmark-artwork.py --compare results.json --threshold 1.25 --threshold decode=1.5
+#
+# which exits non-zero if any benchmark's best time grew by more than its
+# threshold (a ratio of new to baseline time).
+
+from __future__ import with_statement  # For compatibility with python 2.5 -- this is legacy.
+
+import os
+import os.path
+import sys
+import json
+import time
+import shutil
+import platform
+import tempfile
+from optparse import OptionParser
+
+from artwork.synthetic import synthetic_images, write_modern_artwork_file, write_legacy_artwork_file, write_framework_file
+from artwork.legacy_metadata_index import LegacyMetadata, write_legacy_metadata_index
+from artwork.legacy_artwork_file import LegacyArtworkFile
+from artwork.modern_artwork_file import ModernArtworkFile, WriteableModernArtworkFile
+from artwork.encoders import PNGEncoder
+from artwork.export import ArtworkExporter
+from artwork.framework_file import FrameworkFile
+
+
+#-------------------------------------------------------------------------------
+# Benchmarks
+#-------------------------------------------------------------------------------
+
+class Benchmarks(object):
+    """
+    Synthetic fixture files, and one bench_* method per benchmark. Each
+    benchmark returns a function that does the timed work once.
+    """
+    def __init__(self, directory, image_count, width, height, jobs):
+        super(Benchmarks, self).__init__()
+        self.directory = directory
+        self.jobs = jobs
+        images = synthetic_images(image_count, width, height)
+
+        self.modern_file_name = os.path.join(directory, "Synthetic@2x.artwork")
+        write_modern_artwork_file(self.modern_file_name, images)
+
+        self.legacy_metadata_directory = os.path.join(directory, "legacy_metadata")
+        self.legacy_file_name = os.path.join(directory, "SyntheticLegacy@2x.artwork")
+        write_legacy_artwork_file(self.legacy_file_name, self.legacy_metadata_directory, images)
+        write_legacy_metadata_index(self.legacy_metadata_directory, os.path.join(self.legacy_metadata_directory, LegacyMetadata.INDEX_FILE_NAME))
+
+        self.framework_file_name = os.path.join(directory, "SyntheticFramework")
+        write_framework_file(self.framework_file_name, [("Synthetic@2x", images), ("SyntheticLegacy@2x", images)], filler_size=16 << 20)
+
+        self.modern_file = ModernArtworkFile(self.modern_file_name)
+        self.modern_images = list(self.modern_file.artwork_set.iter_images())
+        self.pil_images = [artwork_image.get_pil_image() for artwork_image in self.modern_images]
+
+    @classmethod
+    def names(cls):
+        return [name[len("bench_"):] for name in sorted(dir(cls)) if name.startswith("bench_")]
+
+    def bench_header(self):
+        def run():
+            artwork_set = ModernArtworkFile(self.modern_file_name).artwork_set
+            for artwork_image in artwork_set.iter_images():
+                artwork_image.name, artwork_image.image_offset
+        return run
+
+    def bench_legacy_metadata(self):
+        def run():
+            legacy_metadata = LegacyMetadata(self.legacy_metadata_directory)
+            artwork_file = LegacyArtworkFile(self.legacy_file_name, self.legacy_metadata_directory)
+            legacy_metadata.jsonable(artwork_file.basename, artwork_file.file_size)
+        return run
+
+    def bench_framework_scan(self):
+        def run():
+            FrameworkFile(self.framework_file_name).find_artwork_set_metadata()
+        return run
+
+    def bench_decode(self):
+        def run():
+            for artwork_image in self.modern_images:
+                artwork_image.get_pil_image()
+        return run
+
+    def bench_decode_legacy(self):
+        artwork_file = LegacyArtworkFile(self.legacy_file_name, self.legacy_metadata_directory)
+        artwork_images = list(artwork_file.artwork_set.iter_images())
+        def run():
+            for artwork_image in artwork_images:
+                artwork_image.get_pil_image()
+        return run
+
+    def bench_encode(self):
+        writeable_file = WriteableModernArtworkFile(os.path.join(self.directory, "Written.artwork"), self.modern_file)
+        writeable_file.open()
+        def run():
+            for artwork_image, pil_image in zip(self.modern_images, self.pil_images):
+                writeable_file.write_pil_image_at(artwork_image.image_offset, artwork_image.width, artwork_image.height, artwork_image.is_greyscale, pil_image)
+        return run
+
+    def bench_png_save(self):
+        encoder = PNGEncoder()
+        def run():
+            for pil_image in self.pil_images:
+                encoder.encode(pil_image)
+        return run
+
+    def bench_export(self):
+        export_directory = os.path.join(self.directory, "export")
+        def run():
+            if os.path.exists(export_directory):
+                shutil.rmtree(export_directory)
+            os.makedirs(export_directory)
+            exporter = ArtworkExporter(self.jobs)
+            for result in exporter.iter_export(exporter.tasks_for_set(ModernArtworkFile(self.modern_file_name).artwork_set, export_directory)):
+                pass
+        return run
+
+
+def time_benchmark(run, repeat):
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    ordered = sorted(times)
+    return {"best": ordered[0], "median": ordered[len(ordered) // 2], "runs": times}
+
+
+#-------------------------------------------------------------------------------
+# Comparing against a baseline
+#-------------------------------------------------------------------------------
+
+def parse_thresholds(threshold_options):
+    """['1.3', 'decode=1.5'] -> (1.3, {'decode': 1.5})"""
+    default = 1.25
+    per_benchmark = {}
+    for threshold_option in threshold_options:
+        if "=" in threshold_option:
+            name, ratio = threshold_option.split("=", 1)
+            per_benchmark[name] = float(ratio)
+        else:
+            default = float(threshold_option)
+    return default, per_benchmark
+
+def compare_results(results, baseline, default_threshold, thresholds):
+    """Print a comparison table; returns the names of regressed benchmarks."""
+    regressions = []
+    print("\n%-18s %12s %12s %8s %8s" % ("benchmark", "baseline", "current", "ratio", "limit"))
+    for name in sorted(results["benchmarks"]):
+        if name not in baseline["benchmarks"]:
+            continue
+        baseline_best = baseline["benchmarks"][name]["best"]
+        current_best = results["benchmarks"][name]["best"]
+        ratio = (current_best / baseline_best) if baseline_best > 0 else 1.0
+        limit = thresholds.get(name, default_threshold)
+        regressed = ratio > limit
+        if regressed:
+            regressions.append(name)
+        print("%-18s %11.4fs %11.4fs %7.2fx %7.2fx%s" % (name, baseline_best, current_best, ratio, limit, "  REGRESSION" if regressed else ""))
+    return regressions
+
+
+#-------------------------------------------------------------------------------
+# __main__
+#-------------------------------------------------------------------------------
+
+def main(argv):
+    parser = OptionParser(usage = "%prog [options]")
+    parser.add_option("-n", "--images", dest="image_count", type="int", help="Images per synthetic artwork file. (Default: 256.)", default = 256)
+    parser.add_option("--width", dest="width", type="int", help="Image width in pixels. (Default: 58.)", default = 58)
+    parser.add_option("--height", dest="height", type="int", help="Image height in pixels. (Default: 58.)", default = 58)
+    parser.add_option("-r", "--repeat", dest="repeat", type="int", help="Runs per benchmark; the best is compared. (Default: 5.)", default = 5)
+    parser.add_option("-j", "--jobs", dest="jobs", type="int", help="Worker processes for the export benchmark. (Default: 1.)", default = 1)
+    parser.add_option("-b", "--benchmark", dest="benchmarks", action="append", help="Only run this benchmark; repeatable. One of: %s." % ", ".join(Benchmarks.names()), default = [])
+    parser.add_option("--save", dest="save_file_name", help="Save results as json to this file.", default = None)
+    parser.add_option("--compare", dest="baseline_file_name", help="Compare results against this saved json baseline.", default = None)
+    parser.add_option("--threshold", dest="thresholds", action="append", help="Allowed slowdown ratio, either for every benchmark (1.25) or one (decode=1.5); repeatable.", default = [])
+    (options, arguments) = parser.parse_args()
+
+    names = options.benchmarks or Benchmarks.names()
+    for name in names:
+        if name not in Benchmarks.names():
+            parser.error("No benchmark named %s." % name)
+    default_threshold, thresholds = parse_thresholds(options.thresholds)
+
+    directory = tempfile.mkdtemp(prefix="artwork-benchmark-")
+    try:
+        benchmarks = Benchmarks(directory, options.image_count, options.width, options.height, options.jobs)
+        results = {
+            "config": {
+                "images": options.image_count,
+                "width": options.width,
+                "height": options.height,
+                "repeat": options.repeat,
+                "jobs": options.jobs,
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+            },
+            "benchmarks": {},
+        }
+        for name in names:
+            run = getattr(benchmarks, "bench_%s" % name)()
+            results["benchmarks"][name] = time_benchmark(run, options.repeat)
+            print("%-18s best %.4fs  median %.4fs" % (name, results["benchmarks"][name]["best"], results["benchmarks"][name]["median"]))
+    finally:
+        shutil.rmtree(directory)
+
+    if options.save_file_name is not None:
+        with open(options.save_file_name, "w") as f:
+            f.write(json.dumps(results, indent=4, sort_keys=True))
+
+    if options.baseline_file_name is not None:
+        with open(options.baseline_file_name) as f:
+            baseline = json.loads(f.read())
+        if compare_results(results, baseline, default_threshold, thresholds):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main(sys.argv)
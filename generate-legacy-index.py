@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+
+#-------------------------------------------------------------------------------
+#
+# iOS .artwork file extractor
+# (c)2008-2012 Dave Peck <davepeck [at] davepeck [dot] org> All Rights Reserved
+# 
+# Released under the three-clause BSD license.
+#
+# http://github.com/davepeck/iOS-artwork/
+#
+#-------------------------------------------------------------------------------
+
+#
+# Compiles every json file in legacy_metadata/ into legacy_metadata/index.bin,
+# which is what LegacyArtworkFile actually reads. Run this whenever you add
+# or change a json file; until you do, the json files are read directly.
+#
+# Run it as:
+#
+#   ./generate-legacy-index.py [legacy_metadata_directory]
+#
+
+import os
+import os.path
+import sys
+from artwork.legacy_metadata_index import LegacyMetadata, write_legacy_metadata_index
+
+
+def main(directory):
+    index_file_name = os.path.join(directory, LegacyMetadata.INDEX_FILE_NAME)
+    set_count = write_legacy_metadata_index(directory, index_file_name)
+    print("Wrote %d sets (%d bytes) to %s" % (set_count, os.path.getsize(index_file_name), index_file_name))
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        main(sys.argv[1])
+    else:
+        main(os.path.join(os.path.dirname(os.path.realpath(__file__)), "legacy_metadata"))
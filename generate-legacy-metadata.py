@@ -4,7 +4,7 @@
 #
 # iOS .artwork file extractor
 # (c)2008-2012 Dave Peck <davepeck [at] davepeck [dot] org> All Rights Reserved
-# 
+#
 # Released under the three-clause BSD license.
 #
 # http://github.com/davepeck/iOS-artwork/
@@ -15,9 +15,17 @@
 # NOTE: you almost certainly don't want or need to use this script. ;-)
 #
 
+from __future__ import with_statement  # For compatibility with python 2.5 -- this is legacy.
+
+import os
+import os.path
 import sys
 import json
+import struct
+from optparse import OptionParser
 from artwork.framework_file import FrameworkFile
+from artwork.mach_o import MachOError
+from artwork.legacy_metadata_index import LegacyMetadata, legacy_metadata_key, write_legacy_metadata_index
 
 
 
@@ -25,22 +33,126 @@ from artwork.framework_file import FrameworkFile
 # __main__ :: supremely hacknological, but handy, at the moment
 #-------------------------------------------------------------------------------
 
-# Want to know what offset to toss in here?
+# Run it as:
 #
-# 1. Find the name of an arwork file, say Foo@2x.artwork
-# 2. Use hex fiend to find the location of the string "Foo@2x\0" in the appropriate framework binary
-# 3. Work backwards in the hex editor to find the CFString, and then the pointer to that CFString.
-# 4. Use the offset where the pointer to the CFString is located!
+#   ./generate-legacy-metadata.py /path/to/AssistantServices /path/to/AssistantMic@2x.artwork -d legacy_metadata
 #
-# For example, in iOS 6.0.0, in the Assistant Mach-O binary, the offset
-# you want for AssistantMic@2x.artwork is: 0x70BC0 (461760)
+# to find the metadata for AssistantMic@2x.artwork in the framework binary
+# and write it, byte_size and all, into legacy_metadata/ (recompiling
+# legacy_metadata/index.bin to match). Artwork set names
+# (AssistantMic@2x) work in place of artwork files, but then the byte_size
+# has to be filled in by hand. With neither, every artwork set the binary
+# knows about is printed.
+#
+# If you already know where the ArtworkSetMetadata record is, give its
+# offset instead of any names to read just that one. (Once upon a time,
+# this was the only way: find the set name in a hex editor, work backwards
+# to its CFString, then to the pointer to that CFString. For example, in
+# iOS 6.0.0, in the Assistant Mach-O binary, the offset for
+# AssistantMic@2x.artwork is 0x70BC0 (461760).)
+
+def usage(parser):
+    parser.print_help()
+    sys.exit(-1)
+
+def bail(message):
+    print("\n%s\n" % message)
+    sys.exit(-1)
+
+def artwork_set_name(name):
+    base_name = os.path.basename(name)
+    if base_name.endswith(".artwork"):
+        base_name = base_name[:-len(".artwork")]
+    return base_name
+
+def parse_offset(argument):
+    try:
+        return int(argument, 0)
+    except ValueError:
+        return None
+
+def main(argv):
+    parser = OptionParser(usage = "%prog framework_binary [offset | artwork_file_or_set_name ...] [-d legacy_metadata_directory]")
+    parser.add_option("-d", "--directory", dest="directory", help="Write a json file per artwork file here, rather than printing.", default = None)
+    parser.add_option("-v", "--ios-version", dest="ios_version", help="The iOS version to record. (Default: 6.0.0.)", default = None)
+    (options, arguments) = parser.parse_args()
+
+    if not arguments:
+        usage(parser)
+    framework_file_name, arguments = arguments[0], arguments[1:]
+    if not os.path.exists(framework_file_name):
+        bail("No framework binary named %s was found." % framework_file_name)
+    offset = None
+    if (len(arguments) == 1) and not os.path.exists(arguments[0]):
+        offset = parse_offset(arguments[0])
+        if offset is not None:
+            arguments = []
+    if (options.directory is not None) and not os.path.isdir(options.directory):
+        bail("No directory named %s was found." % options.directory)
+
+    try:
+        framework_file = FrameworkFile(framework_file_name)
+    except MachOError as e:
+        bail("FAIL. Couldn't read %s: %s" % (framework_file_name, e))
+
+    # Artwork files given by path supply their byte size, and the file name
+    # to save the metadata under.
+    artwork_file_names = {}
+    byte_sizes = {}
+    set_names = None
+    if arguments:
+        set_names = []
+        for argument in arguments:
+            name = artwork_set_name(argument)
+            set_names.extend([name, name + ".artwork"])
+            if os.path.isfile(argument):
+                for key in (name, name + ".artwork"):
+                    artwork_file_names[key] = os.path.basename(argument)
+                    byte_sizes[key] = os.path.getsize(argument)
+
+    try:
+        if offset is not None:
+            found = [framework_file.read_artwork_set_metadata_at(offset)]
+        else:
+            found = framework_file.find_artwork_set_metadata(set_names, byte_sizes)
+    except (MachOError, ValueError, struct.error) as e:
+        bail("FAIL. %s" % e)
+    if not found:
+        bail("FAIL. No artwork set metadata was found in %s." % framework_file_name)
+
+    missing = set(artwork_set_name(name) for name in (set_names or [])) - set(artwork_set_name(artwork_set_metadata.name) for artwork_set_metadata in found)
+    for name in sorted(missing):
+        sys.stderr.write("No artwork set metadata was found for %s.\n" % name)
+
+    written = 0
+    for artwork_set_metadata in found:
+        try:
+            jsonable = artwork_set_metadata.to_jsonable()
+        except (MachOError, ValueError, struct.error) as e:
+            bail("FAIL. Couldn't read the images of %r: %s" % (artwork_set_metadata, e))
+        if options.ios_version is not None:
+            jsonable["version"] = options.ios_version
+        name = artwork_set_metadata.name
+        if name in byte_sizes:
+            jsonable["byte_size"] = byte_sizes[name]
+        json_string = json.dumps(jsonable, indent=4)
+
+        if (options.directory is not None) and (name in artwork_file_names):
+            json_file_name = os.path.join(options.directory, legacy_metadata_key(artwork_file_names[name], byte_sizes[name]))
+            with open(json_file_name, "w") as f:
+                f.write(json_string)
+            print("%s: %d images (record at 0x%X) -> %s" % (name, artwork_set_metadata.image_count, artwork_set_metadata.offset, json_file_name))
+            written += 1
+        else:
+            print(json_string)
+
+    if written:
+        index_file_name = os.path.join(options.directory, LegacyMetadata.INDEX_FILE_NAME)
+        set_count = write_legacy_metadata_index(options.directory, index_file_name)
+        print("Recompiled %s (%d sets)" % (index_file_name, set_count))
 
-def main(framework_file_name, artwork_set_metadata_offset):
-    framework_file = FrameworkFile(framework_file_name)
-    artwork_set_metadata = framework_file.read_artwork_set_metadata_at(artwork_set_metadata_offset)
-    jsonable = artwork_set_metadata.to_jsonable()
-    json_string = json.dumps(jsonable, indent=4)
-    print(json_string)    
+    if missing:
+        sys.exit(1)
 
 if __name__ == "__main__":
-    main(sys.argv[1], int(sys.argv[2]))
+    main(sys.argv)
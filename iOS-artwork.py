@@ -21,19 +21,53 @@
 #
 #   ./iOS-artwork.py export -a artwork_file.artwork -d export_directory
 #
+# or, to export a whole tree (or a manifest) of .artwork files in one run:
+#
+#   ./iOS-artwork.py batch -r sdk_directory -d export_directory -j 8
+#
+# or, to rebuild an .artwork file from a directory of edited images:
+#
+#   ./iOS-artwork.py import -a artwork_file.artwork -d image_directory -o new_file.artwork
+#
+# or, to see what is in an .artwork file (or a tree of them) without
+# decoding a single image:
+#
+#   ./iOS-artwork.py list -a artwork_file.artwork --format tsv
+#   ./iOS-artwork.py inspect -r sdk_directory
+#
+# or, to see which images changed between two versions of an .artwork file:
+#
+#   ./iOS-artwork.py diff old/Shared@2x.artwork new/Shared@2x.artwork
+#
+# or, to check .artwork files for damage before trusting them:
+#
+#   ./iOS-artwork.py verify -r sdk_directory
+#
+# or, to serve images over HTTP to other tools, one at a time:
+#
+#   ./iOS-artwork.py serve -r sdk_directory --port 8000
+#
 #
 # Please see the README file for more details.
 
 import os
+import re
 import sys
-import PIL
-import PIL.Image
+import json
+import time
 from optparse import OptionParser
 
 # import PIL.Image
 
-from artwork.legacy_artwork_file import LegacyArtworkFile, WriteableLegacyArtworkFile
-from artwork.modern_artwork_file import ModernArtworkFile, WriteableModernArtworkFile
+from artwork.legacy_artwork_file import WriteableLegacyArtworkFile
+from artwork.modern_artwork_file import WriteableModernArtworkFile
+from artwork.sniff import sniff_artwork_file, open_artwork_file, PADDED
+from artwork.export import ArtworkExporter
+from artwork.export_archive import ExportArchive
+from artwork.encoders import get_encoder, ENCODER_NAMES, TRADEOFF_NAMES, PNGEncoder
+from artwork.inventory import IMAGE_FIELDS, FILE_FIELDS, image_rows, artwork_file_summary, tsv_lines
+from artwork.diff import ArtworkSetDiff, CHANGED, RESIZED, visual_diff_image
+from artwork.verify import verify_artwork_file, has_errors
 
 def usage(parser):
     parser.print_help()
@@ -43,69 +77,600 @@ def bail(message):
     print("\n%s\n" % message)
     sys.exit(-1)
 
-def file_extension(file_name):
-    return os.path.splitext(file_name)[1][1:]
-    
-def action_export(artwork_file_name, directory):
-    artwork_file = LegacyArtworkFile(artwork_file_name)
-    if not artwork_file.is_legacy_supported:
-        artwork_file = ModernArtworkFile(artwork_file_name)
-        if not artwork_file.is_modern_supported:
-            bail("FAIL. This tool does not currently support %s" % artwork_file_name)
+def export_artwork_sets(exporter, files_and_directories, quiet=False, progress_interval=None, only=None, is_regex=False):
+    """
+    Export every (artwork_file, directory) pair through one exporter; with
+    only, just the images whose names match one of those patterns.
+    """
+    groups = []
+    for artwork_file, directory in files_and_directories:
+        tasks = exporter.tasks_for_file(artwork_file, directory, only, is_regex)
+        groups.append((artwork_file.artwork_set, tasks))
+    results = exporter.iter_export([task for _, tasks in groups for task in tasks])
+    next_progress_time = None if progress_interval is None else time.time() + progress_interval
+
+    for artwork_set, tasks in groups:
+        print("\nExporting %d images from %s (version %s)..." % (len(tasks), artwork_set.name, artwork_set.version))
+        for task in tasks:
+            result = next(results)
+            if (next_progress_time is not None) and (time.time() >= next_progress_time):
+                print("\t... %s" % exporter.stats.progress_line)
+                sys.stdout.flush()
+                next_progress_time = time.time() + progress_interval
+            if quiet:
+                continue
+            if result.is_unchanged:
+                print("\tunchanged %s" % result.export_file_name)
+            elif result.duplicate_of is not None:
+                print("\tlinked %s (same as %s)" % (result.export_file_name, result.duplicate_of))
+            elif exporter.archive is not None:
+                print("\tarchived %s" % result.export_file_name)
+            else:
+                print("\texported %s" % result.export_file_name)
+
+    # Let the exporter finish up (incremental exports save their manifests here).
+    for result in results:
+        pass
+
+def failed_verification(artwork_file):
+    """The errors, if any, that make the artwork file unsafe to export, one per line."""
+    problems = verify_artwork_file(artwork_file)
+    if not has_errors(problems):
+        return None
+    return "\n".join("\t%s" % problem for problem in problems if problem.is_error)
+
+def open_for_export(artwork_file_name, exporter, verify=True):
+    """
+    (artwork_file, errors) for a file about to be exported: its reader (None
+    if it isn't supported) and, if verifying, failed_verification's errors.
+    Sniffing and verifying read the image table, so they are timed as part
+    of the export's metadata phase.
+    """
+    start_time = time.perf_counter()
+    artwork_file = open_artwork_file(artwork_file_name)
+    errors = None
+    if (artwork_file is not None) and verify:
+        errors = failed_verification(artwork_file)
+    if (artwork_file is not None) and (errors is None):
+        exporter.stats.add_metadata_time(artwork_file.filename, time.perf_counter() - start_time)
+    return artwork_file, errors
+
+def action_export(artwork_file_name, directory, exporter, quiet=False, progress_interval=None, only=None, is_regex=False, verify=True):
+    artwork_file, errors = open_for_export(artwork_file_name, exporter, verify)
+    if artwork_file is None:
+        bail("FAIL. This tool does not currently support %s" % artwork_file_name)
+    if errors is not None:
+        bail("FAIL. %s is damaged (use --no-verify to export it anyway):\n%s" % (artwork_file_name, errors))
+
+    export_artwork_sets(exporter, [(artwork_file, directory)], quiet, progress_interval, only, is_regex)
 
-    artwork_set = artwork_file.artwork_set
-    print("\nExporting %d images from %s (version %s)..." % (artwork_set.image_count, artwork_set.name, artwork_set.version))
-    
-    for artwork_image in artwork_set.iter_images():
-        pil_image = artwork_image.get_pil_image()
-        export_file_name = os.path.join(directory, artwork_image.retina_appropriate_name)
-        pil_image.save(export_file_name, file_extension(export_file_name))
-        print("\texported %s" % export_file_name)
-        
     print("\nDONE EXPORTING!")
+
+def action_import(artwork_file_name, directory, output_file_name, quiet=False):
+    artwork_format, template_file = sniff_artwork_file(artwork_file_name)
+    if artwork_format == PADDED:
+        bail("FAIL. Padded @3x artwork files can't be rebuilt; run artwork_hack.py on %s first." % artwork_file_name)
+    if template_file is None:
+        bail("FAIL. This tool does not currently support %s" % artwork_file_name)
+
+    writeable_class = WriteableLegacyArtworkFile if template_file.is_legacy else WriteableModernArtworkFile
+    output_file = writeable_class(output_file_name, template_file)
+    output_file.open()  # Copies the template over, once.
+
+    artwork_set = output_file.artwork_set
+    print("\nImporting %d images into %s (version %s)..." % (artwork_set.image_count, artwork_set.name, artwork_set.version))
+
+    changed_count = unchanged_count = missing_count = 0
+    for artwork_image in artwork_set.iter_images():
+        image_file_name = os.path.join(directory, artwork_image.retina_appropriate_name)
+        if not os.path.exists(image_file_name):
+            missing_count += 1
+            continue
+        try:
+            import PIL.Image
+            pil_image = PIL.Image.open(image_file_name)
+            changed = output_file.update_pil_image_at(artwork_image.image_offset, artwork_image.width, artwork_image.height, artwork_image.is_greyscale, pil_image)
+        except (IOError, ValueError) as e:
+            output_file.delete()
+            bail("FAIL. Couldn't import %s: %s" % (image_file_name, e))
+        if changed:
+            changed_count += 1
+            if not quiet:
+                print("\timported %s" % image_file_name)
+        else:
+            unchanged_count += 1
+
+    output_file.close()  # Flushes, once.
+    print("\n%d images changed, %d unchanged, %d not found in %s" % (changed_count, unchanged_count, missing_count, directory))
+    print("\nDONE IMPORTING!")
+
+def action_list(artwork_file_names, output_format="json", is_inspect=False):
+    """
+    Print the image tables (and, to inspect, the file-level facts) of the
+    artwork files. Only metadata is read: PIL and NumPy are never imported.
+    """
+    is_many = len(artwork_file_names) > 1
+    listings = []
+    for artwork_file_name in artwork_file_names:
+        if not os.path.exists(artwork_file_name):
+            bail("No artwork file named %s was found." % artwork_file_name)
+        artwork_file = open_artwork_file(artwork_file_name)
+        if artwork_file is None:
+            if not is_many:
+                bail("FAIL. This tool does not currently support %s" % artwork_file_name)
+            sys.stderr.write("SKIPPED %s: this tool does not currently support it.\n" % artwork_file_name)
+            continue
+        rows = image_rows(artwork_file.artwork_set)
+        if is_many:
+            for row in rows:
+                row["file"] = artwork_file_name
+        listings.append((artwork_file_summary(artwork_file, artwork_file_name, rows), rows))
+
+    image_fields = (("file",) + IMAGE_FIELDS) if is_many else IMAGE_FIELDS
+    if output_format == "json":
+        if is_inspect:
+            jsonable = [dict(summary, images=rows) for summary, rows in listings]
+            if not is_many:
+                jsonable = jsonable[0] if jsonable else {}
+        else:
+            jsonable = [row for summary, rows in listings for row in rows]
+        print(json.dumps(jsonable, indent=4, sort_keys=True))
+    else:
+        if is_inspect:
+            for summary, rows in listings:
+                for field in FILE_FIELDS:
+                    print("# %s\t%s" % (field, summary[field]))
+        for line in tsv_lines((row for summary, rows in listings for row in rows), image_fields):
+            print(line)
+
+def action_serve(artwork_file_names, host, port, encoder, cache_bytes, rgba_greyscale=False):
+    import asyncio
+    from artwork.server import ArtworkServer
+
+    if len(artwork_file_names) == 1:
+        root = os.path.dirname(artwork_file_names[0])
+    elif artwork_file_names:
+        root = os.path.commonpath([os.path.dirname(artwork_file_name) for artwork_file_name in artwork_file_names])
+    artwork_files = {}
+    for artwork_file_name in artwork_file_names:
+        if not os.path.exists(artwork_file_name):
+            bail("No artwork file named %s was found." % artwork_file_name)
+        artwork_file = open_artwork_file(artwork_file_name)
+        if artwork_file is None:
+            print("SKIPPED %s: this tool does not currently support it." % artwork_file_name)
+            continue
+        set_name = os.path.splitext(os.path.relpath(artwork_file_name, root))[0].replace(os.sep, "/")
+        artwork_files[set_name] = artwork_file
+    if not artwork_files:
+        bail("No supported artwork files were found.")
+
+    server = ArtworkServer(artwork_files, encoder, cache_bytes, rgba_greyscale)
+
+    async def serve():
+        bound_host, bound_port = await server.start(host, port)
+        print("Serving %d artwork sets at http://%s:%d/ (Ctrl-C to stop)" % (len(artwork_files), bound_host, bound_port))
+        await server.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+def action_diff(old_file_name, new_file_name, output_format=None, directory=None, rgba_greyscale=False):
+    """
+    Print how new_file_name's images differ from old_file_name's and, with
+    a directory, save a visual diff of every changed or resized image
+    there. Returns whether the two are identical.
+    """
+    artwork_sets = []
+    for artwork_file_name in (old_file_name, new_file_name):
+        artwork_file = open_artwork_file(artwork_file_name)
+        if artwork_file is None:
+            bail("FAIL. This tool does not currently support %s" % artwork_file_name)
+        artwork_sets.append(artwork_file.artwork_set)
+    artwork_set_diff = ArtworkSetDiff(*artwork_sets)
+
+    if output_format == "json":
+        print(json.dumps(artwork_set_diff.to_jsonable(), indent=4, sort_keys=True))
+    elif output_format == "tsv":
+        rows = [difference.to_jsonable() for difference in artwork_set_diff.differences]
+        for line in tsv_lines(rows, ("status", "name", "old_size", "new_size")):
+            print(line)
+    else:
+        for difference in artwork_set_diff.differences:
+            print(difference)
+        counts = artwork_set_diff.counts
+        print("\n%d added, %d removed, %d resized, %d changed, %d unchanged" % (counts["added"], counts["removed"], counts["resized"], counts["changed"], counts["unchanged"]))
+
+    if directory is not None:
+        for difference in artwork_set_diff.differences:
+            if difference.status in (CHANGED, RESIZED):
+                export_file_name = os.path.join(directory, difference.new_image.retina_appropriate_name)
+                visual_diff_image(difference.old_image, difference.new_image, rgba_greyscale).save(export_file_name)
+
+    return artwork_set_diff.is_identical
+
+def action_verify(artwork_file_names, output_format=None):
+    """Check every artwork file's image table; returns whether none of them has errors."""
+    reports = []
+    for artwork_file_name in artwork_file_names:
+        if not os.path.exists(artwork_file_name):
+            bail("No artwork file named %s was found." % artwork_file_name)
+        artwork_format, artwork_file = sniff_artwork_file(artwork_file_name)
+        if artwork_file is None:
+            reports.append((artwork_file_name, artwork_format, None, None))
+            continue
+        reports.append((artwork_file_name, artwork_format, artwork_file.artwork_set.image_count, verify_artwork_file(artwork_file)))
+
+    if output_format == "json":
+        jsonable = [{"file": artwork_file_name, "format": artwork_format, "image_count": image_count, "problems": [problem.to_jsonable() for problem in problems or []]} for artwork_file_name, artwork_format, image_count, problems in reports]
+        print(json.dumps(jsonable, indent=4, sort_keys=True))
+    elif output_format == "tsv":
+        rows = [{"file": artwork_file_name, "severity": problem.severity, "message": problem.message, "names": " ".join(str(name) for name in problem.names)} for artwork_file_name, _, _, problems in reports for problem in problems or []]
+        for line in tsv_lines(rows, ("file", "severity", "message", "names")):
+            print(line)
+    else:
+        for artwork_file_name, artwork_format, image_count, problems in reports:
+            if problems is None:
+                print("SKIPPED %s: this tool does not currently support it." % artwork_file_name)
+            elif not problems:
+                print("OK %s (%s, %d images)" % (artwork_file_name, artwork_format, image_count))
+            else:
+                print("%s %s (%s, %d images)" % ("DAMAGED" if has_errors(problems) else "OK", artwork_file_name, artwork_format, image_count))
+                for problem in problems:
+                    print("\t%s" % problem)
+
+    return not any(has_errors(problems or []) for _, _, _, problems in reports)
+
+def chosen_artwork_file_names(parser, options):
+    """The artwork files named by exactly one of -a, -r or -m."""
+    if [options.artwork_file_name, options.root_directory, options.manifest_file_name].count(None) != 2:
+        usage(parser)
+    if options.artwork_file_name is not None:
+        if not os.path.exists(options.artwork_file_name):
+            bail("No artwork file named %s was found." % options.artwork_file_name)
+        return [os.path.abspath(options.artwork_file_name)]
+    if options.root_directory is not None:
+        if not os.path.isdir(options.root_directory):
+            bail("No directory named %s was found." % options.root_directory)
+        return find_artwork_file_names(os.path.abspath(options.root_directory))
+    if not os.path.exists(options.manifest_file_name):
+        bail("No manifest file named %s was found." % options.manifest_file_name)
+    return read_artwork_manifest(os.path.abspath(options.manifest_file_name))
+
+def find_artwork_file_names(root):
+    artwork_file_names = []
+    for directory, directory_names, file_names in os.walk(root):
+        directory_names.sort()
+        for file_name in sorted(file_names):
+            if file_name.endswith(".artwork"):
+                artwork_file_names.append(os.path.join(directory, file_name))
+    return artwork_file_names
+
+def read_artwork_manifest(manifest_file_name):
+    """One artwork file path per line; blank lines and # comments are ignored."""
+    manifest_directory = os.path.dirname(manifest_file_name)
+    artwork_file_names = []
+    with open(manifest_file_name) as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                artwork_file_names.append(os.path.abspath(os.path.join(manifest_directory, line)))
+    return artwork_file_names
+
+def batch_export_directory(artwork_file_name, root, directory):
+    """Each set goes to its own subdirectory, mirroring its path below root."""
+    relative_name = os.path.relpath(artwork_file_name, root)
+    return os.path.join(directory, os.path.splitext(relative_name)[0])
+
+def action_batch(artwork_file_names, directory, exporter, quiet=False, progress_interval=None, only=None, is_regex=False, verify=True):
+    if not artwork_file_names:
+        bail("No artwork files were found.")
+    root = os.path.commonpath([os.path.dirname(artwork_file_name) for artwork_file_name in artwork_file_names])
+
+    files_and_directories = []
+    unsupported_file_names = []
+    damaged_file_names = []
+    for artwork_file_name in artwork_file_names:
+        if not os.path.exists(artwork_file_name):
+            bail("No artwork file named %s was found." % artwork_file_name)
+        artwork_file, errors = open_for_export(artwork_file_name, exporter, verify)
+        if artwork_file is None:
+            unsupported_file_names.append(artwork_file_name)
+            continue
+        if errors is not None:
+            damaged_file_names.append((artwork_file_name, errors))
+            continue
+        set_directory = batch_export_directory(artwork_file_name, root, directory)
+        if (exporter.archive is None) and not os.path.exists(set_directory):
+            os.makedirs(set_directory)
+        files_and_directories.append((artwork_file, set_directory))
+
+    export_artwork_sets(exporter, files_and_directories, quiet, progress_interval, only, is_regex)
+
+    for artwork_file_name in unsupported_file_names:
+        print("\nSKIPPED %s: this tool does not currently support it." % artwork_file_name)
+    for artwork_file_name, errors in damaged_file_names:
+        print("\nSKIPPED %s: it is damaged (use --no-verify to export it anyway):\n%s" % (artwork_file_name, errors))
+
+    print("\nDONE EXPORTING %d ARTWORK FILES!" % len(files_and_directories))
     
 def main(argv):
     #
     # Set up command-line options parser
     #
-    parser = OptionParser(usage = """%prog -a artwork_file.artwork -d export_directory
+    parser = OptionParser(usage = """%prog [export] -a artwork_file.artwork -d export_directory
+       %prog batch (-r root_directory | -m manifest_file) -d export_directory
+       %prog import -a template_file.artwork -d image_directory -o output_file.artwork
+       %prog list|inspect|verify (-a artwork_file.artwork | -r root_directory | -m manifest_file)
+       %prog serve (-a artwork_file.artwork | -r root_directory | -m manifest_file)
+       %prog diff old_file.artwork new_file.artwork [-d visual_diff_directory]
 
+    export (the default):
     -a artwork_file.artwork 
     -d export_directory
+    -j jobs (optional; number of worker processes, default 1)
+    -i (optional; skip images that are unchanged since the last -i export)
+    --archive archive_file (optional, instead of -d; .zip, .tar or .tar.gz)
+    --store (optional; don't compress zip archive members)
+    --encoder png|pam, --compress-level 0-9, --png-strategy name,
+    --tradeoff fastest|fast|balanced|small (optional; output encoding)
+    --rgba-greyscale (optional; export greyscale images as RGBA)
+    --dedupe (optional; link images with identical pixels, not re-encode)
+    --no-verify (optional; skip the check for damaged artwork files)
+    --stats stats.json (optional; write per-phase timings and counts)
+    --progress seconds (optional; print throughput every so often)
+    -q (optional; don't print a line per image)
     
     Exports the contents of artwork_file.artwork as a set
     of images in the export_directory
 
+    batch:
+    -r root_directory (every .artwork file below it), or
+    -m manifest_file (one .artwork file path per line)
+    -d export_directory
+    -j jobs (optional; number of worker processes, default 1)
+    -i (optional; skip images that are unchanged since the last -i export)
+    --archive archive_file (optional, instead of -d; .zip, .tar or .tar.gz)
+    --store (optional; don't compress zip archive members)
+    --encoder, --compress-level, --png-strategy, --tradeoff,
+    --rgba-greyscale, --dedupe, --no-verify (as above)
+    --stats, --progress, -q (as above)
+
+    Exports every supported artwork file, each into its own
+    subdirectory of export_directory that mirrors its path
+
+    import:
+    -a template_file.artwork
+    -d image_directory
+    -o output_file.artwork
+    -q (optional; don't print a line per image)
+
+    Rebuilds template_file.artwork as output_file.artwork, replacing
+    every image that has a (changed) same-named PNG in image_directory
+
+    list, inspect:
+    -a artwork_file.artwork, or -r root_directory, or -m manifest_file
+    --format json|tsv (optional; default json)
+
+    Prints every image's name, size, offset, greyscale flag, row
+    stride and pixel span, without decoding any pixels; inspect
+    adds each file's format, set name, version and totals
+
+    verify:
+    -a artwork_file.artwork, or -r root_directory, or -m manifest_file
+    --format json|tsv (optional; default text)
+
+    Checks that every image (and name) lies inside its file and
+    overlaps nothing else; exits 0 if no file is damaged and 1
+    if any is. export and batch run the same check first
+
+    serve:
+    -a artwork_file.artwork, or -r root_directory, or -m manifest_file
+    --host address, --port port (optional; default 127.0.0.1:8000)
+    --cache-size megabytes (optional; encoded images kept, default 64)
+    --encoder, --compress-level, --png-strategy, --tradeoff,
+    --rgba-greyscale (as for export)
+
+    Serves the images over HTTP at /set_name/image_name, each
+    artwork file opened once and each image encoded on demand
+
+    diff old_file.artwork new_file.artwork:
+    -d visual_diff_directory (optional; old | new | differences PNGs)
+    --format json|tsv (optional; default text)
+
+    Lists images added, removed, resized or changed, matched by
+    name; exits 0 if the two are identical and 1 if not
+
     """)
     parser.add_option("-a", "--artwork", dest="artwork_file_name", help="Specify the input artwork file name. (Read-only.)", default = None)
     parser.add_option("-d", "--directory", dest="directory", help="Specify the directory to export images to/import images from.", default = None)
+    parser.add_option("-j", "--jobs", dest="jobs", type="int", help="Number of worker processes to export with. (Default: 1.)", default = 1)
+    parser.add_option("-i", "--incremental", dest="incremental", action="store_true", help="Only export images that changed since the last incremental export to the same directory.", default = False)
+    parser.add_option("--archive", dest="archive_file_name", help="Stream exported images into this .zip, .tar or .tar.gz archive instead of a directory.", default = None)
+    parser.add_option("--store", dest="store", action="store_true", help="Store, rather than deflate, zip archive members; PNG data is already compressed.", default = False)
+    parser.add_option("--encoder", dest="encoder", type="choice", choices=list(ENCODER_NAMES), help="Output format: png (the default) or pam (uncompressed).", default = None)
+    parser.add_option("--compress-level", dest="compress_level", type="int", help="PNG zlib compression level, 0-9. (Default: 6.)", default = None)
+    parser.add_option("--png-strategy", dest="png_strategy", type="choice", choices=sorted(PNGEncoder.STRATEGIES), help="PNG zlib strategy: %s." % ", ".join(sorted(PNGEncoder.STRATEGIES)), default = None)
+    parser.add_option("--tradeoff", dest="tradeoff", type="choice", choices=list(TRADEOFF_NAMES), help="Pick the cheapest lossless encoder that is at least this compact: %s." % ", ".join(TRADEOFF_NAMES), default = None)
+    parser.add_option("--stats", dest="stats_file_name", help="Write per-phase timings, byte and pixel counts as json to this file.", default = None)
+    parser.add_option("--progress", dest="progress_interval", type="float", help="Print a throughput line every this many seconds.", default = None)
+    parser.add_option("--only", dest="only", action="append", help="Only export images whose names match this glob pattern (e.g. 'UITabBar*'); repeatable.", default = [])
+    parser.add_option("--regex", dest="is_regex", action="store_true", help="Treat --only patterns as regular expressions, matched anywhere in the name.", default = False)
+    parser.add_option("--no-verify", dest="verify", action="store_false", help="Don't check artwork files for damage before exporting them.", default = True)
+    parser.add_option("--dedupe", dest="dedupe", action="store_true", help="Encode each distinct image once; hardlink (or, in archives, link) its duplicates to it.", default = False)
+    parser.add_option("--rgba-greyscale", dest="rgba_greyscale", action="store_true", help="Export greyscale images as opaque RGBA, as older versions did, rather than single-channel.", default = False)
+    parser.add_option("-q", "--quiet", dest="quiet", action="store_true", help="Don't print a line for every image.", default = False)
+    parser.add_option("--format", dest="output_format", type="choice", choices=["json", "tsv"], help="(list, inspect, diff, verify) Print json or tab-separated values. (Default: json; for diff and verify, text.)", default = None)
+    parser.add_option("--host", dest="host", help="(serve) Address to listen on. (Default: 127.0.0.1.)", default = "127.0.0.1")
+    parser.add_option("--port", dest="port", type="int", help="(serve) Port to listen on; 0 picks a free one. (Default: 8000.)", default = 8000)
+    parser.add_option("--cache-size", dest="cache_megabytes", type="float", help="(serve) Megabytes of encoded images to keep in memory. (Default: 64.)", default = 64)
+    parser.add_option("-o", "--output", dest="output_file_name", help="(import) Write the rebuilt artwork file here.", default = None)
+    parser.add_option("-r", "--root", dest="root_directory", help="(batch, list, inspect) Use every .artwork file found below this directory.", default = None)
+    parser.add_option("-m", "--manifest", dest="manifest_file_name", help="(batch, list, inspect) Use every .artwork file listed in this file.", default = None)
 
     #
     # Parse
     #
     (options, arguments) = parser.parse_args()
+    action = arguments[0] if arguments else "export"
     
     #
     # Validate
     #
-    if (options.artwork_file_name is None) or (options.directory is None):
+    if action == "diff":
+        if len(arguments) != 3:
+            usage(parser)
+        for artwork_file_name in arguments[1:]:
+            if not os.path.exists(artwork_file_name):
+                bail("No artwork file named %s was found." % artwork_file_name)
+        abs_directory = None
+        if options.directory is not None:
+            abs_directory = os.path.abspath(options.directory)
+            if not os.path.isdir(abs_directory):
+                bail("No directory named %s was found." % options.directory)
+
+        #
+        # Execute
+        #
+
+        is_identical = action_diff(os.path.abspath(arguments[1]), os.path.abspath(arguments[2]), options.output_format, abs_directory, options.rgba_greyscale)
+        sys.exit(0 if is_identical else 1)
+
+    if (action not in ("export", "batch", "import", "list", "inspect", "serve", "verify")) or (len(arguments) > 1):
         usage(parser)
-        
-    abs_artwork_file_name = os.path.abspath(options.artwork_file_name)
-    
-    if not os.path.exists(abs_artwork_file_name):
-        bail("No artwork file named %s was found." % options.artwork_file_name)
-        
-    abs_directory = os.path.abspath(options.directory)
-    
-    if not os.path.exists(abs_directory):
-        bail("No directory named %s was found." % options.directory)
+
+    if action in ("list", "inspect"):
+        artwork_file_names = chosen_artwork_file_names(parser, options)
+
+        #
+        # Execute
+        #
+
+        action_list(artwork_file_names, options.output_format or "json", action == "inspect")
+        return
+
+    if action == "verify":
+        artwork_file_names = chosen_artwork_file_names(parser, options)
+
+        #
+        # Execute
+        #
+
+        is_sound = action_verify(artwork_file_names, options.output_format)
+        sys.exit(0 if is_sound else 1)
+
+    if action == "serve":
+        artwork_file_names = chosen_artwork_file_names(parser, options)
+        if not (0 <= options.port <= 65535):
+            bail("--port must be between 0 and 65535.")
+        if options.cache_megabytes < 0:
+            bail("--cache-size can't be negative.")
+        try:
+            encoder = get_encoder(options.encoder, options.compress_level, options.png_strategy, options.tradeoff)
+        except ValueError as e:
+            bail(str(e))
+
+        #
+        # Execute
+        #
+
+        action_serve(artwork_file_names, options.host, options.port, encoder, int(options.cache_megabytes * 1024 * 1024), options.rgba_greyscale)
+        return
+
+    if action == "import":
+        if (options.artwork_file_name is None) or (options.directory is None) or (options.output_file_name is None):
+            usage(parser)
+        abs_artwork_file_name = os.path.abspath(options.artwork_file_name)
+        if not os.path.exists(abs_artwork_file_name):
+            bail("No artwork file named %s was found." % options.artwork_file_name)
+        abs_directory = os.path.abspath(options.directory)
+        if not os.path.isdir(abs_directory):
+            bail("No directory named %s was found." % options.directory)
+        abs_output_file_name = os.path.abspath(options.output_file_name)
+        if os.path.exists(abs_output_file_name) and os.path.samefile(abs_output_file_name, abs_artwork_file_name):
+            bail("The output artwork file can't be the template artwork file.")
+
+        #
+        # Execute
+        #
+
+        action_import(abs_artwork_file_name, abs_directory, abs_output_file_name, options.quiet)
+        return
+
+    if options.archive_file_name is not None:
+        if options.directory is not None:
+            bail("Use either -d or --archive, not both.")
+        if options.incremental:
+            bail("Incremental exports can't be archived.")
+        abs_directory = ""
+    else:
+        if options.directory is None:
+            usage(parser)
+        abs_directory = os.path.abspath(options.directory)
+        if not os.path.exists(abs_directory):
+            bail("No directory named %s was found." % options.directory)
+
+    if options.jobs < 1:
+        bail("--jobs must be at least 1.")
+
+    if options.is_regex:
+        for pattern in options.only:
+            try:
+                re.compile(pattern)
+            except re.error as e:
+                bail("Bad --only regular expression %r: %s" % (pattern, e))
+
+    if (options.progress_interval is not None) and (options.progress_interval <= 0):
+        bail("--progress must be a positive number of seconds.")
+
+    try:
+        encoder = get_encoder(options.encoder, options.compress_level, options.png_strategy, options.tradeoff)
+    except ValueError as e:
+        bail(str(e))
+
+    if action == "batch":
+        if (options.root_directory is None) == (options.manifest_file_name is None):
+            usage(parser)
+        if options.root_directory is not None:
+            if not os.path.isdir(options.root_directory):
+                bail("No directory named %s was found." % options.root_directory)
+            artwork_file_names = find_artwork_file_names(os.path.abspath(options.root_directory))
+        else:
+            if not os.path.exists(options.manifest_file_name):
+                bail("No manifest file named %s was found." % options.manifest_file_name)
+            artwork_file_names = read_artwork_manifest(os.path.abspath(options.manifest_file_name))
+    else:
+        if options.artwork_file_name is None:
+            usage(parser)
+        abs_artwork_file_name = os.path.abspath(options.artwork_file_name)
+        if not os.path.exists(abs_artwork_file_name):
+            bail("No artwork file named %s was found." % options.artwork_file_name)
 
     #
     # Execute
     #
 
-    action_export(abs_artwork_file_name, abs_directory)
+    archive = None
+    if options.archive_file_name is not None:
+        try:
+            archive = ExportArchive.open(options.archive_file_name, options.store)
+        except ValueError as e:
+            bail(str(e))
+    exporter = ArtworkExporter(options.jobs, options.incremental, archive, encoder, options.rgba_greyscale, options.dedupe)
+
+    try:
+        if action == "batch":
+            action_batch(artwork_file_names, abs_directory, exporter, options.quiet, options.progress_interval, options.only, options.is_regex, options.verify)
+        else:
+            action_export(abs_artwork_file_name, abs_directory, exporter, options.quiet, options.progress_interval, options.only, options.is_regex, options.verify)
+    finally:
+        if archive is not None:
+            archive.close()
+
+    if options.stats_file_name is not None:
+        with open(options.stats_file_name, "w") as f:
+            f.write(json.dumps(exporter.stats.to_jsonable(), indent=4, sort_keys=True))
 
             
 if __name__ == "__main__":
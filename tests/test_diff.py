@@ -0,0 +1,38 @@
+#-------------------------------------------------------------------------------
+#
+# iOS .artwork file extractor
+# (c)2008-2012 Dave Peck <davepeck [at] davepeck [dot] org> All Rights Reserved
+#
+# Released under the three-clause BSD license.
+#
+# http://github.com/davepeck/iOS-artwork/
+#
+#-------------------------------------------------------------------------------
+
+import os.path
+import sys
+import json
+import subprocess
+
+from conftest import REPOSITORY_DIRECTORY
+from artwork.synthetic import SyntheticImage, write_modern_artwork_file
+
+
+def diff(tmp_path, output_format):
+    old_file_name, new_file_name = str(tmp_path / "Old.artwork"), str(tmp_path / "New.artwork")
+    write_modern_artwork_file(old_file_name, [SyntheticImage("a.png", 4, 4), SyntheticImage("b.png", 3, 3)])
+    write_modern_artwork_file(new_file_name, [SyntheticImage("a.png", 4, 4), SyntheticImage("c.png", 2, 2)])
+    script = os.path.join(REPOSITORY_DIRECTORY, "iOS-artwork.py")
+    return subprocess.run([sys.executable, script, "diff", old_file_name, new_file_name, "--format", output_format], capture_output=True, text=True).stdout
+
+
+def test_tsv_leaves_missing_sizes_empty(tmp_path):
+    lines = diff(tmp_path, "tsv").splitlines()
+    assert lines[0] == "status\tname\told_size\tnew_size"
+    assert "added\tc.png\t\t2x2" in lines
+    assert "removed\tb.png\t3x3\t" in lines
+
+
+def test_json_keeps_null_sizes(tmp_path):
+    jsonable = json.loads(diff(tmp_path, "json"))
+    assert {"status": "added", "name": "c.png", "old_size": None, "new_size": "2x2"} in jsonable["differences"]
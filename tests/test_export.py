@@ -0,0 +1,109 @@
+#-------------------------------------------------------------------------------
+#
+# iOS .artwork file extractor
+# (c)2008-2012 Dave Peck <davepeck [at] davepeck [dot] org> All Rights Reserved
+#
+# Released under the three-clause BSD license.
+#
+# http://github.com/davepeck/iOS-artwork/
+#
+#-------------------------------------------------------------------------------
+
+import os
+import os.path
+import collections
+import numpy
+import PIL.Image
+
+from artwork.synthetic import SyntheticImage, write_modern_artwork_file, write_legacy_artwork_file
+from artwork.legacy_artwork_file import LegacyArtworkFile
+from artwork.modern_artwork_file import ModernArtworkFile
+from artwork.export import ArtworkExporter, ExportTask, _artwork_file_for
+from artwork.encoders import PNGEncoder
+
+IMAGES = [SyntheticImage("a.png", 4, 4), SyntheticImage("b.png", 4, 4), SyntheticImage("c.png", 3, 2, is_greyscale=True)]
+
+
+def write_artwork_file(file_name, duplicate):
+    """Write IMAGES; with duplicate, b.png gets a.png's pixels."""
+    write_modern_artwork_file(file_name, IMAGES)
+    artwork_set = ModernArtworkFile(file_name).artwork_set
+    a, b = artwork_set.get_image("a.png"), artwork_set.get_image("b.png")
+    if duplicate:
+        with open(file_name, "r+b") as f:
+            f.seek(a.image_offset)
+            pixels = f.read(a.pixel_span)
+            f.seek(b.image_offset)
+            f.write(pixels)
+    return ModernArtworkFile(file_name)
+
+
+def export(artwork_file, directory):
+    exporter = ArtworkExporter(dedupe=True)
+    return list(exporter.iter_export(exporter.tasks_for_set(artwork_file.artwork_set, directory)))
+
+
+def assert_exported(artwork_file, directory):
+    for artwork_image in artwork_file.artwork_set.iter_images():
+        with PIL.Image.open(os.path.join(directory, artwork_image.name)) as pil_image:
+            assert numpy.array_equal(numpy.asarray(pil_image), numpy.asarray(artwork_image.get_pil_image())), artwork_image.name
+
+
+def test_dedupe_links_duplicates(tmp_path):
+    directory = str(tmp_path / "export")
+    os.mkdir(directory)
+    artwork_file = write_artwork_file(str(tmp_path / "Duplicated.artwork"), duplicate=True)
+    results = export(artwork_file, directory)
+    assert [result.duplicate_of for result in results] == [None, os.path.join(directory, "a.png"), None]
+    assert os.path.samefile(os.path.join(directory, "a.png"), os.path.join(directory, "b.png"))
+    assert_exported(artwork_file, directory)
+
+
+def test_reexport_into_deduped_directory(tmp_path):
+    # b.png is left hardlinked to a.png; exporting different pixels to it
+    # mustn't write through the link into a.png.
+    directory = str(tmp_path / "export")
+    os.mkdir(directory)
+    export(write_artwork_file(str(tmp_path / "Duplicated.artwork"), duplicate=True), directory)
+
+    artwork_file = write_artwork_file(str(tmp_path / "Distinct.artwork"), duplicate=False)
+    results = export(artwork_file, directory)
+    assert [result.duplicate_of for result in results] == [None, None, None]
+    assert not os.path.samefile(os.path.join(directory, "a.png"), os.path.join(directory, "b.png"))
+    assert_exported(artwork_file, directory)
+    assert sorted(os.listdir(directory)) == ["a.png", "b.png", "c.png"]
+
+
+def test_worker_keeps_most_recently_used_files(tmp_path):
+    file_names = []
+    for name in ("First", "Second", "Third"):
+        file_names.append(str(tmp_path / ("%s.artwork" % name)))
+        write_modern_artwork_file(file_names[-1], IMAGES)
+    artwork_image = ModernArtworkFile(file_names[0]).artwork_set.image_at(0)
+
+    def use(file_name):
+        task = ExportTask.for_image(artwork_image, str(tmp_path), PNGEncoder())
+        task.artwork_file_name = file_name
+        return _artwork_file_for(task, artwork_files, limit=2)
+
+    artwork_files = collections.OrderedDict()
+    first = use(file_names[0])
+    use(file_names[1])
+    assert use(file_names[0]) is first
+    use(file_names[2])
+    # Second was the least recently used, so it was the one closed.
+    assert [file_name for _, file_name in artwork_files] == [file_names[0], file_names[2]]
+
+
+def test_metadata_phase_reads_the_set(tmp_path):
+    # The legacy set is only read from its json by tasks_for_file, which
+    # times that as metadata, along with selecting and planning.
+    file_name = str(tmp_path / "Legacy.artwork")
+    write_legacy_artwork_file(file_name, str(tmp_path / "legacy_metadata"), IMAGES)
+    artwork_file = LegacyArtworkFile(file_name, str(tmp_path / "legacy_metadata"))
+    assert artwork_file._artwork_set is None
+    exporter = ArtworkExporter()
+    tasks = exporter.tasks_for_file(artwork_file, str(tmp_path), only=["a.*"])
+    assert [task.name for task in tasks] == ["a.png"]
+    assert list(exporter.stats.to_jsonable()["files"]) == [file_name]
+    assert exporter.stats.total.seconds["metadata"] > 0
@@ -0,0 +1,57 @@
+#-------------------------------------------------------------------------------
+#
+# iOS .artwork file extractor
+# (c)2008-2012 Dave Peck <davepeck [at] davepeck [dot] org> All Rights Reserved
+#
+# Released under the three-clause BSD license.
+#
+# http://github.com/davepeck/iOS-artwork/
+#
+#-------------------------------------------------------------------------------
+
+import os
+import os.path
+import sys
+import subprocess
+import pytest
+
+from conftest import REPOSITORY_DIRECTORY
+from artwork.synthetic import SyntheticImage, write_framework_file
+from artwork.framework_file import FrameworkFile, ArtworkSetMetadata
+
+IMAGES = [SyntheticImage("first.png", 4, 4), SyntheticImage("second.png", 3, 2, is_greyscale=True)]
+
+
+def write_synthetic_framework_file(tmp_path):
+    file_name = str(tmp_path / "UIKit")
+    record_offsets = write_framework_file(file_name, [("Synthetic.artwork", IMAGES)], filler_size=4096)
+    return file_name, record_offsets[0]
+
+
+@pytest.fixture
+def framework_file_name(tmp_path):
+    return write_synthetic_framework_file(tmp_path)[0]
+
+
+def test_read_at_record_offset(tmp_path):
+    framework_file_name, record_offset = write_synthetic_framework_file(tmp_path)
+    artwork_set_metadata = FrameworkFile(framework_file_name).read_artwork_set_metadata_at(record_offset)
+    assert artwork_set_metadata.name == "Synthetic.artwork"
+    assert [image[0] for image in artwork_set_metadata.to_jsonable()["images"]] == ["first.png", "second.png"]
+
+
+def test_read_outside_file(framework_file_name):
+    framework_file = FrameworkFile(framework_file_name)
+    for offset in (-4, framework_file.data_length - ArtworkSetMetadata.SIZE + 4, 0x999999):
+        with pytest.raises(ValueError):
+            framework_file.read_artwork_set_metadata_at(offset)
+
+
+def test_script_reports_bad_offset(framework_file_name):
+    script = os.path.join(REPOSITORY_DIRECTORY, "generate-legacy-metadata.py")
+    environment = dict(os.environ, PYTHONPATH=REPOSITORY_DIRECTORY)
+    for offset in ("0x999999", "0"):
+        result = subprocess.run([sys.executable, script, framework_file_name, offset], capture_output=True, text=True, env=environment)
+        assert result.returncode != 0
+        assert "FAIL." in result.stdout
+        assert "Traceback" not in result.stderr
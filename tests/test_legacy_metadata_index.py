@@ -0,0 +1,91 @@
+#-------------------------------------------------------------------------------
+#
+# iOS .artwork file extractor
+# (c)2008-2012 Dave Peck <davepeck [at] davepeck [dot] org> All Rights Reserved
+#
+# Released under the three-clause BSD license.
+#
+# http://github.com/davepeck/iOS-artwork/
+#
+#-------------------------------------------------------------------------------
+
+import os
+import os.path
+import json
+
+from conftest import REPOSITORY_DIRECTORY
+from artwork.synthetic import SyntheticImage, write_legacy_artwork_file
+from artwork.legacy_metadata_index import LegacyMetadata, legacy_metadata_key, legacy_image_fields, write_legacy_metadata_index
+
+IMAGES = [SyntheticImage("a.png", 8, 8), SyntheticImage("b.png", 4, 4, is_greyscale=True)]
+
+
+def metadata_directory_with_index(tmp_path):
+    directory = str(tmp_path / "legacy_metadata")
+    write_legacy_artwork_file(str(tmp_path / "Synthetic.artwork"), directory, IMAGES)
+    write_legacy_metadata_index(directory, os.path.join(directory, LegacyMetadata.INDEX_FILE_NAME))
+    key = [file_name for file_name in os.listdir(directory) if file_name.endswith(".json")][0]
+    return directory, key
+
+
+def test_index_matches_json(tmp_path):
+    directory, key = metadata_directory_with_index(tmp_path)
+    legacy_metadata = LegacyMetadata(directory)
+    assert legacy_metadata.index is not None
+    with open(os.path.join(directory, key)) as f:
+        assert legacy_metadata.index.jsonable(key) == json.loads(f.read())
+
+
+def test_index_survives_touched_json(tmp_path):
+    # A fresh checkout gives every json file a new modification time.
+    directory, key = metadata_directory_with_index(tmp_path)
+    json_file_name = os.path.join(directory, key)
+    os.utime(json_file_name, ns=(0, os.stat(json_file_name).st_mtime_ns + 10 ** 9))
+    assert LegacyMetadata(directory).index is not None
+
+
+def test_json_edited_in_place_is_read_directly(tmp_path):
+    directory, key = metadata_directory_with_index(tmp_path)
+    json_file_name = os.path.join(directory, key)
+    with open(json_file_name) as f:
+        contents = f.read()
+    # Same size, different image name.
+    with open(json_file_name, "w") as f:
+        f.write(contents.replace("a.png", "c.png"))
+
+    legacy_metadata = LegacyMetadata(directory)
+    assert legacy_metadata.index is None
+    basename, _, file_size = key[:-len(".json")].rpartition("-")
+    assert legacy_metadata.jsonable(basename, int(file_size))["images"][0][0] == "c.png"
+
+
+def test_shipped_index_matches_json():
+    # Images come back with all five fields; everything else as in the json.
+    directory = os.path.join(REPOSITORY_DIRECTORY, "legacy_metadata")
+    index = LegacyMetadata(directory).index
+    for key in sorted(index.keys):
+        with open(os.path.join(directory, key)) as f:
+            jsonable = json.loads(f.read())
+        jsonable["images"] = [list(legacy_image_fields(image_jsonable)) for image_jsonable in jsonable["images"]]
+        assert index.jsonable(key) == jsonable, key
+
+
+def test_shipped_index_is_current():
+    directory = os.path.join(REPOSITORY_DIRECTORY, "legacy_metadata")
+    legacy_metadata = LegacyMetadata(directory)
+    assert legacy_metadata.index is not None
+    assert legacy_metadata_key("Shared.artwork", 8358208) in legacy_metadata.keys
+
+
+def test_ios3_offsets_carry_flags():
+    # From iOS 4.2.1's Shared~iphone.artwork: a 1024x1024 greyscale image,
+    # flagged in its offset, which would run over 182 others as colour.
+    name = "UIStockImageNoContentDarkGradientBackgroundColor.png"
+    assert legacy_image_fields([name, 1024, 1024, 4812802]) == (name, 1024, 1024, 4812800, 0x02)
+    assert legacy_image_fields(["addcall.png", 40, 50, 12128]) == ("addcall.png", 40, 50, 12128, 0)
+    assert legacy_image_fields(["a.png", 8, 8, 4096, 0x02]) == ("a.png", 8, 8, 4096, 0x02)
+
+    shipped = LegacyMetadata(os.path.join(REPOSITORY_DIRECTORY, "legacy_metadata"))
+    assert shipped.index is not None
+    images = dict((image[0], image) for image in shipped.index.jsonable(legacy_metadata_key("Shared~iphone.artwork", 19529344))["images"])
+    assert images[name][3:] == [4812800, 0x02]
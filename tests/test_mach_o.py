@@ -0,0 +1,56 @@
+#-------------------------------------------------------------------------------
+#
+# iOS .artwork file extractor
+# (c)2008-2012 Dave Peck <davepeck [at] davepeck [dot] org> All Rights Reserved
+#
+# Released under the three-clause BSD license.
+#
+# http://github.com/davepeck/iOS-artwork/
+#
+#-------------------------------------------------------------------------------
+
+import struct
+import pytest
+
+from artwork.synthetic import SyntheticImage, write_framework_file
+from artwork.mach_o import MachOError, read_mach_o_images
+
+
+@pytest.fixture(params=[False, True], ids=["thin", "fat"])
+def framework_data(request, tmp_path):
+    file_name = str(tmp_path / "UIKit")
+    write_framework_file(file_name, [("Synthetic.artwork", [SyntheticImage("a.png", 4, 4)])], filler_size=16, fat=request.param)
+    with open(file_name, "rb") as f:
+        return f.read()
+
+
+def test_segments(framework_data):
+    mach_o_image = read_mach_o_images(framework_data)[-1]
+    assert [segment.name for segment in mach_o_image.segments] == ["__PAGEZERO", "__TEXT", "__DATA"]
+
+
+def test_truncated_headers(framework_data):
+    # Cut off anywhere in the headers and load commands, a binary is a MachOError.
+    headers_end = 8192 + 28 + (3 * 56) if framework_data[:4] == b"\xCA\xFE\xBA\xBE" else 28 + (3 * 56)
+    for length in range(headers_end):
+        try:
+            read_mach_o_images(framework_data[:length])
+        except MachOError:
+            pass
+
+
+def test_oversized_load_command(framework_data):
+    data = bytearray(framework_data)
+    mach_o_offset = data.find(struct.pack("<L", 0xFEEDFACE))
+    struct.pack_into("<L", data, mach_o_offset + 28 + 4, len(data))
+    with pytest.raises(MachOError):
+        read_mach_o_images(bytes(data))
+
+
+def test_too_many_sections(framework_data):
+    data = bytearray(framework_data)
+    mach_o_offset = data.find(struct.pack("<L", 0xFEEDFACE))
+    # nsects of the first LC_SEGMENT.
+    struct.pack_into("<L", data, mach_o_offset + 28 + 48, 1000)
+    with pytest.raises(MachOError):
+        read_mach_o_images(bytes(data))
@@ -0,0 +1,39 @@
+#-------------------------------------------------------------------------------
+#
+# iOS .artwork file extractor
+# (c)2008-2012 Dave Peck <davepeck [at] davepeck [dot] org> All Rights Reserved
+#
+# Released under the three-clause BSD license.
+#
+# http://github.com/davepeck/iOS-artwork/
+#
+#-------------------------------------------------------------------------------
+
+import struct
+import pytest
+
+from artwork.synthetic import SyntheticImage, write_modern_artwork_file
+from artwork.modern_artwork_file import ModernArtworkFile
+
+IMAGES = [SyntheticImage("first.png", 4, 4), SyntheticImage("second.png", 3, 2, is_greyscale=True)]
+
+
+def test_image_table(tmp_path):
+    file_name = str(tmp_path / "Synthetic.artwork")
+    write_modern_artwork_file(file_name, IMAGES)
+    artwork_set = ModernArtworkFile(file_name).artwork_set
+    assert [(image.name, image.width, image.height, image.is_greyscale) for image in artwork_set.iter_images()] == [("first.png", 4, 4, False), ("second.png", 3, 2, True)]
+
+
+def test_unterminated_name(tmp_path):
+    # Point the last name at the file's final byte, which isn't a NUL.
+    file_name = str(tmp_path / "Synthetic.artwork")
+    write_modern_artwork_file(file_name, IMAGES)
+    with open(file_name, "r+b") as f:
+        data = f.read()
+        f.seek(len(data) - 1)
+        f.write(b"x")
+        f.seek(8 + 4)
+        f.write(struct.pack("<L", len(data) - 1))
+    with pytest.raises(ValueError):
+        list(ModernArtworkFile(file_name).artwork_set.iter_names())
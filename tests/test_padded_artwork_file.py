@@ -0,0 +1,125 @@
+#-------------------------------------------------------------------------------
+#
+# iOS .artwork file extractor
+# (c)2008-2012 Dave Peck <davepeck [at] davepeck [dot] org> All Rights Reserved
+#
+# Released under the three-clause BSD license.
+#
+# http://github.com/davepeck/iOS-artwork/
+#
+#-------------------------------------------------------------------------------
+
+import os
+import os.path
+import sys
+import subprocess
+import numpy
+import pytest
+
+from conftest import REPOSITORY_DIRECTORY
+from artwork.synthetic import SyntheticImage, write_icon_artwork_file
+from artwork.legacy_artwork_file import LegacyArtworkFile
+from artwork.padded_artwork_file import PaddedArtworkFile, UnpaddedArtworkFile
+
+#
+# The same icons are written twice, padded (64-byte rows) and not (the
+# legacy 8-pixel rows): stripping the padding must give exactly the
+# unpadded file, and reading the padded file must give its pixels.
+#
+
+ICON_COUNT = 5
+
+
+@pytest.fixture(params=[87, 20])
+def icon_files(request, tmp_path):
+    size = request.param
+    images = [SyntheticImage("icon-%d@3x.png" % i, size, size) for i in range(ICON_COUNT)]
+    metadata_directory = str(tmp_path / "legacy_metadata")
+    file_names = []
+    for directory, row_alignment in (("padded", 64), ("plain", 32)):
+        os.mkdir(str(tmp_path / directory))
+        file_name = str(tmp_path / directory / "Icons@3x.artwork")
+        write_icon_artwork_file(file_name, metadata_directory, images, row_alignment=row_alignment, seed=size)
+        file_names.append(file_name)
+    return file_names[0], file_names[1], metadata_directory
+
+
+def read_bytes(file_name):
+    with open(file_name, "rb") as f:
+        return f.read()
+
+
+def test_layout(icon_files):
+    padded_file_name, plain_file_name, _ = icon_files
+    padded_file = PaddedArtworkFile(padded_file_name)
+    assert padded_file.is_padded
+    assert padded_file.icon_count == ICON_COUNT
+    assert padded_file.row_stride == padded_file.image_size * 4 + (-padded_file.image_size * 4) % 64
+    assert padded_file.unpadded_row_stride == padded_file.image_size * 4 + (-padded_file.image_size * 4) % 32
+    assert padded_file.unpadded_length == os.path.getsize(plain_file_name)
+    assert not PaddedArtworkFile(plain_file_name).is_padded
+
+
+def test_unpadded_data(icon_files):
+    padded_file_name, plain_file_name, _ = icon_files
+    assert bytes(PaddedArtworkFile(padded_file_name).unpadded_data()) == read_bytes(plain_file_name)
+
+
+@pytest.mark.parametrize("icons_per_chunk", [1, 2, 64])
+def test_write_unpadded(icon_files, tmp_path, icons_per_chunk):
+    padded_file_name, plain_file_name, _ = icon_files
+    file_name = str(tmp_path / "unpadded.artwork")
+    written = PaddedArtworkFile(padded_file_name).write_unpadded(file_name, icons_per_chunk)
+    assert written == os.path.getsize(plain_file_name)
+    assert read_bytes(file_name) == read_bytes(plain_file_name)
+
+
+def test_artwork_hack(icon_files, tmp_path):
+    padded_file_name, plain_file_name, _ = icon_files
+    output_directory = tmp_path / "hacked"
+    output_directory.mkdir()
+    subprocess.check_output([sys.executable, os.path.join(REPOSITORY_DIRECTORY, "artwork_hack.py"), padded_file_name], cwd=str(output_directory))
+    assert read_bytes(str(output_directory / "Icons@3x.artwork")) == read_bytes(plain_file_name)
+
+
+def test_decoded_pixels(icon_files):
+    padded_file_name, plain_file_name, metadata_directory = icon_files
+    unpadded_file = UnpaddedArtworkFile(padded_file_name, metadata_directory)
+    plain_file = LegacyArtworkFile(plain_file_name, metadata_directory)
+    assert unpadded_file.is_legacy_supported
+
+    padded_file = PaddedArtworkFile(padded_file_name)
+    padded_bytes = numpy.frombuffer(read_bytes(padded_file_name), dtype=numpy.uint8)
+    size, row_stride, icon_stride = padded_file.image_size, padded_file.row_stride, padded_file.icon_stride(padded_file.row_stride)
+    for i, artwork_image in enumerate(unpadded_file.artwork_set.iter_images()):
+        assert artwork_image.row_stride == padded_file.unpadded_row_stride
+        # The pixels as written, straight from the padded rows.
+        expected = numpy.stack([padded_bytes[(i * icon_stride) + (y * row_stride):][:size * 4] for y in range(size)]).reshape(size, size, 4)
+        assert numpy.array_equal(artwork_image.get_pixel_array(), expected)
+        plain_image = plain_file.artwork_set.image_at(i)
+        assert numpy.array_equal(numpy.asarray(artwork_image.get_pil_image()), numpy.asarray(plain_image.get_pil_image()))
+
+
+def test_sniff(icon_files, tmp_path):
+    from artwork.sniff import sniff_artwork_file, PADDED
+    from artwork.verify import verify_artwork_file
+    padded_file_name, _, metadata_directory = icon_files
+    artwork_format, artwork_file = sniff_artwork_file(padded_file_name, metadata_directory)
+    assert artwork_format == PADDED
+    assert isinstance(artwork_file, UnpaddedArtworkFile)
+    assert verify_artwork_file(artwork_file) == []
+    for artwork_image in artwork_file.artwork_set.iter_images():
+        artwork_image.get_pil_image()
+    # Nothing was unpadded into memory along the way.
+    assert artwork_file._data is None
+
+    # Without metadata for its unpadded size, it's recognised but not read.
+    assert sniff_artwork_file(padded_file_name, str(tmp_path / "empty")) == (PADDED, None)
+
+
+def test_pixel_view(icon_files):
+    padded_file_name, plain_file_name, metadata_directory = icon_files
+    unpadded_file = UnpaddedArtworkFile(padded_file_name, metadata_directory)
+    plain_file = LegacyArtworkFile(plain_file_name, metadata_directory)
+    for artwork_image, plain_image in zip(unpadded_file.artwork_set.iter_images(), plain_file.artwork_set.iter_images()):
+        assert artwork_image.get_pixel_view() == plain_image.get_pixel_view()
@@ -0,0 +1,192 @@
+#-------------------------------------------------------------------------------
+#
+# iOS .artwork file extractor
+# (c)2008-2012 Dave Peck <davepeck [at] davepeck [dot] org> All Rights Reserved
+#
+# Released under the three-clause BSD license.
+#
+# http://github.com/davepeck/iOS-artwork/
+#
+#-------------------------------------------------------------------------------
+
+import numpy
+import PIL.Image
+import pytest
+
+from artwork.synthetic import SyntheticImage, write_modern_artwork_file, write_legacy_artwork_file
+from artwork.modern_artwork_file import ModernArtworkFile, WriteableModernArtworkFile
+from artwork.legacy_artwork_file import LegacyArtworkFile, WriteableLegacyArtworkFile
+
+#
+# Whole-image decoding and encoding must give exactly what the original
+# per-pixel loops gave, rounding of premultiplied alpha included. The
+# loops are kept here as the reference, built from the per-pixel
+# accessors that ArtworkFile and WriteableArtworkFile still provide.
+#
+
+# Odd widths, so that both colour and greyscale rows are padded somewhere.
+IMAGES = [
+    SyntheticImage("colour.png", 16, 9),
+    SyntheticImage("colour-odd.png", 13, 7),
+    SyntheticImage("grey.png", 16, 5, is_greyscale=True),
+    SyntheticImage("grey-odd.png", 5, 11, is_greyscale=True),
+    SyntheticImage("one.png", 1, 1),
+]
+
+
+def per_pixel_rgba(artwork_file, artwork_image):
+    """The baseline read_pil_image_at, as nested lists of r, g, b, a."""
+    aligned_width = artwork_file.width_byte_align(artwork_image.width, is_greyscale=artwork_image.is_greyscale)
+    pixel_width = artwork_file.pixel_width(artwork_image.is_greyscale)
+    rows = []
+    for y in range(artwork_image.height):
+        row = []
+        for x in range(artwork_image.width):
+            pixel_offset = artwork_image.image_offset + (pixel_width * ((y * aligned_width) + x))
+            if artwork_image.is_greyscale:
+                row.append(artwork_file.read_pil_greyscale_pixel_at(pixel_offset))
+            else:
+                row.append(artwork_file.read_pil_color_pixel_at(pixel_offset))
+        rows.append(row)
+    return numpy.array(rows, dtype=numpy.uint8).reshape(artwork_image.height, artwork_image.width, 4)
+
+
+@pytest.fixture
+def modern_file(tmp_path):
+    file_name = str(tmp_path / "Modern.artwork")
+    write_modern_artwork_file(file_name, IMAGES, seed=1)
+    return ModernArtworkFile(file_name)
+
+
+@pytest.fixture
+def legacy_file(tmp_path):
+    file_name = str(tmp_path / "Legacy.artwork")
+    metadata_directory = str(tmp_path / "legacy_metadata")
+    write_legacy_artwork_file(file_name, metadata_directory, IMAGES, seed=2)
+    return LegacyArtworkFile(file_name, metadata_directory)
+
+
+@pytest.fixture(params=["modern", "legacy"])
+def artwork_file(request, modern_file, legacy_file):
+    return modern_file if request.param == "modern" else legacy_file
+
+
+#------------------------------------------------------------------------------
+# Decoding
+#------------------------------------------------------------------------------
+
+def test_row_strides(modern_file, legacy_file):
+    # Modern files pad greyscale rows to 4 pixels, legacy files all rows to 8.
+    assert [image.row_stride for image in modern_file.artwork_set.iter_images()] == [64, 52, 16, 8, 4]
+    assert [image.row_stride for image in legacy_file.artwork_set.iter_images()] == [64, 64, 16, 8, 32]
+
+
+def test_decode_matches_per_pixel_loop(artwork_file):
+    for artwork_image in artwork_file.artwork_set.iter_images():
+        pil_image = artwork_image.get_pil_image(rgba_greyscale=True)
+        assert pil_image.mode == "RGBA"
+        assert numpy.array_equal(numpy.asarray(pil_image), per_pixel_rgba(artwork_file, artwork_image)), artwork_image.name
+
+
+def test_greyscale_decodes_to_l_mode(artwork_file):
+    for artwork_image in artwork_file.artwork_set.iter_images():
+        if not artwork_image.is_greyscale:
+            continue
+        pil_image = artwork_image.get_pil_image()
+        assert pil_image.mode == "L"
+        assert numpy.array_equal(numpy.asarray(pil_image), per_pixel_rgba(artwork_file, artwork_image)[:, :, 0])
+
+
+def test_pixel_array_skips_row_padding(artwork_file):
+    for artwork_image in artwork_file.artwork_set.iter_images():
+        pixels = artwork_image.get_pixel_array()
+        expected_shape = (artwork_image.height, artwork_image.width) if artwork_image.is_greyscale else (artwork_image.height, artwork_image.width, 4)
+        assert pixels.shape == expected_shape
+        assert len(artwork_image.get_pixel_view()) == artwork_image.pixel_span
+
+
+def test_known_pixels(tmp_path):
+    # A 3x2 colour image (a 4-byte colour row, then padding in a legacy
+    # file) with hand-picked premultiplied b, g, r, a.
+    bgra = [
+        (0, 0, 0, 0), (10, 20, 30, 0), (255, 255, 255, 255),
+        (32, 64, 128, 128), (1, 1, 1, 3), (0, 127, 0, 127),
+    ]
+    expected_rgba = [
+        (0, 0, 0, 0), (30, 20, 10, 0), (255, 255, 255, 255),
+        (255, 128, 64, 128), (85, 85, 85, 3), (0, 255, 0, 127),
+    ]
+    data = bytearray()
+    for y in range(2):
+        for x in range(3):
+            data.extend(bytes(bgra[(y * 3) + x]))
+        # Legacy rows are padded to 8 pixels; fill the padding with noise.
+        data.extend(b"\xEE" * (5 * 4))
+    file_name = str(tmp_path / "Known.artwork")
+    with open(file_name, "wb") as f:
+        f.write(bytes(data))
+
+    metadata_directory = tmp_path / "legacy_metadata"
+    metadata_directory.mkdir()
+    (metadata_directory / ("Known.artwork-%d.json" % len(data))).write_text('{"images": [["known.png", 3, 2, 0, 0]], "name": "Known.artwork", "version": "5.1.0", "byte_size": %d}' % len(data))
+
+    artwork_file = LegacyArtworkFile(file_name, str(metadata_directory))
+    pil_image = artwork_file.artwork_set.get_image("known.png").get_pil_image()
+    assert numpy.asarray(pil_image).reshape(6, 4).tolist() == [list(pixel) for pixel in expected_rgba]
+
+
+#------------------------------------------------------------------------------
+# Encoding
+#------------------------------------------------------------------------------
+
+def writeable_file_for(artwork_file, file_name):
+    if artwork_file.is_modern:
+        return WriteableModernArtworkFile(file_name, artwork_file)
+    return WriteableLegacyArtworkFile(file_name, artwork_file)
+
+
+def test_encode_round_trip(artwork_file, tmp_path):
+    # Synthetic pixels are properly premultiplied, so decoding and encoding
+    # them again gives back the very same bytes, row padding included.
+    file_name = str(tmp_path / "Written.artwork")
+    writeable_file = writeable_file_for(artwork_file, file_name)
+    writeable_file.open()
+    for artwork_image in artwork_file.artwork_set.iter_images():
+        pil_image = artwork_image.get_pil_image()
+        writeable_file.write_pil_image_at(artwork_image.image_offset, artwork_image.width, artwork_image.height, artwork_image.is_greyscale, pil_image)
+    writeable_file.close()
+    with open(file_name, "rb") as f:
+        assert f.read() == bytes(artwork_file.data)
+
+
+def test_encode_matches_per_pixel_loop(artwork_file, tmp_path):
+    random = numpy.random.default_rng(3)
+    file_name = str(tmp_path / "Written.artwork")
+    writeable_file = writeable_file_for(artwork_file, file_name)
+    writeable_file.open()
+    for artwork_image in artwork_file.artwork_set.iter_images():
+        width, height, is_greyscale = artwork_image.width, artwork_image.height, artwork_image.is_greyscale
+        rgba = random.integers(0, 256, (height, width, 4), dtype=numpy.uint8)
+        writeable_file.write_pil_image_at(artwork_image.image_offset, width, height, is_greyscale, PIL.Image.fromarray(rgba, "RGBA"))
+
+        aligned_width = writeable_file.width_byte_align(width, is_greyscale=is_greyscale)
+        pixel_width = writeable_file.pixel_width(is_greyscale)
+        for y in range(height):
+            for x in range(width):
+                pixel_offset = artwork_image.image_offset + (pixel_width * ((y * aligned_width) + x))
+                r, g, b, a = [int(value) for value in rgba[y, x]]
+                if is_greyscale:
+                    assert writeable_file.read_byte_at(pixel_offset) == b
+                else:
+                    expected = ((b * a + 127) // 255, (g * a + 127) // 255, (r * a + 127) // 255, a)
+                    assert writeable_file.unpack("BBBB", pixel_offset) == expected
+    writeable_file.close()
+
+
+def test_encode_rejects_wrong_size(modern_file, tmp_path):
+    writeable_file = WriteableModernArtworkFile(str(tmp_path / "Written.artwork"), modern_file)
+    writeable_file.open()
+    artwork_image = modern_file.artwork_set.image_at(0)
+    with pytest.raises(ValueError):
+        writeable_file.write_pil_image_at(artwork_image.image_offset, artwork_image.width, artwork_image.height, False, PIL.Image.new("RGBA", (2, 2)))
+    writeable_file.close()
@@ -0,0 +1,129 @@
+#-------------------------------------------------------------------------------
+#
+# iOS .artwork file extractor
+# (c)2008-2012 Dave Peck <davepeck [at] davepeck [dot] org> All Rights Reserved
+#
+# Released under the three-clause BSD license.
+#
+# http://github.com/davepeck/iOS-artwork/
+#
+#-------------------------------------------------------------------------------
+
+import json
+import asyncio
+import threading
+import pytest
+
+from artwork.synthetic import SyntheticImage, write_modern_artwork_file
+from artwork.modern_artwork_file import ModernArtworkFile
+from artwork.server import ArtworkServer
+
+IMAGES = [SyntheticImage("first.png", 4, 4), SyntheticImage("second.png", 3, 2, is_greyscale=True)]
+
+
+class GatedArtworkServer(ArtworkServer):
+    """Counts its encodes, each of which waits until the gate is opened."""
+    def __init__(self, artwork_files):
+        super(GatedArtworkServer, self).__init__(artwork_files)
+        self.gate = threading.Event()
+        self.encode_count = 0
+
+    def encode_image(self, artwork_image):
+        self.encode_count += 1
+        self.gate.wait(10)
+        return super(GatedArtworkServer, self).encode_image(artwork_image)
+
+
+@pytest.fixture
+def artwork_file(tmp_path):
+    file_name = str(tmp_path / "Synthetic.artwork")
+    write_modern_artwork_file(file_name, IMAGES)
+    return ModernArtworkFile(file_name)
+
+
+async def get(port, path, headers=None):
+    """(status, headers, body) for one GET over a fresh connection."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    lines = ["GET %s HTTP/1.1" % path, "Host: localhost", "Connection: close"]
+    lines.extend("%s: %s" % item for item in (headers or {}).items())
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b"\r\n\r\n")
+    head_lines = head.decode("latin-1").split("\r\n")
+    response_headers = dict((name.lower(), value.strip()) for name, _, value in (line.partition(":") for line in head_lines[1:]))
+    return int(head_lines[0].split()[1]), response_headers, body
+
+
+def serve(server, test):
+    """Run test(port) against server, listening on a free port."""
+    async def run():
+        _, port = await server.start(port=0)
+        try:
+            await test(port)
+        finally:
+            server.close()
+    asyncio.run(run())
+
+
+def test_responses(artwork_file):
+    server = ArtworkServer({"Synthetic": artwork_file})
+
+    async def test(port):
+        status, headers, body = await get(port, "/Synthetic/first.png")
+        assert status == 200
+        assert headers["content-type"] == "image/png"
+        assert body.startswith(b"\x89PNG")
+        assert int(headers["content-length"]) == len(body)
+
+        status, _, body = await get(port, "/Synthetic/first.png", {"If-None-Match": headers["etag"]})
+        assert (status, body) == (304, b"")
+
+        status, _, _ = await get(port, "/Synthetic/third.png")
+        assert status == 404
+        status, _, _ = await get(port, "/Elsewhere/first.png")
+        assert status == 404
+
+        status, _, body = await get(port, "/Synthetic/")
+        assert status == 200
+        assert [row["name"] for row in json.loads(body)] == ["first.png", "second.png"]
+    serve(server, test)
+
+
+def test_concurrent_requests_share_one_encode(artwork_file):
+    server = GatedArtworkServer({"Synthetic": artwork_file})
+
+    async def test(port):
+        requests = [asyncio.ensure_future(get(port, "/Synthetic/first.png")) for i in range(4)]
+        await asyncio.sleep(0.2)
+        server.gate.set()
+        responses = await asyncio.gather(*requests)
+        assert [status for status, _, _ in responses] == [200] * 4
+        assert len(set(body for _, _, body in responses)) == 1
+        assert server.encode_count == 1
+        assert server._pending == {}
+        assert len(server.cache) == 1
+    serve(server, test)
+
+
+def test_cancelled_first_request_leaves_others_waiting(artwork_file):
+    server = GatedArtworkServer({"Synthetic": artwork_file})
+    artwork_image = artwork_file.artwork_set.get_image("first.png")
+
+    async def test(port):
+        first = asyncio.ensure_future(server.encoded_image("Synthetic", artwork_image))
+        await asyncio.sleep(0)
+        second = asyncio.ensure_future(server.encoded_image("Synthetic", artwork_image))
+        await asyncio.sleep(0.1)
+        first.cancel()
+        await asyncio.sleep(0.1)
+        server.gate.set()
+        data = await second
+        assert first.cancelled()
+        assert data.startswith(b"\x89PNG")
+        assert server.encode_count == 1
+        # The encode still lands in the cache for later requests.
+        status, _, body = await get(port, "/Synthetic/first.png")
+        assert (status, body) == (200, data)
+        assert server.encode_count == 1
+    serve(server, test)
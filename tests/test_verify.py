@@ -0,0 +1,54 @@
+#-------------------------------------------------------------------------------
+#
+# iOS .artwork file extractor
+# (c)2008-2012 Dave Peck <davepeck [at] davepeck [dot] org> All Rights Reserved
+#
+# Released under the three-clause BSD license.
+#
+# http://github.com/davepeck/iOS-artwork/
+#
+#-------------------------------------------------------------------------------
+
+import os
+import os.path
+import struct
+import pytest
+
+from conftest import REPOSITORY_DIRECTORY
+from artwork.synthetic import SyntheticImage, write_modern_artwork_file
+from artwork.modern_artwork_file import ModernArtworkFile
+from artwork.legacy_artwork_file import LegacyArtworkFile
+from artwork.verify import verify_artwork_file, has_errors
+
+LEGACY_METADATA_DIRECTORY = os.path.join(REPOSITORY_DIRECTORY, "legacy_metadata")
+SHIPPED_KEYS = sorted(file_name for file_name in os.listdir(LEGACY_METADATA_DIRECTORY) if file_name.endswith(".json"))
+
+
+@pytest.mark.parametrize("key", SHIPPED_KEYS)
+def test_shipped_legacy_metadata(key, tmp_path):
+    # Legacy verification only needs the metadata and the file's size, so a
+    # sparse file of the right size stands in for Apple's.
+    basename, _, file_size = key[:-len(".json")].rpartition("-")
+    file_name = str(tmp_path / basename)
+    with open(file_name, "wb") as f:
+        f.truncate(int(file_size))
+    artwork_file = LegacyArtworkFile(file_name, LEGACY_METADATA_DIRECTORY)
+    assert artwork_file.is_legacy_supported
+    problems = verify_artwork_file(artwork_file)
+    assert not has_errors(problems), problems
+
+
+def test_modern_overlap_is_an_error(tmp_path):
+    file_name = str(tmp_path / "Synthetic.artwork")
+    write_modern_artwork_file(file_name, [SyntheticImage("first.png", 4, 4), SyntheticImage("second.png", 4, 4)])
+    artwork_file = ModernArtworkFile(file_name)
+    assert verify_artwork_file(artwork_file) == []
+
+    # Move the second image half way into the first.
+    first = artwork_file.artwork_set.image_at(0)
+    image_info_array_offset = artwork_file.read_long_at(4)
+    with open(file_name, "r+b") as f:
+        f.seek(image_info_array_offset + 12 + 8)
+        f.write(struct.pack("<L", first.image_offset + 32))
+    problems = verify_artwork_file(ModernArtworkFile(file_name))
+    assert [(problem.severity, problem.message) for problem in problems] == [("error", "byte ranges overlap")]